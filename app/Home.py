@@ -1,4 +1,5 @@
 import streamlit as st
+from db.offline import OFFLINE_DEVICE
 
 st.set_page_config(page_title="Almacén - EPP & Herramientas", layout="wide")
 
@@ -7,3 +8,9 @@ st.write("Inventario, entregas, renovaciones y transferencias entre proyectos.")
 st.info(
     "Siguiente paso: crear conexión a BD + primera pantalla de registro de movimientos."
 )
+
+if OFFLINE_DEVICE:
+    st.warning(
+        f"Modo sin conexión (frente **{OFFLINE_DEVICE}**): los movimientos se guardan en este equipo. "
+        "Al volver a tener red: python -m scripts.offline_sync --push <archivo del frente>"
+    )
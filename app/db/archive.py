@@ -0,0 +1,114 @@
+# Archivo histórico (hot/cold) de transactions.
+# Los años cerrados se mueven a un SQLite por año (ARCHIVE_DIR/transactions_YYYY.db) que se adjunta
+# en solo lectura. En la BD viva queda, por proyecto × ubicación × EPP × talla, un movimiento
+# OPENING con el saldo al cierre: SUM(qty) sobre transactions sigue dando el stock real.
+# Las consultas por rango (Kardex, Reportes) unen el archivo solo cuando el rango lo necesita.
+# El archivado lo hace scripts/archive_transactions.py (solo SQLite; en PostgreSQL, particiones).
+import os
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+
+from .dictionaries import normalize_size_sql
+from .localtime import DB_FORMAT, LOCAL_TZ, UTC_TZ
+
+ARCHIVE_DIR = Path(os.getenv("ARCHIVE_DIR", "data/archive"))
+OPENING_TYPE = "OPENING"
+
+# Columnas que leen las páginas: lo común entre la tabla viva y los archivos
+COLUMNS = (
+    "transaction_id",
+    "txn_datetime",
+    "txn_type",
+    "project_id",
+    "location_id",
+    "item_id",
+    "qty",
+    "size",
+    "employee_id",
+    "request_number",
+    "reference",
+    "notes",
+    "created_by",
+)
+
+# Los archivos no tienen las columnas de las migraciones 005-008 (o las tienen de antes del
+# backfill de tallas): se calculan al leerlos, contra los diccionarios de la BD viva
+ARCHIVE_DERIVED = (
+    "CAST(strftime('%s', txn_datetime) AS INTEGER) AS txn_epoch, "
+    "date(txn_datetime, '-5 hours') AS txn_local_date, "
+    "(SELECT type_id FROM main.txn_types WHERE code = txn_type) AS type_id, "
+    f"(SELECT size_id FROM main.sizes WHERE code = {normalize_size_sql('size')}) AS size_id"
+)
+
+
+def archive_file(year: int) -> str:
+    return f"transactions_{year}.db"
+
+
+def year_bounds_utc(year: int) -> tuple[str, str]:
+    """[inicio, fin) del año en hora de Lima, como texto UTC (el formato de txn_datetime)."""
+
+    def to_utc(y: int) -> str:
+        return (
+            datetime(y, 1, 1, tzinfo=LOCAL_TZ)
+            .astimezone(UTC_TZ)
+            .strftime(DB_FORMAT)
+        )
+
+    return to_utc(year), to_utc(year + 1)
+
+
+def archived_periods(conn) -> list[dict]:
+    if conn.dialect.name != "sqlite" or not inspect(conn).has_table("archive_periods"):
+        return []
+    rows = conn.execute(text("SELECT * FROM archive_periods ORDER BY year")).mappings()
+    return [dict(r) for r in rows]
+
+
+def hot_start(conn) -> str | None:
+    """Desde cuándo (UTC) los movimientos están en la BD viva. None = nada archivado."""
+    periods = archived_periods(conn)
+    return periods[-1]["end_utc"] if periods else None
+
+
+def attach_archives(conn, periods: list[dict]) -> list[str]:
+    """Adjunta (solo lectura) los archivos que falten en esta conexión. Devuelve sus alias."""
+    attached = {r[1] for r in conn.exec_driver_sql("PRAGMA database_list")}
+    aliases = []
+    for p in periods:
+        alias = f"arc_{p['year']}"
+        if alias not in attached:
+            path = (ARCHIVE_DIR / p["file_name"]).resolve()
+            if not path.exists():
+                raise RuntimeError(f"Falta el archivo histórico {path} (año {p['year']})")
+            conn.exec_driver_sql(f"ATTACH DATABASE '{path.as_uri()}?mode=ro' AS {alias}")
+        aliases.append(alias)
+    return aliases
+
+
+def transactions_source(conn, dt_start: str | None = None, dt_end: str | None = None) -> str:
+    """
+    Qué poner en "FROM ... t" para un rango UTC (None = sin límite).
+    Si el rango cae entero en la BD viva: "transactions". Si toca años archivados: la unión de
+    esos archivos con la tabla viva, sin los OPENING (el detalle real ya viene del archivo).
+    """
+    periods = [
+        p
+        for p in archived_periods(conn)
+        if (dt_end is None or p["start_utc"] <= dt_end)
+        and (dt_start is None or p["end_utc"] > dt_start)
+    ]
+    if not periods:
+        return "transactions"
+    cols = ", ".join(COLUMNS)
+    parts = [
+        f"SELECT {cols}, {ARCHIVE_DERIVED} FROM {alias}.transactions"
+        for alias in attach_archives(conn, periods)
+    ]
+    parts.append(
+        f"SELECT {cols}, txn_epoch, txn_local_date, type_id, size_id FROM main.transactions "
+        f"WHERE txn_type <> '{OPENING_TYPE}'"
+    )
+    return "(" + " UNION ALL ".join(parts) + ")"
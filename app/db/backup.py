@@ -0,0 +1,275 @@
+# Respaldo en línea de la BD SQLite (scripts/backup_db.py).
+# Copiar el .db con la app en marcha bloquea a los almaceneros o deja una copia a medio escribir.
+# Aquí se usa la API de backup de SQLite:
+# - BD en WAL (la app la deja así, ver db/connection.py): una sola pasada. El lector ve una sola
+#   instantánea y los escritores siguen grabando en el -wal mientras tanto.
+# - En otro modo (rollback journal) una lectura larga bloquea a los escritores: se copia por pasos
+#   de pocas páginas y entre paso y paso se suelta el lock. Si alguien escribe durante la copia,
+#   SQLite la reinicia (la copia siempre es de un solo instante); tras MAX_RESTARTS reinicios se
+#   espera (RETRY_WAIT_S, el doble cada vez) y se vuelve a empezar, hasta MAX_ATTEMPTS intentos.
+#   Nunca se copia el resto de una vez: eso tendría a los almaceneros esperando toda la copia.
+# Cada respaldo:
+# - se comprueba (PRAGMA quick_check) antes de comprimirlo: almacen_YYYYMMDD_HHMMSS.db.gz;
+# - deja al lado su manifiesto (.json) con las filas por tabla y los saldos de stock
+#   (SUM(qty) por proyecto × ubicación × EPP × talla) del mismo instante;
+# - copia los años archivados (db/archive.py) que aún no estén en BACKUP_DIR/archive: son de solo
+#   lectura, basta una copia.
+# verify_backup descomprime, vuelve a contar y compara contra el manifiesto; restore_backup lo mismo
+# y, si todo cuadra, deja la BD en su destino.
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+from sqlalchemy.engine import make_url
+
+from .archive import ARCHIVE_DIR
+from .localtime import LOCAL_TZ
+
+BACKUP_DIR = Path(os.getenv("BACKUP_DIR", "data/backups"))
+PREFIX = "almacen_"
+SUFFIX = ".db.gz"
+KEEP = 14
+PAGES_PER_STEP = 256
+MAX_RESTARTS = 20
+MAX_ATTEMPTS = 5
+RETRY_WAIT_S = 2.0
+
+BALANCES_SQL = """
+SELECT project_id, location_id, item_id, COALESCE(size_id, 0) AS size_key, SUM(qty) AS stock
+FROM transactions
+GROUP BY project_id, location_id, item_id, COALESCE(size_id, 0)
+ORDER BY project_id, location_id, item_id, size_key
+"""
+
+
+class _TooManyRestarts(Exception):
+    pass
+
+
+def sqlite_path(url: str) -> Path:
+    """Archivo de la BD. Solo SQLite: en PostgreSQL el respaldo es pg_dump."""
+    u = make_url(url)
+    if u.get_backend_name() != "sqlite" or not u.database or u.database == ":memory:":
+        raise ValueError("El respaldo en línea es solo para SQLite (en PostgreSQL: pg_dump)")
+    return Path(u.database)
+
+
+def online_copy(src_path: Path, dst_path: Path, pages: int = PAGES_PER_STEP, pause_s: float = 0.0) -> dict:
+    """Copia consistente de src_path a dst_path sin bloquear a los que escriben (más de un instante)."""
+    stats = {"modo": None, "intentos": 0, "pasos": 0, "reinicios": 0}
+    last = {"remaining": None, "reinicios": 0}
+
+    def progress(_status, remaining, _total):
+        stats["pasos"] += 1
+        # remaining sube: otra conexión escribió y SQLite empezó la copia de nuevo
+        if last["remaining"] is not None and remaining > last["remaining"]:
+            stats["reinicios"] += 1
+            last["reinicios"] += 1
+            if last["reinicios"] > MAX_RESTARTS:
+                raise _TooManyRestarts
+        last["remaining"] = remaining
+        if pause_s:
+            time.sleep(pause_s)  # el lock ya se soltó: los escritores entran aquí
+
+    t0 = time.perf_counter()
+    src = sqlite3.connect(f"{src_path.resolve().as_uri()}?mode=ro", uri=True, timeout=30)
+    try:
+        stats["modo"] = src.execute("PRAGMA journal_mode").fetchone()[0]
+        for attempt in range(MAX_ATTEMPTS):
+            stats["intentos"] += 1
+            last.update(remaining=None, reinicios=0)
+            dst = sqlite3.connect(dst_path)
+            try:
+                if stats["modo"] == "wal":
+                    src.backup(dst, pages=-1, progress=progress)
+                else:
+                    src.backup(dst, pages=pages, progress=progress)
+                break
+            except _TooManyRestarts:
+                time.sleep(RETRY_WAIT_S * 2**attempt)
+            finally:
+                dst.close()
+        else:
+            raise RuntimeError(
+                f"No se pudo copiar {src_path}: más de {MAX_RESTARTS} reinicios en {MAX_ATTEMPTS} intentos "
+                "(demasiadas escrituras; reintentar más tarde o con --pages mayor)"
+            )
+    finally:
+        src.close()
+    stats["segundos"] = round(time.perf_counter() - t0, 2)
+    return stats
+
+
+def ledger_summary(db_path: Path) -> dict:
+    """Filas por tabla y saldos de stock (total, cantidad de saldos y huella) de un archivo SQLite."""
+    conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+    try:
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        tables = [
+            r[0]
+            for r in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+            )
+        ]
+        counts = {t: conn.execute(f'SELECT COUNT(*) FROM "{t}"').fetchone()[0] for t in tables}
+        digest = hashlib.sha256()
+        keys = total = 0
+        for row in conn.execute(BALANCES_SQL):
+            digest.update(repr(row).encode())
+            keys += 1
+            total += row[4] or 0
+        archives = []
+        if "archive_periods" in tables:
+            archives = [r[0] for r in conn.execute("SELECT file_name FROM archive_periods ORDER BY year")]
+    finally:
+        conn.close()
+    return {
+        "quick_check": check,
+        "tablas": counts,
+        "saldos": {"claves": keys, "stock_total": total, "sha256": digest.hexdigest()},
+        "archivos": archives,
+    }
+
+
+def compare_summary(expected: dict, actual: dict) -> list[str]:
+    """Diferencias entre el manifiesto y lo que se contó (vacío = cuadra)."""
+    problems = []
+    if actual["quick_check"] != "ok":
+        problems.append(f"quick_check: {actual['quick_check']}")
+    for table in sorted(set(expected["tablas"]) | set(actual["tablas"])):
+        a, b = expected["tablas"].get(table), actual["tablas"].get(table)
+        if a != b:
+            problems.append(f"{table}: {a} filas en el manifiesto, {b} en la copia")
+    for key in ("claves", "stock_total", "sha256"):
+        if expected["saldos"][key] != actual["saldos"][key]:
+            problems.append(f"saldos ({key}): {expected['saldos'][key]} != {actual['saldos'][key]}")
+    return problems
+
+
+def manifest_path(backup: Path) -> Path:
+    return backup.with_name(backup.name[: -len(SUFFIX)] + ".json")
+
+
+def list_backups(directory: Path = BACKUP_DIR) -> list[Path]:
+    """Respaldos del más antiguo al más reciente (el nombre lleva la fecha)."""
+    return sorted(directory.glob(f"{PREFIX}*{SUFFIX}"))
+
+
+def rotate(directory: Path = BACKUP_DIR, keep: int = KEEP) -> list[Path]:
+    """Deja los `keep` respaldos más recientes (con sus manifiestos). Devuelve los borrados."""
+    removed = list_backups(directory)[:-keep] if keep > 0 else []
+    for path in removed:
+        path.unlink()
+        manifest_path(path).unlink(missing_ok=True)
+    return removed
+
+
+def _copy_archives(names: list[str], src_dir: Path, dst_dir: Path) -> list[str]:
+    """Copia los años archivados que falten en dst_dir (no cambian una vez escritos)."""
+    copied = []
+    for name in names:
+        dst = dst_dir / name
+        if dst.exists():
+            continue
+        src = src_dir / name
+        if not src.exists():
+            raise RuntimeError(f"Falta el archivo histórico {src}")
+        dst_dir.mkdir(parents=True, exist_ok=True)
+        tmp = dst.with_suffix(".tmp")
+        shutil.copy2(src, tmp)
+        tmp.replace(dst)
+        copied.append(name)
+    return copied
+
+
+def create_backup(
+    db_path: Path,
+    directory: Path = BACKUP_DIR,
+    keep: int = KEEP,
+    pages: int = PAGES_PER_STEP,
+    pause_s: float = 0.0,
+) -> dict:
+    """Respaldo comprimido + manifiesto + rotación. Devuelve lo hecho (para el log del script)."""
+    directory.mkdir(parents=True, exist_ok=True)
+    stamp = datetime.now(LOCAL_TZ).strftime("%Y%m%d_%H%M%S")
+    target = directory / f"{PREFIX}{stamp}{SUFFIX}"
+    with tempfile.TemporaryDirectory(dir=directory) as tmp:
+        copy = Path(tmp) / "almacen.db"
+        stats = online_copy(db_path, copy, pages, pause_s)
+        summary = ledger_summary(copy)
+        if summary["quick_check"] != "ok":
+            raise RuntimeError(f"La copia no pasó quick_check: {summary['quick_check']}")
+        partial = Path(tmp) / target.name
+        with copy.open("rb") as f_in, gzip.open(partial, "wb", compresslevel=6) as f_out:
+            shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+        db_bytes = copy.stat().st_size
+        partial.replace(target)
+    manifest = {
+        "origen": str(db_path.resolve()),
+        "creado": datetime.now(LOCAL_TZ).isoformat(timespec="seconds"),
+        "bytes_db": db_bytes,
+        "copia": stats,
+        **summary,
+    }
+    manifest_path(target).write_text(json.dumps(manifest, indent=2, ensure_ascii=False), encoding="utf-8")
+    copied = _copy_archives(summary["archivos"], ARCHIVE_DIR, directory / "archive")
+    return {
+        "respaldo": target,
+        "bytes_db": db_bytes,
+        "bytes_gz": target.stat().st_size,
+        "copia": stats,
+        "saldos": summary["saldos"],
+        "archivos_copiados": copied,
+        "borrados": rotate(directory, keep),
+    }
+
+
+def _decompress(backup: Path, dst: Path) -> None:
+    with gzip.open(backup, "rb") as f_in, dst.open("wb") as f_out:
+        shutil.copyfileobj(f_in, f_out, 1024 * 1024)
+
+
+def verify_backup(backup: Path) -> tuple[dict, list[str]]:
+    """Descomprime en un temporal y compara contra el manifiesto: (conteos, diferencias)."""
+    manifest_file = manifest_path(backup)
+    if not manifest_file.exists():
+        raise FileNotFoundError(f"Falta el manifiesto {manifest_file}")
+    expected = json.loads(manifest_file.read_text(encoding="utf-8"))
+    with tempfile.TemporaryDirectory(dir=backup.parent) as tmp:
+        copy = Path(tmp) / "almacen.db"
+        _decompress(backup, copy)
+        actual = ledger_summary(copy)
+    problems = compare_summary(expected, actual)
+    missing = [n for n in actual["archivos"] if not (backup.parent / "archive" / n).exists()]
+    problems += [f"falta el año archivado {backup.parent / 'archive' / n}" for n in missing]
+    return actual, problems
+
+
+def restore_backup(backup: Path, target: Path, overwrite: bool = False) -> tuple[dict, list[str], list[str]]:
+    """
+    Restaura `backup` en `target` solo si cuadra con su manifiesto (si no, target no se toca).
+    También deja en ARCHIVE_DIR los años archivados que falten. Devuelve (conteos, diferencias, copiados).
+    """
+    if target.exists() and not overwrite:
+        raise FileExistsError(f"{target} ya existe (usa --force para reemplazarla con la app detenida)")
+    expected = json.loads(manifest_path(backup).read_text(encoding="utf-8"))
+    target.parent.mkdir(parents=True, exist_ok=True)
+    partial = target.with_name(target.name + ".restore")
+    _decompress(backup, partial)
+    actual = ledger_summary(partial)
+    problems = compare_summary(expected, actual)
+    if problems:
+        partial.unlink()
+        return actual, problems, []
+    for suffix in ("-journal", "-wal", "-shm"):
+        Path(f"{target}{suffix}").unlink(missing_ok=True)
+    partial.replace(target)
+    copied = _copy_archives(actual["archivos"], backup.parent / "archive", ARCHIVE_DIR)
+    return actual, problems, copied
@@ -1,11 +1,37 @@
+import atexit
+import json
 import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timezone
+from pathlib import Path
 
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
 from sqlalchemy.engine import Engine
 
 load_dotenv()
 
+# -------------------------
+# Perfilador SQL (opcional)
+# -------------------------
+# SQL_PROFILE=1 activa el registro por sentencia (latencia, filas, página que la llamó),
+# agregado por "huella" (SQL sin literales). Las que pasan SQL_SLOW_MS van a SQL_SLOW_LOG
+# con su plan de ejecución. Al salir se vuelca el resumen a SQL_STATS_FILE.
+PROFILE_ENABLED = os.getenv("SQL_PROFILE", "0") == "1"
+SLOW_MS = float(os.getenv("SQL_SLOW_MS", "200"))
+SLOW_LOG = Path(os.getenv("SQL_SLOW_LOG", "logs/slow_queries.log"))
+STATS_FILE = Path(os.getenv("SQL_STATS_FILE", "logs/sql_stats.json"))
+
+EXPLAINABLE = re.compile(r"^\s*(SELECT|INSERT|UPDATE|DELETE|WITH)\b", re.IGNORECASE)
+
+_stats: dict[str, dict] = {}
+_stats_lock = threading.Lock()
+
 
 def get_database_url() -> str:
     url = os.getenv("DATABASE_URL")
@@ -14,8 +40,228 @@ def get_database_url() -> str:
     return url
 
 
-def get_engine() -> Engine:
-    url = get_database_url()
+def fingerprint(sql: str) -> str:
+    """Normaliza el SQL para agrupar: sin comentarios, literales ni parámetros, espacios colapsados."""
+    s = re.sub(r"--[^\n]*", " ", sql)
+    s = re.sub(r"'(?:[^']|'')*'", "?", s)
+    s = re.sub(r"%\(\w+\)s|(?<!:):\w+|\$\d+", "?", s)
+    s = re.sub(r"\b\d+(?:\.\d+)?\b", "?", s)
+    s = re.sub(r"\?(?:\s*,\s*\?)+", "?+", s)  # IN (?, ?, ?) -> IN (?+)
+    return re.sub(r"\s+", " ", s).strip().rstrip(";").strip()
+
+
+def calling_page() -> str:
+    """Primer archivo de app/pages o scripts en la pila (o Home)."""
+    f = sys._getframe(2)
+    while f is not None:
+        path = f.f_code.co_filename.replace("\\", "/")
+        if "/pages/" in path or "/scripts/" in path or path.endswith("/Home.py"):
+            return Path(path).stem
+        f = f.f_back
+    return "?"
+
+
+def _record(entry: dict, rows: int | None, elapsed_ms: float) -> None:
+    with _stats_lock:
+        s = _stats.get(entry["fp"])
+        if s is None:
+            s = _stats[entry["fp"]] = {
+                "fingerprint": entry["fp"],
+                "calls": 0,
+                "total_ms": 0.0,
+                "max_ms": 0.0,
+                "rows": 0,
+                "pages": Counter(),
+                "recent_ms": deque(maxlen=1000),
+            }
+        s["calls"] += 1
+        s["total_ms"] += elapsed_ms
+        s["max_ms"] = max(s["max_ms"], elapsed_ms)
+        s["rows"] += rows or 0
+        s["pages"][entry["page"]] += 1
+        s["recent_ms"].append(elapsed_ms)
+
+    if elapsed_ms >= SLOW_MS:
+        _log_slow(entry, rows, elapsed_ms)
+
+
+def _explain(entry: dict) -> list[str]:
+    """
+    Plan de la sentencia en la misma conexión (y transacción) de quien la ejecutó.
+    En PostgreSQL un EXPLAIN que falla deja abortada esa transacción: va dentro de un SAVEPOINT
+    y, si falla, se vuelve a él antes de seguir.
+    """
+    cur = entry["dbapi_conn"].cursor()
+    try:
+        if entry["savepoint"]:
+            cur.execute("SAVEPOINT sql_profile_explain")
+        try:
+            cur.execute(entry["explain"] + entry["sql"], entry["params"])
+            return [" | ".join(str(c) for c in r) for r in cur.fetchall()]
+        except Exception:
+            if entry["savepoint"]:
+                cur.execute("ROLLBACK TO SAVEPOINT sql_profile_explain")
+            raise
+        finally:
+            if entry["savepoint"]:
+                cur.execute("RELEASE SAVEPOINT sql_profile_explain")
+    finally:
+        cur.close()
+
+
+def _log_slow(entry: dict, rows: int | None, elapsed_ms: float) -> None:
+    plan = None
+    if entry["explain"] and not entry["many"]:
+        try:
+            plan = _explain(entry)
+        except Exception as e:  # el plan es informativo; nunca rompe la página
+            plan = [f"(sin plan: {e})"]
+
+    SLOW_LOG.parent.mkdir(parents=True, exist_ok=True)
+    rec = {
+        "ts": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "ms": round(elapsed_ms, 3),
+        "rows": rows,
+        "page": entry["page"],
+        "sql": re.sub(r"\s+", " ", entry["sql"]).strip(),
+        "params": None if entry["many"] else repr(entry["params"]),
+        "plan": plan,
+    }
+    with _stats_lock, SLOW_LOG.open("a", encoding="utf-8") as f:
+        f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+
+
+class _ProfiledCursor(sqlite3.Cursor):
+    # SQLite ejecuta los SELECT de a poco mientras se leen filas: contamos el tiempo de fetch
+    # y las filas, y cerramos el registro cuando SQLAlchemy cierra el cursor.
+    _prof = None
+
+    def _fetch(self, fn, *args):
+        t0 = time.perf_counter()
+        res = fn(*args)
+        if self._prof is not None:
+            self._prof["fetch_s"] += time.perf_counter() - t0
+            if isinstance(res, list):
+                self._prof["rows"] += len(res)
+            elif res is not None:
+                self._prof["rows"] += 1
+        return res
+
+    def fetchone(self):
+        return self._fetch(super().fetchone)
+
+    def fetchmany(self, *args):
+        return self._fetch(super().fetchmany, *args)
+
+    def fetchall(self):
+        return self._fetch(super().fetchall)
+
+    def close(self):
+        prof, self._prof = self._prof, None
+        if prof is not None:
+            _record(prof, prof["rows"], (prof["exec_s"] + prof["fetch_s"]) * 1000)
+        super().close()
+
+
+class _ProfiledConnection(sqlite3.Connection):
+    def cursor(self, factory=_ProfiledCursor):
+        return super().cursor(factory)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_prof_t0", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["_prof_t0"].pop()
+    is_sqlite = conn.dialect.name == "sqlite"
+    entry = {
+        "fp": fingerprint(statement),
+        "page": calling_page(),
+        "sql": statement,
+        "params": parameters,
+        "many": executemany,
+        "dbapi_conn": cursor.connection,
+        "explain": None,
+        "savepoint": not is_sqlite,
+    }
+    # Solo consultas y DML: EXPLAIN de DDL, SET, COMMIT... falla o no dice nada
+    if EXPLAINABLE.match(statement):
+        entry["explain"] = "EXPLAIN QUERY PLAN " if is_sqlite else "EXPLAIN "
+    if is_sqlite and cursor.description is not None and isinstance(cursor, _ProfiledCursor):
+        entry.update(exec_s=elapsed, fetch_s=0.0, rows=0)
+        cursor._prof = entry
+    else:
+        rows = cursor.rowcount if cursor.rowcount >= 0 else None
+        _record(entry, rows, elapsed * 1000)
+
+
+def get_query_stats() -> list[dict]:
+    """Resumen por huella, ordenado por tiempo total (lo más costoso primero)."""
+    out = []
+    with _stats_lock:
+        for s in _stats.values():
+            recent = sorted(s["recent_ms"])
+            p95 = recent[min(len(recent) - 1, int(round(0.95 * (len(recent) - 1))))]
+            out.append(
+                {
+                    "fingerprint": s["fingerprint"],
+                    "calls": s["calls"],
+                    "total_ms": round(s["total_ms"], 3),
+                    "avg_ms": round(s["total_ms"] / s["calls"], 3),
+                    "p95_ms": round(p95, 3),
+                    "max_ms": round(s["max_ms"], 3),
+                    "avg_rows": round(s["rows"] / s["calls"], 1),
+                    "pages": dict(s["pages"].most_common()),
+                }
+            )
+    return sorted(out, key=lambda r: r["total_ms"], reverse=True)
+
+
+def reset_query_stats() -> None:
+    with _stats_lock:
+        _stats.clear()
+
+
+def write_query_stats(path: Path = STATS_FILE) -> Path:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(get_query_stats(), indent=2, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+if PROFILE_ENABLED:
+    atexit.register(write_query_stats)
+
+
+def _sqlite_on_connect(dbapi_conn, _conn_record) -> None:
+    # SQLite no valida FK salvo que se active en cada conexión (en PostgreSQL siempre están activas)
+    cur = dbapi_conn.cursor()
+    cur.execute("PRAGMA foreign_keys = ON")
+    # WAL: los que leen no bloquean a los que escriben ni al revés (tableros, respaldo en línea).
+    # Queda grabado en el archivo; en :memory: o en solo lectura no cambia nada.
+    cur.execute("PRAGMA journal_mode = WAL")
+    cur.close()
+
+
+def get_engine(url: str | None = None, profile: bool | None = None) -> Engine:
+    # url explícita: scripts que trabajan sobre otra BD (sintética, respaldo, etc.)
+    url = url or get_database_url()
+    profile = PROFILE_ENABLED if profile is None else profile
     # SQLite necesita este flag para trabajar bien con Streamlit (hilos)
     connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
-    return create_engine(url, future=True, echo=False, connect_args=connect_args)
+    if profile and url.startswith("sqlite"):
+        connect_args["factory"] = _ProfiledConnection
+    # Servidor (PostgreSQL): descartar conexiones caídas del pool antes de usarlas
+    engine = create_engine(
+        url,
+        future=True,
+        echo=False,
+        connect_args=connect_args,
+        pool_pre_ping=not url.startswith("sqlite"),
+    )
+    if url.startswith("sqlite"):
+        event.listen(engine, "connect", _sqlite_on_connect)
+    if profile:
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    return engine
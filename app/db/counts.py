@@ -0,0 +1,288 @@
+# Conteo físico (inventario cíclico por zona, migración 009).
+# 1. open_count congela el saldo en libros de la ubicación: guarda el último transaction_id y el
+#    saldo por EPP × talla hasta ese id (los movimientos posteriores no cambian el conteo).
+# 2. El almacenero sube la hoja de conteo (EPP, talla, cantidad) o la llena en pantalla.
+# 3. count_diff cruza libros y conteo en un solo merge (sin recorrer fila por fila).
+# 4. post_count contabiliza todo en una transacción: un INSERT ... SELECT genera todos los ADJUST
+#    con la referencia del conteo, sea de 5 o de 500 líneas.
+import re
+import unicodedata
+from datetime import datetime
+
+import pandas as pd
+from sqlalchemy import text
+
+from .dictionaries import SIZE_ID_SQL, normalize_size, register_sizes
+from .frames import read_frame
+from .localtime import LOCAL_TZ
+from .movements import utc_now_str
+from .valuation import update_valuation
+
+# Encabezados aceptados en la hoja de conteo (se comparan normalizados)
+SHEET_COLUMNS = {
+    "epp": ("EPP", "ITEM", "DESCRIPCION", "ARTICULO"),
+    "talla": ("TALLA", "SIZE"),
+    "cantidad": ("CANTIDAD", "CONTEO", "CANT", "QTY", "FISICO"),
+}
+
+OPEN_COUNT_SQL = """
+INSERT INTO stock_counts (reference, project_id, location_id, frozen_txn_id, frozen_at, status, created_by)
+SELECT :ref, :pid, :lid, COALESCE(MAX(transaction_id), 0), :now_utc, 'ABIERTO', :user
+FROM transactions
+RETURNING count_id, frozen_txn_id
+"""
+
+# Saldo en libros al congelar (las líneas en cero no se guardan: si aparecen en el conteo, suman)
+FREEZE_LINES_SQL = """
+INSERT INTO stock_count_lines (count_id, item_id, size_id, book_qty)
+SELECT :cid, item_id, size_id, SUM(qty)
+FROM transactions
+WHERE project_id = :pid AND location_id = :lid AND transaction_id <= :frozen
+GROUP BY item_id, size_id
+HAVING SUM(qty) <> 0
+"""
+
+BOOK_LINES_SQL = """
+SELECT l.item_id, i.name AS epp, i.has_size, l.size_id, s.code AS talla, l.book_qty
+FROM stock_count_lines l
+JOIN items i ON i.item_id = l.item_id
+LEFT JOIN sizes s ON s.size_id = l.size_id
+WHERE l.count_id = :cid
+ORDER BY i.name, s.code
+"""
+
+INSERT_LINE_SQL = f"""
+INSERT INTO stock_count_lines (count_id, item_id, size_id, book_qty, counted_qty)
+VALUES (:cid, :iid, {SIZE_ID_SQL}, :book, :counted)
+"""
+
+# Todos los ajustes del conteo en una sola sentencia: diferencia = contado - libros
+POST_ADJUST_SQL = """
+INSERT INTO transactions (
+    txn_datetime, txn_type, project_id, location_id,
+    item_id, qty, size, size_id, employee_id,
+    request_number, reference, notes, created_by
+)
+SELECT
+    :now_utc, 'ADJUST', c.project_id, c.location_id,
+    l.item_id, l.counted_qty - l.book_qty, s.code, l.size_id, NULL,
+    NULL, c.reference, :notes, :user
+FROM stock_count_lines l
+JOIN stock_counts c ON c.count_id = l.count_id
+LEFT JOIN sizes s ON s.size_id = l.size_id
+WHERE l.count_id = :cid
+  AND l.counted_qty IS NOT NULL
+  AND l.counted_qty <> l.book_qty
+ORDER BY l.line_id
+"""
+
+
+def count_reference(location_code: str) -> str:
+    return f"CONTEO {location_code} {datetime.now(LOCAL_TZ).strftime('%Y-%m-%d %H:%M:%S')}"
+
+
+def open_count(conn, project_id: int, location_id: int, location_code: str, user: str) -> dict:
+    """Abre el conteo y congela el saldo (dentro de la transacción de `conn`). Devuelve el conteo."""
+    row = conn.execute(
+        text(OPEN_COUNT_SQL),
+        {
+            "ref": count_reference(location_code),
+            "pid": project_id,
+            "lid": location_id,
+            "now_utc": utc_now_str(),
+            "user": user,
+        },
+    ).one()
+    conn.execute(
+        text(FREEZE_LINES_SQL),
+        {"cid": row.count_id, "pid": project_id, "lid": location_id, "frozen": row.frozen_txn_id},
+    )
+    return get_count(conn, row.count_id)
+
+
+def get_count(conn, count_id: int) -> dict | None:
+    row = conn.execute(text("SELECT * FROM stock_counts WHERE count_id = :cid"), {"cid": count_id})
+    row = row.mappings().one_or_none()
+    return dict(row) if row else None
+
+
+def open_count_for(conn, project_id: int, location_id: int) -> dict | None:
+    """El conteo abierto de la ubicación (hay como máximo uno)."""
+    row = conn.execute(
+        text(
+            "SELECT * FROM stock_counts "
+            "WHERE project_id = :pid AND location_id = :lid AND status = 'ABIERTO'"
+        ),
+        {"pid": project_id, "lid": location_id},
+    ).mappings().one_or_none()
+    return dict(row) if row else None
+
+
+def book_lines(conn, count_id: int) -> pd.DataFrame:
+    return read_frame(conn, BOOK_LINES_SQL, {"cid": count_id}, categories=[])
+
+
+def _key(value) -> str:
+    """Nombre comparable: mayúsculas, sin tildes ni signos, espacios simples."""
+    s = unicodedata.normalize("NFKD", str(value)).encode("ascii", "ignore").decode()
+    s = re.sub(r"[^A-Z0-9]+", " ", s.upper())
+    return " ".join(s.split())
+
+
+def _sheet_column(df: pd.DataFrame, field: str) -> str | None:
+    names = {_key(c): c for c in df.columns}
+    return next((names[n] for n in SHEET_COLUMNS[field] if n in names), None)
+
+
+def parse_count_sheet(raw: pd.DataFrame, items: pd.DataFrame) -> tuple[pd.DataFrame, list[str]]:
+    """
+    Hoja de conteo (EPP, TALLA, CANTIDAD) -> item_id, talla, counted_qty (repetidos se suman;
+    sin cantidad = no contado).
+    `items`: item_id, name, has_size. Devuelve las líneas válidas y los errores por fila.
+    """
+    cols = {f: _sheet_column(raw, f) for f in SHEET_COLUMNS}
+    missing = [f.upper() for f in ("epp", "cantidad") if cols[f] is None]
+    if missing:
+        return pd.DataFrame(columns=["item_id", "talla", "counted_qty"]), [
+            "Faltan columnas: " + ", ".join(missing)
+        ]
+
+    sheet = pd.DataFrame(
+        {
+            "fila": raw.index + 2,  # fila de Excel (encabezado en la 1)
+            "epp": raw[cols["epp"]].astype("string"),
+            "key": raw[cols["epp"]].map(lambda v: _key(v) if pd.notna(v) else ""),
+            "talla": (
+                raw[cols["talla"]].map(lambda v: normalize_size(v) if pd.notna(v) else None)
+                if cols["talla"]
+                else None
+            ),
+            "counted_qty": pd.to_numeric(raw[cols["cantidad"]], errors="coerce").astype("float64"),
+        }
+    )
+    # Filas sin EPP o sin cantidad (hoja a medio llenar): no contadas
+    blank = raw[cols["cantidad"]].isna().to_numpy() | (
+        raw[cols["cantidad"]].astype("string").str.strip() == ""
+    ).fillna(True).to_numpy()
+    sheet = sheet[(sheet["key"] != "") & ~blank]
+
+    catalog = pd.DataFrame(
+        {
+            "key": items["name"].map(_key),
+            "item_id": items["item_id"].astype(int),
+            "has_size": items["has_size"].astype(int),
+        }
+    ).drop_duplicates("key")
+    sheet = sheet.merge(catalog, on="key", how="left")
+
+    bad_item = sheet["item_id"].isna()
+    bad_qty = ~bad_item & (sheet["counted_qty"].isna() | (sheet["counted_qty"] < 0))
+    bad_qty |= ~bad_item & (sheet["counted_qty"] != sheet["counted_qty"].round())
+    no_size = ~bad_item & (sheet["has_size"] == 1) & sheet["talla"].isna()
+    # Talla en un EPP sin talla: se ignora (hojas con "-" o "UNICA")
+    sheet.loc[~bad_item & (sheet["has_size"] == 0), "talla"] = None
+
+    errors = (
+        [f"Fila {r.fila}: EPP no encontrado ({r.epp})" for r in sheet[bad_item].itertuples()]
+        + [f"Fila {r.fila}: cantidad inválida ({r.epp})" for r in sheet[bad_qty].itertuples()]
+        + [f"Fila {r.fila}: falta la talla ({r.epp})" for r in sheet[no_size & ~bad_qty].itertuples()]
+    )
+
+    ok = sheet[~(bad_item | bad_qty | no_size)]
+    counted = (
+        ok.assign(
+            item_id=ok["item_id"].astype(int),
+            talla=ok["talla"].fillna(""),
+            counted_qty=ok["counted_qty"].astype(int),
+        )
+        .groupby(["item_id", "talla"], as_index=False)["counted_qty"]
+        .sum()
+    )
+    counted["talla"] = counted["talla"].replace("", None)
+    return counted[["item_id", "talla", "counted_qty"]], errors
+
+
+def count_diff(book: pd.DataFrame, counted: pd.DataFrame, missing_as_zero: bool = True) -> pd.DataFrame:
+    """
+    Libros vs conteo por EPP × talla, en un solo merge.
+    missing_as_zero: lo que está en libros y no en la hoja se contó en 0 (conteo completo de la zona);
+    si no, esas líneas quedan sin contar y no se ajustan.
+    """
+    left = pd.DataFrame(
+        {
+            "item_id": book["item_id"].astype(int),
+            "talla_key": book["talla"].astype(object).fillna(""),
+            "book_qty": book["book_qty"].astype(int),
+        }
+    )
+    right = pd.DataFrame(
+        {
+            "item_id": counted["item_id"].astype(int),
+            "talla_key": counted["talla"].astype(object).fillna(""),
+            "counted_qty": counted["counted_qty"].astype("Int64"),
+        }
+    )
+    diff = left.merge(right, on=["item_id", "talla_key"], how="outer")
+    diff["book_qty"] = diff["book_qty"].fillna(0).astype(int)
+    if missing_as_zero:
+        diff["counted_qty"] = diff["counted_qty"].fillna(0)
+    diff["diferencia"] = diff["counted_qty"] - diff["book_qty"]
+    diff["talla"] = diff["talla_key"].replace("", None)
+    return diff.drop(columns="talla_key").sort_values(["item_id", "talla"], na_position="first")[
+        ["item_id", "talla", "book_qty", "counted_qty", "diferencia"]
+    ].reset_index(drop=True)
+
+
+def post_count(conn, count_id: int, diff: pd.DataFrame, user: str) -> int:
+    """
+    Guarda las líneas del conteo y registra todos los ADJUST (dentro de la transacción de `conn`).
+    Devuelve cuántos ajustes se crearon. Falla si el conteo ya no está abierto.
+    """
+    now_utc = utc_now_str()
+    # Primera escritura: toma el bloqueo y evita contabilizar dos veces el mismo conteo
+    closed = conn.execute(
+        text(
+            "UPDATE stock_counts SET status = 'CONTABILIZADO', posted_at = :now_utc "
+            "WHERE count_id = :cid AND status = 'ABIERTO'"
+        ),
+        {"cid": count_id, "now_utc": now_utc},
+    ).rowcount
+    if closed != 1:
+        raise RuntimeError(f"El conteo {count_id} ya no está abierto.")
+    update_valuation(conn)
+
+    talla = diff["talla"].astype(object).where(diff["talla"].notna(), None)
+    register_sizes(conn, zip(diff["item_id"], talla))
+    conn.execute(text("DELETE FROM stock_count_lines WHERE count_id = :cid"), {"cid": count_id})
+    counted = diff["counted_qty"].astype(object).where(diff["counted_qty"].notna(), None)
+    lines = [
+        {
+            "cid": count_id,
+            "iid": int(iid),
+            "size": size,
+            "book": int(book),
+            "counted": None if c is None else int(c),
+        }
+        for iid, size, book, c in zip(diff["item_id"], talla, diff["book_qty"], counted)
+    ]
+    # Ubicación vacía y hoja vacía: el conteo se cierra sin líneas ni ajustes
+    if lines:
+        conn.execute(text(INSERT_LINE_SQL), lines)
+    n = conn.execute(
+        text(POST_ADJUST_SQL),
+        {"cid": count_id, "now_utc": now_utc, "notes": "Ajuste por conteo físico", "user": user},
+    ).rowcount
+    conn.execute(
+        text("UPDATE stock_counts SET adjust_count = :n WHERE count_id = :cid"),
+        {"cid": count_id, "n": n},
+    )
+    # Los ajustes negativos salen al costo promedio; los positivos entran a él
+    update_valuation(conn)
+    return n
+
+
+def cancel_count(conn, count_id: int) -> None:
+    conn.execute(
+        text("UPDATE stock_counts SET status = 'ANULADO' WHERE count_id = :cid AND status = 'ABIERTO'"),
+        {"cid": count_id},
+    )
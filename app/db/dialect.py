@@ -0,0 +1,90 @@
+# Diferencias SQLite / PostgreSQL en un solo lugar.
+# Los .sql de sql/ se escriben en el subconjunto común; aquí se adaptan al motor de destino.
+import re
+from pathlib import Path
+
+# SQLite: INTEGER PRIMARY KEY AUTOINCREMENT (ids crecientes que nunca se reutilizan, aunque se borre
+# el último: los cursores por transaction_id dependen de eso). PostgreSQL necesita una columna identity.
+# CREATE INDEX CONCURRENTLY (PostgreSQL, sin bloquear escrituras) no existe en SQLite.
+_SQLITE_REWRITES = [
+    (re.compile(r"\bCREATE\s+(UNIQUE\s+)?INDEX\s+CONCURRENTLY\b", re.IGNORECASE), r"CREATE \1INDEX"),
+]
+
+_PG_REWRITES = [
+    (
+        re.compile(r"\bINTEGER\s+PRIMARY\s+KEY(?:\s+AUTOINCREMENT)?\b", re.IGNORECASE),
+        "INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY",
+    ),
+]
+
+
+def split_sql(script: str) -> list[str]:
+    """Separa un script en sentencias respetando comillas y comentarios (un ';' dentro de un texto no corta)."""
+    statements, buf = [], []
+    i, n = 0, len(script)
+    quote = None
+    while i < n:
+        ch = script[i]
+        if quote:
+            buf.append(ch)
+            if ch == quote:
+                quote = None
+        elif ch in ("'", '"'):
+            quote = ch
+            buf.append(ch)
+        elif script.startswith("--", i):
+            j = script.find("\n", i)
+            j = n if j == -1 else j
+            buf.append(script[i:j])
+            i = j
+            continue
+        elif script.startswith("/*", i):
+            j = script.find("*/", i + 2)
+            j = n if j == -1 else j + 2
+            buf.append(script[i:j])
+            i = j
+            continue
+        elif ch == ";":
+            statements.append("".join(buf))
+            buf = []
+        else:
+            buf.append(ch)
+        i += 1
+    statements.append("".join(buf))
+    return [s.strip() for s in statements if _strip_comments(s).strip()]
+
+
+def _strip_comments(stmt: str) -> str:
+    stmt = re.sub(r"/\*.*?\*/", " ", stmt, flags=re.DOTALL)
+    return re.sub(r"--[^\n]*", " ", stmt)
+
+
+def adapt_sql(stmt: str, dialect: str) -> str | None:
+    """Adapta una sentencia al motor. None = no aplica (ej. PRAGMA fuera de SQLite)."""
+    if dialect == "sqlite":
+        for pattern, repl in _SQLITE_REWRITES:
+            stmt = pattern.sub(repl, stmt)
+        return stmt
+    if _strip_comments(stmt).strip().upper().startswith("PRAGMA"):
+        return None
+    if dialect == "postgresql":
+        for pattern, repl in _PG_REWRITES:
+            stmt = pattern.sub(repl, stmt)
+    return stmt
+
+
+def run_sql_script(conn, script: str | Path) -> int:
+    """Ejecuta un script .sql sentencia por sentencia en la transacción de `conn`. Devuelve cuántas corrió."""
+    if isinstance(script, Path):
+        script = script.read_text(encoding="utf-8")
+    n = 0
+    for stmt in split_sql(script):
+        stmt = adapt_sql(stmt, conn.dialect.name)
+        if stmt:
+            conn.exec_driver_sql(stmt)
+            n += 1
+    return n
+
+
+def is_sqlite(conn_or_engine) -> bool:
+    return conn_or_engine.dialect.name == "sqlite"
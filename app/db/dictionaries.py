@@ -0,0 +1,100 @@
+# Diccionarios de tallas y tipos de movimiento (migraciones 006-008).
+# - Talla: texto libre de los almacenes ("T/39", "39", "t/39 ") -> código canónico ("39") en la tabla
+#   sizes; transactions guarda el código y su size_id. Stock, filtros y anti-duplicado comparan
+#   size_id (entero), así las variantes ya no parten el stock.
+# - Tipo: txn_type sigue siendo el código legible; type_id es su entero (columna generada) y es lo
+#   que indexan y filtran las consultas.
+from sqlalchemy import text
+
+TXN_TYPE_IDS = {
+    "IN": 1,
+    "OUT": 2,
+    "RETURN": 3,
+    "ADJUST": 4,
+    "TRANSFER_IN": 5,
+    "TRANSFER_OUT": 6,
+    "RETURN_STOCK": 7,
+    "RETURN_SEGR": 8,
+    "BAJA": 9,
+    "OPENING": 10,
+}
+
+
+def normalize_size(raw) -> str | None:
+    """Talla canónica: sin espacios a los lados, en mayúsculas y sin el prefijo "T/". Vacía -> None."""
+    if raw is None:
+        return None
+    s = str(raw).strip().upper()
+    if s.startswith("T/"):
+        s = s[2:].strip()
+    return s or None
+
+
+def normalize_size_sql(col: str) -> str:
+    """La misma regla que normalize_size, en SQL (backfill por lotes y lectura de archivos históricos)."""
+    u = f"UPPER(TRIM({col}))"
+    return f"NULLIF(TRIM(CASE WHEN {u} LIKE 'T/%' THEN SUBSTR({u}, 3) ELSE {u} END), '')"
+
+
+# size_id de una talla canónica, para usar dentro de INSERT/WHERE (:size ya normalizada)
+SIZE_ID_SQL = "(SELECT size_id FROM sizes WHERE code = :size)"
+
+REGISTER_SIZE_SQL = """
+INSERT INTO sizes (code) VALUES (:size)
+ON CONFLICT (code) DO NOTHING
+"""
+
+REGISTER_ITEM_SIZE_SQL = f"""
+INSERT INTO item_sizes (item_id, size_id) VALUES (:iid, {SIZE_ID_SQL})
+ON CONFLICT (item_id, size_id) DO NOTHING
+"""
+
+
+def register_sizes(conn, pairs) -> None:
+    """Da de alta (si faltan) las tallas canónicas y su relación con el EPP: [(item_id, talla), ...]."""
+    rows = [{"iid": int(iid), "size": size} for iid, size in set(pairs) if size is not None]
+    if not rows:
+        return
+    conn.execute(text(REGISTER_SIZE_SQL), [{"size": s} for s in {r["size"] for r in rows}])
+    conn.execute(text(REGISTER_ITEM_SIZE_SQL), rows)
+
+
+def item_sizes(conn, item_id: int) -> list[str]:
+    """Tallas conocidas del EPP (las ya usadas en movimientos), para ofrecerlas en los formularios."""
+    rows = conn.execute(
+        text(
+            "SELECT s.code FROM item_sizes x JOIN sizes s ON s.size_id = x.size_id "
+            "WHERE x.item_id = :iid ORDER BY s.code"
+        ),
+        {"iid": item_id},
+    )
+    return [r[0] for r in rows]
+
+
+# Backfill (migración 008 y BD sintéticas): normaliza size y completa size_id en un rango de ids
+_NORM = normalize_size_sql("size")
+
+BACKFILL_SIZES_SQL = f"""
+INSERT INTO sizes (code)
+SELECT DISTINCT {_NORM} FROM transactions
+WHERE transaction_id > :lo AND transaction_id <= :hi AND {_NORM} IS NOT NULL
+ON CONFLICT (code) DO NOTHING
+"""
+
+BACKFILL_TXN_SQL = f"""
+UPDATE transactions
+SET size = {_NORM},
+    size_id = (SELECT size_id FROM sizes WHERE code = {_NORM})
+WHERE transaction_id > :lo AND transaction_id <= :hi AND size IS NOT NULL
+"""
+
+FILL_ITEM_SIZES_SQL = """
+INSERT INTO item_sizes (item_id, size_id)
+SELECT DISTINCT item_id, size_id FROM transactions WHERE size_id IS NOT NULL
+ON CONFLICT (item_id, size_id) DO NOTHING
+"""
+
+
+def backfill_sizes(conn, lo: int, hi: int) -> int:
+    conn.execute(text(BACKFILL_SIZES_SQL), {"lo": lo, "hi": hi})
+    return max(conn.execute(text(BACKFILL_TXN_SQL), {"lo": lo, "hi": hi}).rowcount, 0)
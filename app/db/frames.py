@@ -0,0 +1,64 @@
+# Carga de resultados a DataFrame (una sola forma para páginas y scripts).
+# - dtype_backend="pyarrow": textos y números quedan en buffers Arrow, no un objeto Python por celda.
+# - Las columnas de texto con pocos valores distintos (proyecto, EPP, trabajador, tipo, talla,
+#   notas de motivo...) pasan a category: cada valor se guarda una vez y las filas llevan un código.
+# Con decenas de sesiones abiertas, cada una con su kardex y su consumo en memoria, es lo que más pesa.
+# Al agrupar por una columna category usar observed=True (solo los valores presentes).
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import text
+
+# Una columna de texto es "repetitiva" si tiene como máximo esta fracción de valores distintos
+CATEGORY_MAX_RATIO = 0.5
+# Debajo de estas filas no compensa (catálogos chicos, resultados de una fila)
+CATEGORY_MIN_ROWS = 50
+
+
+def read_frame(conn, sql: str, params: dict | None = None, categories: list[str] | None = None) -> pd.DataFrame:
+    """
+    pd.read_sql con tipos Arrow y columnas repetitivas como category.
+    `categories`: columnas a convertir (None = detectar por cardinalidad; [] = ninguna).
+    """
+    df = pd.read_sql(text(sql), conn, params=params, dtype_backend="pyarrow")
+    return compact(df, categories)
+
+
+def _is_text(s: pd.Series) -> bool:
+    if isinstance(s.dtype, pd.ArrowDtype):
+        return pa.types.is_string(s.dtype.pyarrow_dtype) or pa.types.is_large_string(s.dtype.pyarrow_dtype)
+    return pd.api.types.is_string_dtype(s.dtype) and not isinstance(s.dtype, pd.CategoricalDtype)
+
+
+def compact(df: pd.DataFrame, categories: list[str] | None = None) -> pd.DataFrame:
+    """Convierte a category las columnas indicadas o, si no se indican, las de texto repetitivas."""
+    if categories is None:
+        n = len(df)
+        if n < CATEGORY_MIN_ROWS:
+            return df
+        categories = [
+            c for c in df.columns if _is_text(df[c]) and df[c].nunique() <= n * CATEGORY_MAX_RATIO
+        ]
+    for c in categories:
+        df[c] = df[c].astype("category")
+    return df
+
+
+def frame_bytes(df: pd.DataFrame) -> int:
+    """Memoria real del DataFrame (deep: incluye los textos, no solo los punteros)."""
+    return int(df.memory_usage(deep=True, index=True).sum())
+
+
+def memory_report(frames: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """nombre -> filas, columnas, MB y las columnas category de cada resultado."""
+    return pd.DataFrame(
+        [
+            {
+                "resultado": name,
+                "filas": len(df),
+                "columnas": df.shape[1],
+                "mb": round(frame_bytes(df) / 1024**2, 3),
+                "category": ", ".join(c for c in df.columns if isinstance(df[c].dtype, pd.CategoricalDtype)),
+            }
+            for name, df in frames.items()
+        ]
+    )
@@ -0,0 +1,201 @@
+# Verificación de integridad del kardex.
+# El stock es SUM(qty) y las correcciones son movimientos nuevos: un dato malo no rompe nada visible,
+# solo queda escondido en el histórico. Estas consultas lo buscan, un proyecto a la vez (el script
+# scripts/check_ledger.py reparte los proyectos entre procesos):
+# - SALDO_NEGATIVO: cada vez que el saldo acumulado (proyecto × EPP × talla, en orden cronológico)
+#   pasó de >= 0 a negativo, con el mínimo al que llegó y cuándo se recuperó (la función de ventana
+#   calcula el saldo y filtra los puntos en rojo; los tramos se agrupan en pandas).
+# - SIGNO: qty con el signo contrario al de su tipo, qty = 0 o tipo desconocido.
+# - UBICACION: ubicación inexistente o de otro proyecto (la única compartida es la de segregación).
+# - PROYECTO: movimientos de un proyecto que no existe (una sola consulta para todo, orphan_findings).
+# Se recorre todo el histórico: archivo + BD viva (db/archive.py).
+import pandas as pd
+
+from .archive import transactions_source
+from .frames import read_frame
+
+# Signo esperado de qty por tipo: +1 entra, -1 sale, 0 cualquiera distinto de cero
+TXN_SIGNS = {
+    "IN": 1,
+    "OUT": -1,
+    "RETURN": 1,
+    "ADJUST": 0,
+    "TRANSFER_IN": 1,
+    "TRANSFER_OUT": -1,
+    "RETURN_STOCK": 1,
+    "RETURN_SEGR": 1,
+    "BAJA": -1,
+    "OPENING": 0,
+}
+
+COLUMNS = ["check", "proyecto", "transaction_id", "fecha", "tipo", "epp", "talla", "ubicacion", "qty", "detalle"]
+
+# Orden cronológico del saldo (mismo orden que el kardex)
+_WINDOW = "PARTITION BY t.item_id, t.size_id ORDER BY t.txn_datetime, t.transaction_id"
+
+# Solo los movimientos que dejan el saldo negativo o parten de uno negativo (los tramos en rojo y
+# el movimiento que los cierra); los tramos se arman en negative_episodes
+NEGATIVE_SQL = """
+SELECT transaction_id, txn_datetime, item_id, size_id, qty, balance
+FROM (
+  SELECT t.transaction_id, t.txn_datetime, t.item_id, t.size_id, t.qty,
+         SUM(t.qty) OVER ({window} ROWS UNBOUNDED PRECEDING) AS balance
+  FROM {source} t
+  WHERE t.project_id = :pid
+) r
+WHERE balance < 0 OR balance - qty < 0
+ORDER BY item_id, size_id, txn_datetime, transaction_id
+"""
+
+# Signo por tipo y ubicación/proyecto en una sola pasada por los movimientos del proyecto
+_SIGN_ERROR = """(t.qty = 0
+       OR (t.txn_type IN ({positive}) AND t.qty < 0)
+       OR (t.txn_type IN ({negative}) AND t.qty > 0)
+       OR t.txn_type NOT IN ({known}))"""
+_LOCATION_ERROR = """(l.location_id IS NULL
+       OR NOT (COALESCE(l.project_id = t.project_id, 0) = 1
+                   OR (l.project_id IS NULL AND l.is_segregation = 1)))"""
+
+RULES_SQL = f"""
+SELECT t.transaction_id, t.txn_datetime AS fecha, t.txn_type AS tipo, t.item_id, t.size_id,
+       t.location_id, t.qty,
+       CASE WHEN NOT {_SIGN_ERROR} THEN NULL
+            WHEN t.txn_type NOT IN ({{known}}) THEN 'tipo desconocido'
+            WHEN t.qty = 0 THEN 'qty = 0'
+            ELSE 'signo invertido' END AS signo,
+       CASE WHEN NOT {_LOCATION_ERROR} THEN NULL
+            WHEN l.location_id IS NULL THEN 'ubicación inexistente'
+            ELSE 'ubicación de ' || COALESCE(lp.code, 'ningún proyecto') END AS ubicacion
+FROM {{source}} t
+LEFT JOIN locations l ON l.location_id = t.location_id
+LEFT JOIN projects lp ON lp.project_id = l.project_id
+WHERE t.project_id = :pid
+  AND ({_SIGN_ERROR} OR {_LOCATION_ERROR})
+"""
+
+# Movimientos de un project_id que no existe (no caen en ningún proyecto a verificar)
+ORPHAN_SQL = """
+SELECT t.project_id, COUNT(*) AS movimientos, MIN(t.transaction_id) AS transaction_id,
+       MIN(t.txn_datetime) AS fecha
+FROM {source} t
+LEFT JOIN projects p ON p.project_id = t.project_id
+WHERE p.project_id IS NULL
+GROUP BY t.project_id
+"""
+
+CATALOGS_SQL = {
+    "projects": "SELECT project_id, code FROM projects",
+    "items": "SELECT item_id, name FROM items",
+    "sizes": "SELECT size_id, code FROM sizes",
+    "locations": "SELECT location_id, code FROM locations",
+}
+
+
+def _codes(types: list[str]) -> str:
+    return ", ".join(f"'{t}'" for t in types)
+
+
+def _rules_sql(source: str) -> str:
+    return RULES_SQL.format(
+        source=source,
+        positive=_codes([t for t, s in TXN_SIGNS.items() if s > 0]),
+        negative=_codes([t for t, s in TXN_SIGNS.items() if s < 0]),
+        known=_codes(list(TXN_SIGNS)),
+    )
+
+
+def negative_episodes(points: pd.DataFrame) -> pd.DataFrame:
+    """
+    Un tramo por cada vez que el saldo pasó de >= 0 a negativo: el movimiento que lo cruzó, el saldo
+    mínimo, cuántos movimientos quedó en rojo y cuándo volvió a >= 0 (None = sigue negativo).
+    """
+    cols = ["transaction_id", "fecha", "item_id", "size_id", "min_balance", "negative_rows", "recovered_at"]
+    if points.empty:
+        return pd.DataFrame(columns=cols)
+    df = points.assign(size_id=points["size_id"].astype("Int64").fillna(-1))
+    keys = [df["item_id"], df["size_id"]]
+    negative = df["balance"] < 0
+    start = negative & (df["balance"] - df["qty"] >= 0)
+    df["episode"] = start.astype(int).groupby(keys).cumsum()
+    df["neg_dt"] = df["txn_datetime"].where(negative)
+    df["pos_dt"] = df["txn_datetime"].where(~negative)
+    df["start_id"] = df["transaction_id"].where(start)
+    out = df.groupby(["item_id", "size_id", "episode"], sort=False).agg(
+        transaction_id=("start_id", "first"),
+        fecha=("neg_dt", "first"),
+        min_balance=("balance", "min"),
+        negative_rows=("neg_dt", "count"),
+        recovered_at=("pos_dt", "first"),
+    )
+    out = out.reset_index()
+    out["size_id"] = out["size_id"].where(out["size_id"] != -1)
+    return out[cols]
+
+
+def check_project(conn, project_id: int) -> dict[str, pd.DataFrame]:
+    """Las tres verificaciones de un proyecto sobre todo su histórico, sin nombres (ids)."""
+    source = transactions_source(conn)
+    params = {"pid": project_id}
+    points = read_frame(conn, NEGATIVE_SQL.format(source=source, window=_WINDOW), params, categories=[])
+    rules = read_frame(conn, _rules_sql(source), params, categories=[])
+    return {
+        "SALDO_NEGATIVO": negative_episodes(points),
+        "SIGNO": rules[rules["signo"].notna()].rename(columns={"signo": "detalle"}),
+        "UBICACION": rules[rules["ubicacion"].notna()].rename(columns={"ubicacion": "detalle"}),
+    }
+
+
+def findings_frame(project_id: int, checks: dict[str, pd.DataFrame], catalogs: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Resultado de check_project en una tabla legible (una fila por hallazgo, columnas COLUMNS)."""
+    names = {
+        "proyecto": dict(zip(catalogs["projects"]["project_id"], catalogs["projects"]["code"])),
+        "epp": dict(zip(catalogs["items"]["item_id"], catalogs["items"]["name"])),
+        "talla": dict(zip(catalogs["sizes"]["size_id"], catalogs["sizes"]["code"])),
+        "ubicacion": dict(zip(catalogs["locations"]["location_id"], catalogs["locations"]["code"])),
+    }
+    frames = []
+    for check, df in checks.items():
+        if df.empty:
+            continue
+        out = pd.DataFrame(
+            {
+                "check": check,
+                "proyecto": names["proyecto"].get(project_id, str(project_id)),
+                "transaction_id": df["transaction_id"],
+                "fecha": df["fecha"],
+                "epp": df["item_id"].map(names["epp"]),
+                "talla": df["size_id"].map(names["talla"]),
+            }
+        )
+        if check == "SALDO_NEGATIVO":
+            recovered = df["recovered_at"].astype(object).where(df["recovered_at"].notna(), None)
+            out["detalle"] = [
+                f"saldo mínimo {int(m)} en {int(n)} movimientos; "
+                + (f"recuperado {r}" if r else "sigue negativo")
+                for m, n, r in zip(df["min_balance"], df["negative_rows"], recovered)
+            ]
+        else:
+            out["tipo"] = df["tipo"]
+            out["ubicacion"] = df["location_id"].map(names["ubicacion"])
+            out["qty"] = df["qty"]
+            out["detalle"] = df["detalle"]
+        frames.append(out.reindex(columns=COLUMNS))
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS)
+
+
+def orphan_findings(conn) -> pd.DataFrame:
+    df = read_frame(conn, ORPHAN_SQL.format(source=transactions_source(conn)), categories=[])
+    out = pd.DataFrame(
+        {
+            "check": "PROYECTO",
+            "proyecto": df["project_id"].astype(str),
+            "transaction_id": df["transaction_id"],
+            "fecha": df["fecha"],
+            "detalle": [f"proyecto inexistente ({int(n)} movimientos)" for n in df["movimientos"]],
+        }
+    )
+    return out.reindex(columns=COLUMNS)
+
+
+def load_catalogs(conn) -> dict[str, pd.DataFrame]:
+    return {name: read_frame(conn, sql, categories=[]) for name, sql in CATALOGS_SQL.items()}
@@ -0,0 +1,31 @@
+# Estrategia de fechas/horas (una sola para páginas y scripts):
+# - En BD, txn_datetime se guarda en UTC como texto 'YYYY-MM-DD HH:MM:SS'
+# - Se muestra y filtra en hora local (America/Lima, UTC-5 sin horario de verano)
+# - txn_local_date (migración 005) es la fecha local calculada e indexada por la BD: los filtros
+#   por día y las agrupaciones por día/mes la usan directamente, sin convertir en Python
+from datetime import date, datetime, time, timezone
+from zoneinfo import ZoneInfo
+
+import pandas as pd
+
+LOCAL_TZ = ZoneInfo("America/Lima")
+UTC_TZ = timezone.utc
+DB_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+
+def utc_bounds(date_start: date | str, date_end: date | str) -> tuple[str, str]:
+    """Rango de días locales [desde 00:00, hasta 23:59:59] como texto UTC (formato de txn_datetime)."""
+    date_start, date_end = date.fromisoformat(str(date_start)), date.fromisoformat(str(date_end))
+    start = datetime.combine(date_start, time.min).replace(tzinfo=LOCAL_TZ)
+    end = datetime.combine(date_end, time(23, 59, 59)).replace(tzinfo=LOCAL_TZ)
+    return start.astimezone(UTC_TZ).strftime(DB_FORMAT), end.astimezone(UTC_TZ).strftime(DB_FORMAT)
+
+
+def to_local(values: pd.Series) -> pd.Series:
+    """Texto UTC de la BD -> datetime local (tz-aware), en una sola pasada vectorizada."""
+    return pd.to_datetime(values, format="ISO8601", errors="coerce", utc=True).dt.tz_convert(LOCAL_TZ)
+
+
+def to_local_str(values: pd.Series) -> pd.Series:
+    """Texto UTC de la BD -> texto en hora local, para tablas y exportaciones (Arrow, como db/frames.py)."""
+    return to_local(values).dt.strftime(DB_FORMAT).astype("string[pyarrow]")
@@ -0,0 +1,248 @@
+# Migraciones versionadas (sql/migrations).
+# - NNN_nombre.sql: esquema. Cada archivo corre en su propia transacción y queda registrado en
+#   schema_migrations. Con "-- migrate: no-transaction" en la cabecera corre en autocommit
+#   (PostgreSQL: CREATE INDEX CONCURRENTLY no admite transacción).
+#   NNN_nombre.<motor>.sql (sqlite / postgresql): solo para ese motor, cuando el SQL común no alcanza.
+# - NNN_nombre.py: datos por lotes sobre una tabla grande (backfills, tablas resumen). Define
+#   TABLE, KEY (columna entera creciente) y BATCH_SQL (con :lo y :hi) o run_batch(conn, lo, hi).
+#   Opcionales: BATCH_SIZE y finalize(conn). Cada lote es una transacción corta que guarda su
+#   avance en migration_progress: si se corta, la siguiente corrida retoma desde el último lote.
+import hashlib
+import importlib.util
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+
+from app.db.dialect import run_sql_script
+
+MIGRATIONS_DIR = Path(__file__).resolve().parents[2] / "sql" / "migrations"
+DEFAULT_BATCH_SIZE = 20_000
+
+BOOKKEEPING_SQL = """
+CREATE TABLE IF NOT EXISTS schema_migrations (
+  version     TEXT PRIMARY KEY,
+  name        TEXT NOT NULL,
+  kind        TEXT NOT NULL,
+  checksum    TEXT NOT NULL,
+  applied_at  TEXT NOT NULL,
+  duration_ms INTEGER
+);
+
+CREATE TABLE IF NOT EXISTS migration_progress (
+  version     TEXT PRIMARY KEY,
+  last_key    INTEGER NOT NULL,
+  target_key  INTEGER NOT NULL,
+  rows_done   INTEGER NOT NULL DEFAULT 0,
+  updated_at  TEXT NOT NULL
+);
+"""
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def discover(dialect: str, directory: Path = MIGRATIONS_DIR) -> list[dict]:
+    """Migraciones disponibles para el motor, en orden de versión (prefijo numérico del archivo)."""
+    out = []
+    for path in sorted(directory.glob("[0-9]*_*")):
+        if path.suffix not in (".sql", ".py"):
+            continue
+        name, _, only_for = path.stem.partition(".")
+        if only_for and only_for != dialect:
+            continue
+        version = path.name.split("_", 1)[0]
+        out.append(
+            {
+                "version": version,
+                "name": name,
+                "path": path,
+                "kind": "data" if path.suffix == ".py" else "sql",
+                "checksum": hashlib.sha256(path.read_bytes()).hexdigest()[:16],
+            }
+        )
+    versions = [m["version"] for m in out]
+    dup = {v for v in versions if versions.count(v) > 1}
+    if dup:
+        raise RuntimeError(f"Versiones de migración repetidas: {sorted(dup)}")
+    return out
+
+
+# BD creadas antes del registro (init_db solo aplicaba 001; 002/003 a mano o desde scripts):
+# se detecta lo que ya existe para no reaplicarlo (003 hace ALTER TABLE ADD COLUMN).
+def _legacy_applied(conn) -> set[str]:
+    insp = inspect(conn)
+    tables = set(insp.get_table_names())
+    if "transactions" not in tables:
+        return set()
+    done = {"001"}
+    if "ux_items_name" in {ix["name"] for ix in insp.get_indexes("items")}:
+        done.add("002")
+    if "source_key" in {c["name"] for c in insp.get_columns("transactions")}:
+        done.add("003")
+    return done
+
+
+def _ensure_bookkeeping(engine) -> None:
+    with engine.begin() as conn:
+        fresh = "schema_migrations" not in inspect(conn).get_table_names()
+        run_sql_script(conn, BOOKKEEPING_SQL)
+        if fresh:
+            by_version = {m["version"]: m for m in discover(engine.dialect.name)}
+            for version in sorted(_legacy_applied(conn)):
+                m = by_version.get(version)
+                if m:
+                    _mark_applied(conn, m, None)
+
+
+def _mark_applied(conn, m: dict, duration_ms: int | None) -> None:
+    conn.execute(
+        text(
+            "INSERT INTO schema_migrations (version, name, kind, checksum, applied_at, duration_ms) "
+            "VALUES (:v, :n, :k, :c, :t, :d)"
+        ),
+        {
+            "v": m["version"],
+            "n": m["name"],
+            "k": m["kind"],
+            "c": m["checksum"],
+            "t": _now(),
+            "d": duration_ms,
+        },
+    )
+
+
+def applied(engine) -> dict[str, dict]:
+    _ensure_bookkeeping(engine)
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT * FROM schema_migrations")).mappings().all()
+    return {r["version"]: dict(r) for r in rows}
+
+
+def status(engine) -> list[dict]:
+    """Estado de cada migración: aplicada / pendiente / en curso (datos), y si el archivo cambió."""
+    done = applied(engine)
+    with engine.connect() as conn:
+        progress = {
+            r["version"]: dict(r)
+            for r in conn.execute(text("SELECT * FROM migration_progress")).mappings()
+        }
+    out = []
+    for m in discover(engine.dialect.name):
+        row = {"version": m["version"], "name": m["name"], "kind": m["kind"]}
+        if m["version"] in done:
+            row["estado"] = "aplicada"
+            row["applied_at"] = done[m["version"]]["applied_at"]
+            row["modificada"] = done[m["version"]]["checksum"] != m["checksum"]
+        elif m["version"] in progress:
+            p = progress[m["version"]]
+            row["estado"] = f"en curso ({p['last_key']}/{p['target_key']})"
+        else:
+            row["estado"] = "pendiente"
+        out.append(row)
+    return out
+
+
+def _load_module(path: Path):
+    spec = importlib.util.spec_from_file_location(f"migration_{path.stem}", path)
+    mod = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(mod)
+    if not hasattr(mod, "BATCH_SQL") and not hasattr(mod, "run_batch"):
+        raise RuntimeError(f"{path.name}: define BATCH_SQL o run_batch(conn, lo, hi)")
+    return mod
+
+
+def _apply_sql(engine, m: dict) -> None:
+    script = m["path"].read_text(encoding="utf-8")
+    if "-- migrate: no-transaction" in script:
+        with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+            run_sql_script(conn, script)
+        with engine.begin() as conn:
+            _mark_applied(conn, m, None)
+        return
+    t0 = time.perf_counter()
+    with engine.begin() as conn:
+        run_sql_script(conn, script)
+        _mark_applied(conn, m, int((time.perf_counter() - t0) * 1000))
+
+
+def _apply_data(engine, m: dict, batch_size: int | None, pause_ms: int, log) -> None:
+    mod = _load_module(m["path"])
+    table, key = mod.TABLE, mod.KEY
+    size = batch_size or getattr(mod, "BATCH_SIZE", DEFAULT_BATCH_SIZE)
+    t0 = time.perf_counter()
+
+    with engine.begin() as conn:
+        prog = conn.execute(
+            text("SELECT last_key, target_key, rows_done FROM migration_progress WHERE version=:v"),
+            {"v": m["version"]},
+        ).one_or_none()
+        resumed = prog is not None
+        if prog is None:
+            lo_start = conn.execute(text(f"SELECT COALESCE(MIN({key}), 1) - 1 FROM {table}")).scalar_one()
+            # Tope fijo al empezar: lo que se inserte después ya lo escribe la app con el esquema nuevo
+            target = conn.execute(text(f"SELECT COALESCE(MAX({key}), 0) FROM {table}")).scalar_one()
+            conn.execute(
+                text(
+                    "INSERT INTO migration_progress (version, last_key, target_key, rows_done, updated_at) "
+                    "VALUES (:v, :lo, :t, 0, :u)"
+                ),
+                {"v": m["version"], "lo": lo_start, "t": target, "u": _now()},
+            )
+            prog = (lo_start, target, 0)
+    last, target, rows_done = prog
+    if resumed:
+        log(f"   ↪ retomando {m['name']} desde {key} > {last}")
+
+    while last < target:
+        hi = min(last + size, target)
+        with engine.begin() as conn:
+            if hasattr(mod, "run_batch"):
+                n = mod.run_batch(conn, last, hi)
+            else:
+                n = max(conn.execute(text(mod.BATCH_SQL), {"lo": last, "hi": hi}).rowcount, 0)
+            rows_done += n or 0
+            conn.execute(
+                text(
+                    "UPDATE migration_progress SET last_key=:hi, rows_done=:r, updated_at=:u WHERE version=:v"
+                ),
+                {"hi": hi, "r": rows_done, "u": _now(), "v": m["version"]},
+            )
+        last = hi
+        log(f"   … {m['name']}: {key} ≤ {hi:,} / {target:,} ({rows_done:,} filas)")
+        if pause_ms:
+            time.sleep(pause_ms / 1000)  # deja pasar a las escrituras de la app entre lotes
+
+    with engine.begin() as conn:
+        if hasattr(mod, "finalize"):
+            mod.finalize(conn)
+        conn.execute(text("DELETE FROM migration_progress WHERE version=:v"), {"v": m["version"]})
+        _mark_applied(conn, m, int((time.perf_counter() - t0) * 1000))
+
+
+def migrate(
+    engine,
+    target: str | None = None,
+    batch_size: int | None = None,
+    pause_ms: int = 0,
+    log=print,
+) -> list[str]:
+    """Aplica en orden las migraciones pendientes (hasta `target`, inclusive). Devuelve las aplicadas."""
+    done = applied(engine)
+    ran = []
+    for m in discover(engine.dialect.name):
+        if target is not None and m["version"] > target:
+            break
+        if m["version"] in done:
+            if done[m["version"]]["checksum"] != m["checksum"]:
+                log(f"⚠️ {m['name']} cambió después de aplicarse (no se reaplica)")
+            continue
+        log(f"🛠️ Aplicando {m['name']} ({m['kind']})")
+        if m["kind"] == "sql":
+            _apply_sql(engine, m)
+        else:
+            _apply_data(engine, m, batch_size, pause_ms, log)
+        ran.append(m["version"])
+    return ran
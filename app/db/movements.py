@@ -0,0 +1,81 @@
+# Escritura de movimientos desde las páginas de ingreso/entrega.
+# Mismo SQL que usan las páginas; los scripts (pruebas de carga, etc.) lo reutilizan.
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from .dictionaries import SIZE_ID_SQL, register_sizes
+from .offline import offline_key
+
+# Ventana anti-duplicado: se calcula en Python (:since_utc) para no depender de
+# funciones de fecha del motor.
+DUP_WINDOW_SECONDS = 10
+
+# Anti-duplicado (misma entrega en los últimos 10 segundos)
+DUP_OUT_SQL = f"""
+SELECT transaction_id
+FROM transactions
+WHERE txn_type='OUT'
+  AND project_id=:pid
+  AND employee_id=:eid
+  AND item_id=:iid
+  AND qty=:neg_qty
+  AND ((:size IS NULL AND size_id IS NULL) OR size_id = {SIZE_ID_SQL})
+  AND txn_datetime >= :since_utc
+ORDER BY transaction_id DESC
+LIMIT 1;
+"""
+
+DUP_IN_SQL = f"""
+SELECT transaction_id
+FROM transactions
+WHERE txn_type='IN'
+  AND project_id=:pid
+  AND location_id=:lid
+  AND item_id=:iid
+  AND qty=:qty
+  AND ((:size IS NULL AND size_id IS NULL) OR size_id = {SIZE_ID_SQL})
+  AND txn_datetime >= :since_utc
+LIMIT 1;
+"""
+
+INSERT_OUT_SQL = f"""
+INSERT INTO transactions (
+    txn_datetime, txn_type, project_id, location_id,
+    item_id, qty, size, size_id, employee_id,
+    request_number, reference, notes, created_by, source_key
+) VALUES (
+    :now_utc,'OUT',:pid,:lid,
+    :iid,:qty,:size,{SIZE_ID_SQL},:eid,
+    NULL,NULL,:notes,'kevin',:source_key
+)
+RETURNING transaction_id
+"""
+
+INSERT_IN_SQL = f"""
+INSERT INTO transactions (
+    txn_datetime, txn_type, project_id, location_id,
+    item_id, qty, size, size_id, employee_id,
+    request_number, reference, notes, created_by, source_key, unit_cost
+) VALUES (
+    :now_utc,'IN',:pid,:lid,
+    :iid,:qty,:size,{SIZE_ID_SQL},NULL,
+    NULL,:ref,:notes,'kevin',:source_key,:unit_cost
+)
+RETURNING transaction_id
+"""
+
+
+def utc_now_str(seconds_ago: int = 0) -> str:
+    return (datetime.now(timezone.utc) - timedelta(seconds=seconds_ago)).strftime(
+        "%Y-%m-%d %H:%M:%S"
+    )
+
+
+def insert_movement(conn, sql: str, params: dict) -> int:
+    """Inserta un movimiento dentro de la transacción de `conn` y devuelve su transaction_id (RETURNING).
+    params["size"] debe venir normalizada (normalize_size): aquí se registra en el diccionario.
+    En modo sin conexión (db/offline.py) el movimiento lleva su id de cliente en source_key.
+    params["unit_cost"] (opcional, solo IN): costo de compra para la valorización (db/valuation.py)."""
+    register_sizes(conn, [(params["iid"], params["size"])])
+    return conn.execute(text(sql), {"source_key": offline_key(), "unit_cost": None, **params}).scalar_one()
@@ -0,0 +1,32 @@
+# Captura sin conexión en frentes alejados.
+# El frente trabaja con su propio archivo SQLite (mismas migraciones y tabla transactions) con
+# DATABASE_URL=sqlite:///data/offline/<frente>.db y OFFLINE_DEVICE=<frente>. Cada movimiento que
+# registran las páginas lleva un id generado en el cliente en source_key ("OFF-<frente>-<uuid>"):
+# la BD central lo usa como clave única, así reenviar el mismo lote no duplica nada.
+# Sincronización (catálogos/saldos hacia el frente, movimientos hacia la central):
+# scripts/offline_sync.py.
+import os
+import uuid
+
+OFFLINE_DEVICE = os.getenv("OFFLINE_DEVICE") or None
+OFFLINE_PREFIX = "OFF-"
+# Saldos traídos de la central al preparar el archivo (no se sincronizan de vuelta)
+CENTRAL_BALANCE_REF = "SALDO CENTRAL"
+
+# Estado de sincronización, solo en el archivo del frente
+SYNC_TABLE_SQL = """
+CREATE TABLE IF NOT EXISTS offline_sync (
+  source_key  TEXT PRIMARY KEY,
+  central_id  INTEGER,
+  status      TEXT NOT NULL,      -- OK / CONFLICTO
+  detail      TEXT,
+  synced_at   TEXT NOT NULL
+)
+"""
+
+
+def offline_key() -> str | None:
+    """Id de cliente para un movimiento nuevo (None si la app trabaja contra la BD central)."""
+    if not OFFLINE_DEVICE:
+        return None
+    return f"{OFFLINE_PREFIX}{OFFLINE_DEVICE}-{uuid.uuid4().hex}"
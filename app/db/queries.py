@@ -0,0 +1,143 @@
+# SQL de las páginas, sin dependencias de Streamlit.
+# Las páginas y los scripts (benchmarks, reportes) usan exactamente las mismas consultas.
+# `source` es lo que va en "FROM ... t": la tabla viva o su unión con el archivo (db/archive.py).
+# Movimientos y consumo ya no son SQL: salen de la instantánea Arrow (db/snapshot.py).
+# Rangos de fechas: días locales 'YYYY-MM-DD' contra txn_local_date (indexada, ver db/localtime.py).
+# Tallas y tipos se comparan por su entero (size_id / type_id, ver db/dictionaries.py); :size es
+# la talla ya normalizada.
+from .dictionaries import SIZE_ID_SQL, TXN_TYPE_IDS, normalize_size
+
+# Tablero en vivo (db/stock_live.py): el mismo saldo con las claves para actualizarlo por partes
+STOCK_BOARD_SQL = """
+SELECT
+    i.item_id,
+    t.size_id,
+    i.name AS epp,
+    COALESCE(s.code, '-') AS talla,
+    COALESCE(SUM(t.qty), 0) AS stock
+FROM items i
+LEFT JOIN transactions t
+    ON t.item_id = i.item_id
+    AND t.project_id = (SELECT project_id FROM projects WHERE code = :project)
+LEFT JOIN sizes s ON s.size_id = t.size_id
+WHERE i.is_active = 1
+GROUP BY i.item_id, i.name, t.size_id, s.code
+ORDER BY i.name, talla;
+"""
+
+# Saldos de los EPP con movimientos después de :after (rango por PK + índice proyecto/EPP)
+STOCK_TOUCHED_SQL = """
+SELECT
+    i.item_id,
+    t.size_id,
+    i.name AS epp,
+    COALESCE(s.code, '-') AS talla,
+    SUM(t.qty) AS stock
+FROM transactions t
+JOIN items i ON i.item_id = t.item_id
+LEFT JOIN sizes s ON s.size_id = t.size_id
+WHERE t.project_id = (SELECT project_id FROM projects WHERE code = :project)
+  AND t.item_id IN (
+      SELECT item_id FROM transactions
+      WHERE transaction_id > :after AND transaction_id <= :upto
+        AND project_id = (SELECT project_id FROM projects WHERE code = :project)
+  )
+  AND i.is_active = 1
+GROUP BY i.item_id, i.name, t.size_id, s.code
+"""
+
+STOCK_SQL = f"""
+SELECT COALESCE(SUM(qty), 0) AS stock
+FROM transactions
+WHERE project_id=:pid
+  AND item_id=:iid
+  AND ((:size IS NULL AND size_id IS NULL) OR size_id = {SIZE_ID_SQL});
+"""
+
+
+def _size_filter(size_mode: str, size_value: str | None, where: list, params: dict) -> None:
+    if size_mode == "sin talla":
+        where.append("t.size_id IS NULL")
+    elif size_mode == "talla específica" and normalize_size(size_value):
+        # Talla desconocida -> subconsulta NULL -> sin filas (no cae en "sin talla")
+        where.append(f"t.size_id = {SIZE_ID_SQL}")
+        params["size"] = normalize_size(size_value)
+
+
+def kardex_item_query(
+    project_id: int,
+    item_id: int,
+    size_mode: str,
+    size_value: str | None,
+    source: str = "transactions",
+) -> tuple[str, dict]:
+    where = ["t.project_id = :pid", "t.item_id = :iid"]
+    params = {"pid": project_id, "iid": item_id}
+    _size_filter(size_mode, size_value, where, params)
+
+    q = f"""
+    SELECT
+      t.transaction_id AS id,
+      t.txn_datetime AS fecha_hora,
+      t.txn_type AS tipo_code,
+      l.code AS ubicacion,
+      e.full_name AS trabajador,
+      t.size AS talla,
+      t.qty AS cantidad,
+      t.reference AS guia_remision,
+      t.notes AS notas,
+      tt.label AS tipo
+    FROM {source} t
+    LEFT JOIN txn_types tt ON tt.type_id = t.type_id
+    LEFT JOIN locations l ON l.location_id = t.location_id
+    LEFT JOIN employees e ON e.employee_id = t.employee_id
+    WHERE {" AND ".join(where)}
+    ORDER BY t.txn_datetime ASC, t.transaction_id ASC
+    """
+    return q, params
+
+
+def size_curve_query(filters: dict, source: str = "transactions") -> tuple[str, dict]:
+    """
+    Curva de tallas (db/size_curve.py): por proyecto × EPP con talla × talla, el consumo OUT del
+    rango (de `source`, que puede incluir el archivo) y el stock actual (tabla viva: SUM(qty) con los
+    OPENING). Una sola consulta: cada rama agrupa por su índice y el resultado ya viene agregado.
+    Filtrar por los EPP con talla dentro de cada rama evita agregar el resto del catálogo.
+    """
+    sized = "SELECT item_id FROM items WHERE has_size = 1 AND is_active = 1"
+    params = {"date_start": str(filters["date_start"]), "date_end": str(filters["date_end"])}
+    project = ""
+    if filters.get("project_id"):
+        project = "AND t.project_id = :pid"
+        params["pid"] = filters["project_id"]
+
+    q = f"""
+    SELECT
+      p.code AS proyecto,
+      i.item_id,
+      i.name AS epp,
+      s.code AS talla,
+      SUM(x.consumo) AS consumo,
+      SUM(x.stock) AS stock
+    FROM (
+      SELECT t.project_id, t.item_id, t.size_id, SUM(-t.qty) AS consumo, 0 AS stock
+      FROM {source} t
+      WHERE t.type_id = {TXN_TYPE_IDS['OUT']}
+        AND t.txn_local_date >= :date_start
+        AND t.txn_local_date <= :date_end
+        AND t.item_id IN ({sized})
+        {project}
+      GROUP BY t.project_id, t.item_id, t.size_id
+      UNION ALL
+      SELECT t.project_id, t.item_id, t.size_id, 0 AS consumo, SUM(t.qty) AS stock
+      FROM transactions t
+      WHERE t.item_id IN ({sized}) {project}
+      GROUP BY t.project_id, t.item_id, t.size_id
+    ) x
+    JOIN items i ON i.item_id = x.item_id AND i.has_size = 1 AND i.is_active = 1
+    JOIN projects p ON p.project_id = x.project_id
+    LEFT JOIN sizes s ON s.size_id = x.size_id
+    GROUP BY p.code, i.item_id, i.name, s.code
+    HAVING SUM(x.consumo) <> 0 OR SUM(x.stock) <> 0
+    """
+    return q, params
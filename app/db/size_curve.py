@@ -0,0 +1,89 @@
+# Curva de tallas para compras (camisas, pantalones, chompas, zapatos, botas).
+# En el catálogo cada talla suele ser su propio EPP ("CAMISA CON CINTA REFLECTIVA T/S" ... "T/XL"):
+# el modelo es el nombre sin el sufijo de talla y la curva se arma sobre todas sus tallas.
+# Entrada: una fila por proyecto × EPP × talla con consumo del rango y stock actual
+# (queries.size_curve_query, una consulta agregada). Todo lo demás es vectorizado sobre el DataFrame:
+# - % consumo por talla dentro del modelo (la curva real de la obra);
+# - % stock actual por talla;
+# - compra sugerida: se reparte para que, después de comprar, el stock quede con la forma de la
+#   curva de consumo. Las tallas con exceso de stock no reciben nada. Por defecto se compra lo
+#   consumido en el rango (reponer un periodo).
+import numpy as np
+import pandas as pd
+
+from .dictionaries import normalize_size
+
+GLOBAL = "(Todos)"
+
+# Orden de presentación de las tallas de letra; las numéricas van por su número
+LETTER_SIZES = ["XXS", "XS", "S", "M", "L", "XL", "XXL", "XXXL"]
+
+_SIZE_SUFFIX = r"\s+T/\s*\S+$"
+
+
+def model_name(names: pd.Series) -> pd.Series:
+    """"CAMISA CON CINTA REFLECTIVA T/S" -> "CAMISA CON CINTA REFLECTIVA"."""
+    return names.astype(str).str.replace(_SIZE_SUFFIX, "", regex=True).str.strip()
+
+
+def size_order(sizes: pd.Series) -> pd.Series:
+    """Clave de orden: números por su valor, luego letras (S < M < L ...), luego lo demás."""
+    numeric = pd.to_numeric(sizes, errors="coerce")
+    letters = sizes.map({s: 1000 + i for i, s in enumerate(LETTER_SIZES)})
+    return numeric.fillna(letters).fillna(2000)
+
+
+def largest_remainder(shares: pd.Series, totals: pd.Series, groups: list[pd.Series]) -> pd.Series:
+    """Reparte `totals` (entero por grupo) según `shares` en enteros que suman exactamente el total."""
+    raw = (shares * totals).fillna(0)
+    base = np.floor(raw)
+    left = (totals.fillna(0) - base.groupby(groups).transform("sum")).round()
+    rank = (raw - base).groupby(groups).rank(method="first", ascending=False)
+    return (base + (rank <= left)).astype(int)
+
+
+def size_curve(raw: pd.DataFrame, by_project: bool = True, purchase: int | None = None) -> pd.DataFrame:
+    """
+    Curva por ámbito (proyecto, o GLOBAL sumando los proyectos) × modelo × talla.
+    `raw`: proyecto, epp, talla, consumo, stock (size_curve_query).
+    `purchase`: unidades a comprar por modelo (None = lo consumido en el rango).
+    """
+    cols = ["ambito", "modelo", "talla", "consumo", "stock", "pct_consumo", "pct_stock", "pct_compra", "compra_sugerida"]
+    if raw.empty:
+        return pd.DataFrame(columns=cols)
+    df = pd.DataFrame(
+        {
+            "ambito": raw["proyecto"].astype(str) if by_project else GLOBAL,
+            "modelo": model_name(raw["epp"]),
+            # Movimientos antiguos sin talla: la del nombre del EPP
+            "talla": raw["talla"].astype(object).fillna(
+                raw["epp"].astype(str).str.extract(r"T/\s*(\S+)$", expand=False).map(normalize_size)
+            ).fillna("-"),
+            "consumo": raw["consumo"].astype("int64"),
+            "stock": raw["stock"].astype("int64"),
+        }
+    )
+    df = df.groupby(["ambito", "modelo", "talla"], as_index=False)[["consumo", "stock"]].sum()
+
+    groups = [df["ambito"], df["modelo"]]
+    consumo = df["consumo"].clip(lower=0)
+    stock = df["stock"].clip(lower=0)  # un saldo negativo no aporta stock real
+    consumo_tot = consumo.groupby(groups).transform("sum")
+    stock_tot = stock.groupby(groups).transform("sum")
+    df["pct_consumo"] = (consumo / consumo_tot.replace(0, np.nan)).astype(float)
+    df["pct_stock"] = (stock / stock_tot.replace(0, np.nan)).astype(float)
+
+    compra = consumo_tot if purchase is None else pd.Series(purchase, index=df.index)
+    target = df["pct_consumo"] * (stock_tot + compra)
+    need = (target - stock).clip(lower=0)
+    need_tot = need.groupby(groups).transform("sum")
+    # Si el stock ya tiene la forma de la curva (nada falta) se compra con la curva de consumo
+    df["pct_compra"] = (need / need_tot).where(need_tot > 0, df["pct_consumo"])
+    df["compra_sugerida"] = largest_remainder(df["pct_compra"], compra.where(df["pct_compra"].notna()), groups)
+
+    return (
+        df.assign(_orden=size_order(df["talla"]))
+        .sort_values(["ambito", "modelo", "_orden", "talla"])
+        .drop(columns="_orden")
+        .reset_index(drop=True)[cols]
+    )
@@ -0,0 +1,407 @@
+# Snapshot columnar de movimientos para los tableros (Kardex > Movimientos y Reportes).
+# - transactions (con los años archivados, sin OPENING) ya unida a los nombres de proyecto,
+#   ubicación, trabajador, EPP y tipo, en archivos Arrow IPC dentro de SNAPSHOT_DIR.
+# - Los archivos se abren con memory-map: todas las sesiones del proceso leen las mismas páginas
+#   (cero copias). Cada sesión solo guarda su resultado filtrado.
+# - Refresco incremental: lo nuevo desde el último transaction_id va a un segmento
+#   movements_<después-de>_<hasta>.arrow. La cadena 0 -> ... -> último id es el snapshot vigente;
+#   pasados MAX_SEGMENTS se compacta en un solo archivo. Un hilo refresca cada REFRESH_SECONDS.
+# - Filtros y agrupaciones con pyarrow.compute: el tablero no toca la BD.
+# Los nombres se copian al agregar cada movimiento: tras corregir catálogos (nombre de un
+# trabajador, código de una ubicación) reconstruir con `python -m scripts.refresh_snapshot --full`.
+import logging
+import os
+import re
+import threading
+import time
+from datetime import date
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+from sqlalchemy import text
+
+from .archive import OPENING_TYPE, transactions_source
+from .dictionaries import TXN_TYPE_IDS, normalize_size
+from .localtime import to_local_str
+
+SNAPSHOT_DIR = Path(os.getenv("SNAPSHOT_DIR", "data/snapshot"))
+REFRESH_SECONDS = float(os.getenv("SNAPSHOT_REFRESH_S", "30"))  # 0 = sin hilo (solo al consultar)
+MAX_SEGMENTS = 20
+CHUNK_ROWS = 200_000
+# Ids recientes que se recuentan en cada refresco: en PostgreSQL un movimiento puede confirmarse
+# después de otro con id mayor; si el conteo no cuadra se reconstruye
+RECHECK_IDS = 5_000
+
+log = logging.getLogger("almacen.snapshot")
+
+_DICT = pa.dictionary(pa.int32(), pa.string())
+# Texto repetitivo como diccionario (cada nombre una vez); el resto, texto plano
+DICT_COLUMNS = ("tipo_code", "tipo", "proyecto", "ubicacion", "trabajador", "dni", "epp", "creado_por")
+
+SCHEMA = pa.schema(
+    [
+        ("id", pa.int64()),
+        ("fecha_hora", pa.string()),  # hora local, como la muestran las páginas
+        ("fecha", pa.date32()),  # txn_local_date
+        ("type_id", pa.int8()),
+        ("project_id", pa.int32()),
+        ("location_id", pa.int32()),
+        ("employee_id", pa.int32()),
+        ("item_id", pa.int32()),
+        ("size_id", pa.int32()),
+        ("tipo_code", _DICT),
+        ("tipo", _DICT),
+        ("proyecto", _DICT),
+        ("ubicacion", _DICT),
+        ("trabajador", _DICT),
+        ("dni", _DICT),
+        ("epp", _DICT),
+        ("talla", pa.string()),
+        ("cantidad", pa.int64()),
+        ("guia_remision", pa.string()),
+        ("notas", pa.string()),
+        ("creado_por", _DICT),
+    ]
+)
+# Lo que sale de la BD antes de codificar los diccionarios
+_PLAIN = pa.schema([f.with_type(pa.string()) if f.name in DICT_COLUMNS else f for f in SCHEMA])
+
+SNAPSHOT_SQL = f"""
+SELECT
+  t.transaction_id AS id,
+  t.txn_datetime AS fecha_hora,
+  t.txn_local_date AS fecha,
+  t.type_id,
+  t.project_id,
+  t.location_id,
+  t.employee_id,
+  t.item_id,
+  t.size_id,
+  t.txn_type AS tipo_code,
+  tt.label AS tipo,
+  p.code AS proyecto,
+  l.code AS ubicacion,
+  e.full_name AS trabajador,
+  e.dni AS dni,
+  i.name AS epp,
+  COALESCE(s.code, t.size) AS talla,
+  t.qty AS cantidad,
+  t.reference AS guia_remision,
+  t.notes AS notas,
+  t.created_by AS creado_por
+FROM {{source}} t
+LEFT JOIN txn_types tt ON tt.type_id = t.type_id
+LEFT JOIN projects p ON p.project_id = t.project_id
+LEFT JOIN locations l ON l.location_id = t.location_id
+LEFT JOIN employees e ON e.employee_id = t.employee_id
+LEFT JOIN items i ON i.item_id = t.item_id
+LEFT JOIN sizes s ON s.size_id = t.size_id
+WHERE t.transaction_id > :after AND t.txn_type <> '{OPENING_TYPE}'
+"""
+
+WINDOW_COUNT_SQL = f"""
+SELECT COUNT(*) FROM {{source}} t
+WHERE t.transaction_id > :lo AND t.transaction_id <= :hi AND t.txn_type <> '{OPENING_TYPE}'
+"""
+
+_SEGMENT = re.compile(r"^movements_(\d+)_(\d+)\.arrow$")
+
+
+def segment_name(after: int, upto: int) -> str:
+    return f"movements_{after}_{upto}.arrow"
+
+
+def _chain(directory: Path) -> list[tuple[int, int, Path]]:
+    """Segmentos vigentes: desde 0, en cada paso el que llega más lejos. Los demás son restos."""
+    segs = {}
+    for p in directory.glob("movements_*.arrow"):
+        m = _SEGMENT.match(p.name)
+        if m:
+            after, upto = int(m.group(1)), int(m.group(2))
+            if upto > segs.get(after, (0, None))[0]:
+                segs[after] = (upto, p)
+    chain, after = [], 0
+    while after in segs:
+        upto, path = segs[after]
+        chain.append((after, upto, path))
+        after = upto
+    return chain
+
+
+class _Encoder:
+    """Diccionarios acumulados por columna: cada lote solo agrega valores nuevos (deltas en el IPC)."""
+
+    def __init__(self):
+        self.values = {c: pa.array([], pa.string()) for c in DICT_COLUMNS}
+
+    def encode(self, batch: pa.Table) -> pa.Table:
+        cols = []
+        for f in SCHEMA:
+            col = batch.column(f.name).combine_chunks()
+            if f.name in DICT_COLUMNS:
+                if pa.types.is_dictionary(col.type):
+                    col = col.dictionary_decode()
+                known = self.values[f.name]
+                new = pc.unique(pc.drop_null(pc.filter(col, pc.invert(pc.is_in(col, value_set=known)))))
+                known = self.values[f.name] = pa.concat_arrays([known, new.cast(pa.string())])
+                idx = pc.index_in(col, value_set=known).cast(pa.int32())
+                col = pa.DictionaryArray.from_arrays(idx, known)
+            cols.append(col)
+        return pa.Table.from_arrays(cols, schema=SCHEMA)
+
+
+def _write(directory: Path, after: int, tables) -> tuple[int, int]:
+    """
+    Escribe el segmento (after, id máx] en un IPC sin comprimir (para memory-map).
+    Se escribe aparte y se renombra al final: un lector nunca ve un segmento a medias.
+    -> (filas, id máx); sin filas no deja archivo.
+    """
+    tmp = directory / f"movements_{after}.{os.getpid()}.{threading.get_ident()}.tmp"
+    enc = _Encoder()
+    rows, upto = 0, 0
+    opts = pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True)
+    with pa.OSFile(str(tmp), "wb") as sink, pa.ipc.new_file(sink, SCHEMA, options=opts) as writer:
+        for t in tables:
+            if t.num_rows == 0:
+                continue
+            writer.write_table(enc.encode(t))
+            rows += t.num_rows
+            upto = max(upto, pc.max(t.column("id")).as_py())
+    if rows:
+        os.replace(tmp, directory / segment_name(after, upto))
+    else:
+        tmp.unlink()
+    return rows, upto
+
+
+def _fetch(conn, source: str, after: int):
+    """Movimientos con id > after, ya unidos a los nombres, en tablas Arrow de CHUNK_ROWS filas."""
+    for df in pd.read_sql(
+        text(SNAPSHOT_SQL.format(source=source)),
+        conn,
+        params={"after": after},
+        chunksize=CHUNK_ROWS,
+        dtype_backend="pyarrow",
+    ):
+        df["fecha_hora"] = to_local_str(df["fecha_hora"])
+        yield pa.Table.from_pandas(df, preserve_index=False).cast(_PLAIN)
+
+
+def _open(path: Path) -> pa.Table:
+    return pa.ipc.open_file(pa.memory_map(str(path), "r")).read_all()
+
+
+class MovementSnapshot:
+    def __init__(self, engine, directory: Path = SNAPSHOT_DIR):
+        self.engine = engine
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._table = pa.table({f.name: pa.array([], f.type) for f in SCHEMA}, schema=SCHEMA)
+        self._chain: list[tuple[int, int, Path]] = []
+        self.refreshed_at = 0.0
+        self._thread = None
+
+    @property
+    def last_id(self) -> int:
+        return self._chain[-1][1] if self._chain else 0
+
+    @property
+    def segments(self) -> list[Path]:
+        return [p for _, _, p in self._chain]
+
+    def table(self) -> pa.Table:
+        """El snapshot vigente (inmutable: un refresco publica una tabla nueva)."""
+        return self._table
+
+    def _load(self) -> None:
+        chain = _chain(self.directory)
+        tables = [_open(p) for _, _, p in chain]
+        self._table = pa.concat_tables(tables) if tables else self._table.slice(0, 0)
+        self._chain = chain
+
+    def _cleanup(self) -> None:
+        keep = {p for _, _, p in self._chain}
+        for p in self.directory.glob("movements_*.arrow"):
+            if p not in keep:
+                try:
+                    p.unlink()
+                except OSError:
+                    pass  # aún abierto por otra sesión (Windows): se borra en la próxima limpieza
+
+    def _window_ok(self, conn) -> bool:
+        hi = self.last_id
+        lo = max(0, hi - RECHECK_IDS)
+        # Con el archivo: si el tramo ya se archivó, sus movimientos siguen contando
+        sql = WINDOW_COUNT_SQL.format(source=transactions_source(conn))
+        n_db = conn.execute(text(sql), {"lo": lo, "hi": hi}).scalar_one()
+        ids = self._table.column("id")
+        n_snap = pc.sum(pc.and_(pc.greater(ids, lo), pc.less_equal(ids, hi))).as_py() or 0
+        return n_db == n_snap
+
+    def refresh(self, full: bool = False, min_interval: float = 0) -> int:
+        """Agrega lo nuevo (o reconstruye todo). Devuelve cuántos movimientos se agregaron."""
+        if not full and time.monotonic() - self.refreshed_at < min_interval:
+            return 0
+        with self._lock:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            if not self._chain:
+                self._load()
+            with self.engine.connect() as conn:
+                full = full or not self._chain or not self._window_ok(conn)
+                if full:
+                    # Todo el histórico: archivos de años cerrados + BD viva
+                    after, source = 0, transactions_source(conn)
+                else:
+                    # Lo nuevo siempre está en la BD viva
+                    after, source = self.last_id, "transactions"
+                rows, _ = _write(self.directory, after, _fetch(conn, source, after))
+            if full or rows:
+                self._load()
+            if len(self._chain) > MAX_SEGMENTS:
+                self._compact()
+            self._cleanup()
+            self.refreshed_at = time.monotonic()
+        return rows
+
+    def _compact(self) -> None:
+        batches = (pa.Table.from_batches([b]) for b in self._table.to_batches(CHUNK_ROWS))
+        _write(self.directory, 0, batches)
+        self._load()
+
+    def start(self, every: float = REFRESH_SECONDS) -> None:
+        """Refresco en segundo plano (hilo daemon, uno por proceso)."""
+        if every <= 0 or self._thread is not None:
+            return
+
+        def loop():
+            while True:
+                time.sleep(every)
+                try:
+                    self.refresh(min_interval=every / 2)
+                except Exception:
+                    log.exception("No se pudo refrescar el snapshot de movimientos")
+
+        self._thread = threading.Thread(target=loop, name="snapshot-refresh", daemon=True)
+        self._thread.start()
+
+
+_shared: MovementSnapshot | None = None
+_shared_lock = threading.Lock()
+
+
+def get_snapshot() -> MovementSnapshot:
+    """Snapshot único del proceso (todas las sesiones de Streamlit), creado y refrescado al primer uso."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            from .connection import get_engine
+
+            snap = MovementSnapshot(get_engine())
+            snap.refresh()
+            snap.start()
+            _shared = snap
+    return _shared
+
+
+# -------------------------
+# Consultas sobre el snapshot (pyarrow.compute)
+# -------------------------
+def _day(value) -> pa.Scalar:
+    return pa.scalar(date.fromisoformat(str(value)), pa.date32())
+
+
+def _contains(col: pa.ChunkedArray, text: str) -> pa.ChunkedArray:
+    return pc.fill_null(pc.match_substring(col, text, ignore_case=True), False)
+
+
+def _mask(tbl: pa.Table, filters: dict) -> pa.ChunkedArray:
+    """Filtros de Kardex > Movimientos y de Reportes (fechas locales, talla por size_id)."""
+    conds = [
+        pc.greater_equal(tbl["fecha"], _day(filters["date_start"])),
+        pc.less_equal(tbl["fecha"], _day(filters["date_end"])),
+    ]
+    for key, col in (
+        ("project_id", "project_id"),
+        ("item_id", "item_id"),
+        ("employee_id", "employee_id"),
+        ("location_id", "location_id"),
+    ):
+        if filters.get(key):
+            conds.append(pc.equal(tbl[col], int(filters[key])))
+
+    if filters.get("txn_types"):
+        ids = pa.array([TXN_TYPE_IDS[t] for t in filters["txn_types"]], pa.int8())
+        conds.append(pc.is_in(tbl["type_id"], value_set=ids))
+
+    size_mode = filters.get("size_mode", "cualquiera")
+    size = normalize_size(filters.get("size_value"))
+    # Como en SQL, por size_id: talla es el código del diccionario cuando hay size_id
+    if size_mode == "sin talla":
+        conds.append(pc.is_null(tbl["size_id"]))
+    elif size_mode == "talla específica" and size:
+        same = pc.fill_null(pc.equal(tbl["talla"], size), False)
+        conds.append(pc.and_(pc.is_valid(tbl["size_id"]), same))
+
+    if filters.get("text_search"):
+        q = filters["text_search"].strip()
+        conds.append(pc.or_(_contains(tbl["guia_remision"], q), _contains(tbl["notas"], q)))
+
+    if filters.get("motivo"):
+        conds.append(_contains(tbl["notas"], filters["motivo"]))
+
+    mask = conds[0]
+    for c in conds[1:]:
+        mask = pc.and_(mask, c)
+    return pc.fill_null(mask, False)
+
+
+def movements(tbl: pa.Table, filters: dict) -> pa.Table:
+    """Kardex > Movimientos: más recientes primero, con los nombres de columna de la página."""
+    out = tbl.filter(_mask(tbl, filters)).sort_by([("fecha_hora", "descending"), ("id", "descending")])
+    return out.select(
+        [
+            "id", "fecha_hora", "tipo_code", "proyecto", "ubicacion", "trabajador", "dni",
+            "epp", "talla", "cantidad", "guia_remision", "notas", "creado_por", "tipo",
+        ]
+    )
+
+
+def consumo(tbl: pa.Table, filters: dict) -> pa.Table:
+    """Reportes: entregas (OUT) en unidades positivas, con su día y mes locales."""
+    out = tbl.filter(_mask(tbl, {**filters, "txn_types": ["OUT"]}))
+    fecha = pc.cast(out["fecha"], pa.string())
+    return pa.table(
+        {
+            "transaction_id": out["id"],
+            "fecha_hora": out["fecha_hora"],
+            "fecha": fecha,
+            "proyecto": out["proyecto"],
+            "trabajador": out["trabajador"],
+            "dni": out["dni"],
+            "epp": out["epp"],
+            "talla": out["talla"],
+            "consumo_und": pc.negate(out["cantidad"]),
+            "notas": out["notas"],
+            "mes": pc.utf8_slice_codeunits(fecha, 0, 7),
+        }
+    )
+
+
+def sum_by(tbl: pa.Table, keys: list[str], value: str, top: int | None = None) -> pd.DataFrame:
+    """SUM(value) GROUP BY keys en Arrow, de mayor a menor (top = solo los primeros)."""
+    g = tbl.group_by(keys).aggregate([(value, "sum")])
+    g = g.select([*keys, f"{value}_sum"]).rename_columns([*keys, value]).sort_by([(value, "descending")])
+    if top is not None:
+        g = g.slice(0, top)
+    df = to_frame(g)
+    for k in keys:
+        if isinstance(df[k].dtype, pd.CategoricalDtype):
+            df[k] = df[k].cat.remove_unused_categories()
+    return df
+
+
+def to_frame(tbl: pa.Table) -> pd.DataFrame:
+    """Arrow -> DataFrame para mostrar/exportar: diccionarios como category, el resto con tipos Arrow."""
+    return tbl.to_pandas(types_mapper=lambda t: None if pa.types.is_dictionary(t) else pd.ArrowDtype(t))
@@ -0,0 +1,71 @@
+# Tablero de stock en vivo (1_Stock_Actual).
+# En vez de repetir el LEFT JOIN ... GROUP BY completo en cada refresco:
+# - change_token: el último transaction_id (MAX sobre la PK: una hoja del índice, casi gratis) y
+#   cuántos movimientos hay en los RECHECK_IDS ids anteriores (rango por PK).
+#   Los movimientos solo se insertan (ajustes, conteos y cierres de archivo también son filas
+#   nuevas), así que si no cambió no hay nada que recalcular.
+#   El MAX solo no basta con varios escritores (PostgreSQL): un id menor puede confirmarse después
+#   de que ya se leyó uno mayor. Ese movimiento tardío cae en la ventana y cambia el conteo.
+#   PRAGMA data_version no sirve aquí: es por conexión y el pool entrega conexiones distintas.
+# - Si cambió, se recalculan los saldos de los EPP con movimientos desde RECHECK_IDS ids antes
+#   del token anterior (recheck_after) y se reemplazan en el tablero; solo las filas cuyo saldo
+#   cambió quedan marcadas para resaltarlas.
+import pandas as pd
+from sqlalchemy import text
+
+from .frames import read_frame
+from .queries import STOCK_BOARD_SQL, STOCK_TOUCHED_SQL
+
+# Ids recientes que se vuelven a revisar (como RECHECK_IDS en db/snapshot.py)
+RECHECK_IDS = 5_000
+
+WINDOW_COUNT_SQL = """
+SELECT COUNT(*) FROM transactions WHERE transaction_id > :lo AND transaction_id <= :hi
+"""
+
+
+def change_token(conn) -> tuple[int, int]:
+    """(último transaction_id, movimientos en sus RECHECK_IDS ids anteriores)."""
+    top = conn.execute(text("SELECT COALESCE(MAX(transaction_id), 0) FROM transactions")).scalar_one()
+    count = conn.execute(text(WINDOW_COUNT_SQL), {"lo": top - RECHECK_IDS, "hi": top}).scalar_one()
+    return top, count
+
+
+def recheck_after(token: tuple[int, int]) -> int:
+    """Desde qué id recalcular tras `token`: incluye los ids que pudieron confirmarse tarde."""
+    return max(0, token[0] - RECHECK_IDS)
+
+
+def load_board(conn, project: str) -> pd.DataFrame:
+    """Tablero completo (al abrir o cambiar de proyecto)."""
+    return read_frame(conn, STOCK_BOARD_SQL, {"project": project}, categories=[])
+
+
+def touched_balances(conn, project: str, after: int, upto: int) -> pd.DataFrame:
+    return read_frame(
+        conn, STOCK_TOUCHED_SQL, {"project": project, "after": after, "upto": upto}, categories=[]
+    )
+
+
+def _keys(df: pd.DataFrame) -> list[tuple[int, int]]:
+    # Talla nula (EPP sin talla) como -1 para poder comparar
+    return list(zip(df["item_id"].astype(int), df["size_id"].astype("Int64").fillna(-1).astype(int)))
+
+
+def apply_delta(board: pd.DataFrame, delta: pd.DataFrame) -> tuple[pd.DataFrame, set]:
+    """
+    Reemplaza en el tablero las filas de los EPP de `delta` (trae todas sus tallas en el proyecto).
+    Devuelve el tablero nuevo y las claves (item_id, size_id) cuyo saldo cambió o son nuevas.
+    """
+    if delta.empty:
+        return board, set()
+    old = dict(zip(_keys(board), board["stock"]))
+    changed = {k for k, s in zip(_keys(delta), delta["stock"]) if old.get(k) != s}
+
+    keep = ~board["item_id"].isin(delta["item_id"].unique())
+    merged = pd.concat([board[keep], delta[board.columns]], ignore_index=True)
+    return merged.sort_values(["epp", "talla"], ignore_index=True), changed
+
+
+def changed_mask(board: pd.DataFrame, changed: set) -> pd.Series:
+    return pd.Series([k in changed for k in _keys(board)], index=board.index)
@@ -0,0 +1,331 @@
+# Valorización a costo promedio ponderado por proyecto × EPP × talla.
+# - Los IN llevan el costo de compra (transactions.unit_cost, capturado al ingresar).
+# - item_costs guarda por clave el saldo, el costo promedio vigente y el valor. update_valuation
+#   lo avanza solo con los movimientos nuevos (transaction_id > valuation_state.last_txn_id), dentro
+#   de la misma transacción que los escribe: nunca se recalcula desde el inicio.
+# - Cada salida (qty < 0) queda con el costo promedio aplicado en su unit_cost: el costo del
+#   consumo es SUM(-qty * unit_cost), sin recalcular nada al consultar.
+# Regla (idéntica en el incremental y en el backfill, en orden de transaction_id):
+#   entrada con costo c: prom = c si no había promedio o saldo <= 0; si no
+#                        (saldo * prom + qty * c) / (saldo + qty)
+#   cualquier otro movimiento: no cambia el promedio (sale o vuelve al promedio vigente)
+#   valor = max(saldo, 0) * prom
+# Los OPENING no se valorizan: solo reexpresan saldos (cierre de archivo, frente sin conexión).
+# La primera carga (y su inicialización) es backfill(): vectorizada sobre todo el histórico,
+# incluidos los años archivados. Hasta entonces update_valuation no hace nada.
+import numpy as np
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from .archive import OPENING_TYPE, archived_periods, attach_archives, transactions_source
+from .frames import read_frame
+from .movements import utc_now_str
+
+STATE_KEY = "promedio_ponderado"
+
+LOCK_STATE_SQL = "UPDATE valuation_state SET updated_at = :now_utc WHERE engine = :engine"
+STATE_SQL = "SELECT last_txn_id FROM valuation_state WHERE engine = :engine"
+
+NEW_MOVES_SQL = """
+SELECT transaction_id, txn_type, project_id, item_id, COALESCE(size_id, 0) AS size_key, qty, unit_cost
+FROM transactions
+WHERE transaction_id > :after
+ORDER BY transaction_id
+"""
+
+KEY_STATE_SQL = text(
+    """
+    SELECT project_id, item_id, size_key, qty, avg_cost
+    FROM item_costs
+    WHERE project_id IN :pids AND item_id IN :iids
+    """
+).bindparams(bindparam("pids", expanding=True), bindparam("iids", expanding=True))
+
+SET_COST_SQL = "UPDATE transactions SET unit_cost = :cost WHERE transaction_id = :tid"
+
+UPSERT_COST_SQL = """
+INSERT INTO item_costs (project_id, item_id, size_key, qty, avg_cost, value, last_txn_id)
+VALUES (:project_id, :item_id, :size_key, :qty, :avg_cost, :value, :last_txn_id)
+ON CONFLICT (project_id, item_id, size_key) DO UPDATE SET
+  qty = excluded.qty, avg_cost = excluded.avg_cost, value = excluded.value,
+  last_txn_id = excluded.last_txn_id
+"""
+
+UPSERT_STATE_SQL = """
+INSERT INTO valuation_state (engine, last_txn_id, updated_at)
+VALUES (:engine, :last_txn_id, :now_utc)
+ON CONFLICT (engine) DO UPDATE SET last_txn_id = excluded.last_txn_id, updated_at = excluded.updated_at
+"""
+
+# Valor del stock (lo que hay en item_costs)
+STOCK_VALUE_SQL = """
+SELECT p.code AS proyecto, i.name AS epp, s.code AS talla,
+       c.qty AS stock, c.avg_cost AS costo_promedio, c.value AS valor
+FROM item_costs c
+JOIN projects p ON p.project_id = c.project_id
+JOIN items i ON i.item_id = c.item_id
+LEFT JOIN sizes s ON s.size_id = c.size_key
+WHERE (:project IS NULL OR p.code = :project) AND c.qty <> 0
+ORDER BY p.code, i.name, s.code
+"""
+
+# Costo del consumo por proyecto y mes local (salidas valorizadas de la BD viva)
+CONSUMPTION_COST_SQL = """
+SELECT p.code AS proyecto, substr(t.txn_local_date, 1, 7) AS mes, t.txn_type AS tipo,
+       SUM(-t.qty) AS unidades, SUM(-t.qty * t.unit_cost) AS costo,
+       SUM(CASE WHEN t.unit_cost IS NULL THEN -t.qty ELSE 0 END) AS unidades_sin_costo
+FROM transactions t
+JOIN projects p ON p.project_id = t.project_id
+WHERE t.qty < 0 AND t.txn_type <> 'OPENING'
+  AND t.txn_local_date BETWEEN :date_start AND :date_end
+  AND (:project IS NULL OR p.code = :project)
+GROUP BY p.code, substr(t.txn_local_date, 1, 7), t.txn_type
+ORDER BY mes, proyecto, tipo
+"""
+
+
+def is_initialized(conn) -> bool:
+    return conn.execute(text(STATE_SQL), {"engine": STATE_KEY}).scalar_one_or_none() is not None
+
+
+def _step(qty: int, avg: float | None, q: int, cost: float | None) -> tuple[int, float | None, float | None]:
+    """Un movimiento sobre (saldo, promedio). Devuelve (saldo, promedio, costo aplicado a la salida)."""
+    if q > 0 and cost is not None:
+        base = max(qty, 0)
+        avg = cost if avg is None or base == 0 else (base * avg + q * cost) / (base + q)
+        return qty + q, avg, None
+    return qty + q, avg, avg if q < 0 else None
+
+
+def update_valuation(conn) -> int:
+    """
+    Valoriza los movimientos nuevos dentro de la transacción de `conn`. Devuelve cuántos procesó;
+    0 si la valorización no está inicializada.
+    Los escritores la llaman al inicio de su transacción (toma el bloqueo del estado: en PostgreSQL
+    un id menor no puede confirmarse después de avanzar el punto de partida) y después de insertar.
+    """
+    now_utc = utc_now_str()
+    # Primera escritura sobre el estado: toma el bloqueo (dos escritores no avanzan el mismo tramo)
+    if conn.execute(text(LOCK_STATE_SQL), {"engine": STATE_KEY, "now_utc": now_utc}).rowcount != 1:
+        return 0
+    after = conn.execute(text(STATE_SQL), {"engine": STATE_KEY}).scalar_one()
+    moves = conn.execute(text(NEW_MOVES_SQL), {"after": after}).all()
+    if not moves:
+        return 0
+
+    valued = [m for m in moves if m.txn_type != OPENING_TYPE]
+    state = {}
+    if valued:
+        rows = conn.execute(
+            KEY_STATE_SQL,
+            {"pids": sorted({m.project_id for m in valued}), "iids": sorted({m.item_id for m in valued})},
+        )
+        state = {(r.project_id, r.item_id, r.size_key): (r.qty, r.avg_cost) for r in rows}
+
+    costs, touched = [], {}
+    for m in valued:
+        key = (m.project_id, m.item_id, m.size_key)
+        qty, avg = state.get(key, (0, None))
+        qty, avg, applied = _step(qty, avg, m.qty, m.unit_cost)
+        state[key] = (qty, avg)
+        touched[key] = m.transaction_id
+        if applied is not None and m.unit_cost is None:
+            costs.append({"tid": m.transaction_id, "cost": applied})
+
+    if costs:
+        conn.execute(text(SET_COST_SQL), costs)
+    if touched:
+        conn.execute(
+            text(UPSERT_COST_SQL),
+            [
+                {
+                    "project_id": k[0],
+                    "item_id": k[1],
+                    "size_key": k[2],
+                    "qty": state[k][0],
+                    "avg_cost": state[k][1],
+                    "value": max(state[k][0], 0) * (state[k][1] or 0),
+                    "last_txn_id": tid,
+                }
+                for k, tid in touched.items()
+            ],
+        )
+    conn.execute(
+        text(UPSERT_STATE_SQL),
+        {"engine": STATE_KEY, "last_txn_id": moves[-1].transaction_id, "now_utc": now_utc},
+    )
+    return len(valued)
+
+
+# ---------------------------------------------------------------------------
+# Backfill (una vez, sobre todo el histórico)
+# ---------------------------------------------------------------------------
+def _archived_costs(conn) -> list[pd.DataFrame]:
+    """unit_cost de los archivos creados después de la migración 010 (los anteriores no lo tienen)."""
+    frames = []
+    for alias in attach_archives(conn, archived_periods(conn)):
+        cols = {r[1] for r in conn.exec_driver_sql(f"PRAGMA {alias}.table_info(transactions)")}
+        if "unit_cost" in cols:
+            frames.append(
+                read_frame(
+                    conn,
+                    f"SELECT transaction_id, unit_cost FROM {alias}.transactions WHERE unit_cost IS NOT NULL",
+                    categories=[],
+                )
+            )
+    return frames
+
+
+def load_history(conn) -> pd.DataFrame:
+    """Todos los movimientos valorizables (archivo + BD viva, sin OPENING) con su unit_cost.
+    La posición de cada fila es su orden (RangeIndex por transaction_id)."""
+    source = transactions_source(conn)
+    hist = pd.read_sql(
+        text(
+            f"SELECT t.transaction_id, t.txn_type, t.project_id, t.item_id, COALESCE(t.size_id, 0) AS size_key, t.qty "
+            f"FROM {source} t WHERE t.txn_type <> '{OPENING_TYPE}'"
+        ),
+        conn,
+    )
+    live = read_frame(conn, "SELECT transaction_id, unit_cost FROM transactions", categories=[])
+    # Sin frames vacíos: concat no tiene que adivinar el tipo de unit_cost
+    frames = [f for f in [*_archived_costs(conn), live.dropna(subset=["unit_cost"])] if not f.empty]
+    costs = pd.concat(frames, ignore_index=True) if frames else live.iloc[:0]
+    # Enteros explícitos: sin movimientos (instalación nueva) read_sql deja todo en object
+    ints = ["transaction_id", "project_id", "item_id", "size_key", "qty"]
+    hist = hist.astype(dict.fromkeys(ints, "int64"))
+    hist = hist.merge(costs, on="transaction_id", how="left").astype({"unit_cost": float})
+    hist["live"] = hist["transaction_id"].isin(live["transaction_id"])
+    # Lo guardado hoy, para escribir solo lo que cambie
+    hist["stored"] = hist["unit_cost"].where(hist["live"])
+    return hist.sort_values("transaction_id", ignore_index=True)
+
+
+def apply_prices(hist: pd.DataFrame, prices: pd.DataFrame) -> pd.Series:
+    """
+    Costo de lista para los IN sin costo capturado. `prices`: item_id, size_key (0/NaN = todas las
+    tallas), cost. Devuelve la máscara de las filas completadas.
+    """
+    prices = prices.assign(size_key=prices["size_key"].fillna(0).astype(int))
+    exact = hist[["item_id", "size_key"]].merge(
+        prices[prices["size_key"] != 0], on=["item_id", "size_key"], how="left"
+    )["cost"]
+    generic = hist[["item_id"]].merge(
+        prices[prices["size_key"] == 0].drop(columns="size_key").drop_duplicates("item_id"), on="item_id", how="left"
+    )["cost"]
+    price = exact.fillna(generic).to_numpy()
+    fill = (hist["txn_type"] == "IN").to_numpy() & hist["unit_cost"].isna().to_numpy() & ~np.isnan(price)
+    hist.loc[fill, "unit_cost"] = price[fill]
+    return pd.Series(fill, index=hist.index)
+
+
+def weighted_average(hist: pd.DataFrame) -> tuple[pd.Series, pd.DataFrame]:
+    """
+    Costo promedio sobre todo el histórico (ordenado por transaction_id), vectorizado por clave.
+    El saldo antes de cada movimiento no depende de los costos (cumsum por clave); el promedio solo
+    cambia en las entradas con costo: se resuelve la k-ésima entrada de todas las claves a la vez.
+    Devuelve (costo aplicado a cada salida, estado final por clave como item_costs).
+    """
+    keys = ["project_id", "item_id", "size_key"]
+    qty = hist["qty"].to_numpy(dtype=np.int64)
+    cost = hist["unit_cost"].to_numpy(dtype=float)
+    before = hist.groupby(keys, sort=False)["qty"].cumsum().to_numpy(dtype=np.int64) - qty
+
+    # Entradas con costo, agrupadas por clave y en orden dentro de cada una
+    ev = hist.index[(qty > 0) & ~np.isnan(cost)]
+    events = hist.loc[ev, keys].assign(pos=ev).sort_values(keys + ["pos"], kind="stable")
+    pos = events["pos"].to_numpy()
+    rank = events.groupby(keys, sort=False).cumcount().to_numpy()
+    base = np.maximum(before[pos], 0).astype(float)
+    q, c = qty[pos].astype(float), cost[pos]
+    avg = np.full(len(pos), np.nan)
+    for k in range(int(rank.max()) + 1 if len(rank) else 0):
+        sel = np.flatnonzero(rank == k)
+        if k == 0:
+            avg[sel] = c[sel]
+            continue
+        prev = avg[sel - 1]
+        b = base[sel]
+        avg[sel] = np.where(b == 0, c[sel], (b * prev + q[sel] * c[sel]) / (b + q[sel]))
+
+    # Promedio vigente después de cada movimiento: el de la última entrada con costo de su clave
+    after = pd.Series(np.nan, index=hist.index)
+    after.iloc[pos] = avg
+    after = after.groupby([hist[k] for k in keys], sort=False).ffill()
+    current = after.groupby([hist[k] for k in keys], sort=False).shift()
+    applied = current.where(hist["qty"] < 0)
+
+    # Tras el ffill el promedio no vuelve a NaN: el "last" (que salta NaN) es el vigente al final
+    last = hist.assign(avg_cost=after).groupby(keys, sort=False).agg(
+        qty=("qty", "sum"), avg_cost=("avg_cost", "last"), last_txn_id=("transaction_id", "last")
+    )
+    last["value"] = last["qty"].clip(lower=0) * last["avg_cost"].fillna(0)
+    return applied, last.reset_index()
+
+
+def backfill(conn, prices: pd.DataFrame | None = None) -> dict:
+    """
+    Recalcula desde cero (dentro de la transacción de `conn`): costo de lista opcional para los IN
+    sin costo, costo aplicado de todas las salidas de la BD viva, item_costs y el punto de partida
+    del incremental. Es para la carga inicial o para corregir costos de IN antiguos.
+    """
+    now_utc = utc_now_str()
+    # Bloquea el estado antes de leer: ningún escritor valoriza en medio del recálculo
+    conn.execute(text(UPSERT_STATE_SQL), {"engine": STATE_KEY, "last_txn_id": 0, "now_utc": now_utc})
+    hist = load_history(conn)
+    priced = apply_prices(hist, prices) if prices is not None else pd.Series(False, index=hist.index)
+    applied, final = weighted_average(hist)
+
+    # Solo se escriben las filas de la BD viva que cambian (los archivos son de solo lectura)
+    new_cost = hist["unit_cost"].where(hist["qty"] > 0, applied)
+    same = (new_cost == hist["stored"]) | (new_cost.isna() & hist["stored"].isna())
+    changed = hist["live"] & ~same
+    updates = [
+        {"tid": int(t), "cost": None if pd.isna(c) else float(c)}
+        for t, c in zip(hist.loc[changed, "transaction_id"], new_cost[changed])
+    ]
+    if updates:
+        conn.execute(text(SET_COST_SQL), updates)
+
+    conn.execute(text("DELETE FROM item_costs"))
+    if not final.empty:
+        conn.execute(
+            text(UPSERT_COST_SQL),
+            [
+                {
+                    "project_id": int(r.project_id),
+                    "item_id": int(r.item_id),
+                    "size_key": int(r.size_key),
+                    "qty": int(r.qty),
+                    "avg_cost": None if pd.isna(r.avg_cost) else float(r.avg_cost),
+                    "value": float(r.value),
+                    "last_txn_id": int(r.last_txn_id),
+                }
+                for r in final.itertuples(index=False)
+            ],
+        )
+    last_id = conn.execute(text("SELECT COALESCE(MAX(transaction_id), 0) FROM transactions")).scalar_one()
+    conn.execute(text(UPSERT_STATE_SQL), {"engine": STATE_KEY, "last_txn_id": last_id, "now_utc": now_utc})
+    return {
+        "movimientos": len(hist),
+        "ingresos_con_costo": int(((hist["qty"] > 0) & hist["unit_cost"].notna()).sum()),
+        "costos_de_lista": int(priced.sum()),
+        "salidas_sin_costo": int(((hist["qty"] < 0) & applied.isna()).sum()),
+        "filas_actualizadas": len(updates),
+        "claves": len(final),
+        "valor_total": float(final["value"].sum()) if not final.empty else 0.0,
+    }
+
+
+def stock_value(conn, project: str | None = None) -> pd.DataFrame:
+    return read_frame(conn, STOCK_VALUE_SQL, {"project": project}, categories=[])
+
+
+def consumption_cost(conn, date_start, date_end, project: str | None = None) -> pd.DataFrame:
+    """Costo de las salidas por proyecto, mes local y tipo, entre dos días locales (inclusive)."""
+    return read_frame(
+        conn,
+        CONSUMPTION_COST_SQL,
+        {"date_start": str(date_start), "date_end": str(date_end), "project": project},
+        categories=[],
+    )
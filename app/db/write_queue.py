@@ -0,0 +1,163 @@
+# Cola de escritura con commit agrupado (group commit) para los movimientos de las páginas.
+# Antes cada ingreso/entrega era su propia transacción (y su propio fsync): en SQLite todos los
+# almaceneros se turnan el bloqueo de escritura en las horas pico.
+# Ahora las sesiones envían su lote de movimientos a la cola y reciben un Future. Un solo hilo
+# escritor por BD junta lo que llegó en los últimos milisegundos y lo escribe en UNA transacción:
+# - valida el stock de todo el grupo con una sola consulta (y lo va descontando en memoria, en orden
+#   de llegada: dos entregas del último par no pueden pasar las dos);
+# - cada envío recibe sus transaction_id o su propio error (stock insuficiente, FK...);
+# - si el commit del grupo falla, cada envío se reintenta solo, en su transacción, como antes.
+# Para el almacenero no cambia nada: el Future se resuelve al confirmarse su commit.
+# La valorización (db/valuation.py) avanza en la misma transacción del grupo.
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from sqlalchemy import bindparam, text
+
+from .connection import get_engine
+from .movements import insert_movement
+from .valuation import update_valuation
+
+# Espera máxima para juntar envíos desde el primero del grupo
+MAX_WAIT_MS = float(os.getenv("WRITE_QUEUE_WAIT_MS", "5"))
+MAX_GROUP = int(os.getenv("WRITE_QUEUE_MAX_GROUP", "200"))
+RESULT_TIMEOUT_S = 30
+
+# Saldo por proyecto × EPP × talla de las salidas del grupo (misma regla que STOCK_SQL)
+GROUP_STOCK_SQL = text(
+    """
+    SELECT t.project_id, t.item_id, s.code AS size, COALESCE(SUM(t.qty), 0) AS stock
+    FROM transactions t
+    LEFT JOIN sizes s ON s.size_id = t.size_id
+    WHERE t.project_id IN :pids AND t.item_id IN :iids
+    GROUP BY t.project_id, t.item_id, t.size_id, s.code
+    """
+).bindparams(bindparam("pids", expanding=True), bindparam("iids", expanding=True))
+
+
+class InsufficientStockError(RuntimeError):
+    def __init__(self, item_id: int, size: str | None, available: int, requested: int):
+        self.item_id, self.size, self.available, self.requested = item_id, size, available, requested
+        super().__init__(f"Stock insuficiente (EPP {item_id} {size or ''}): hay {available}, se piden {requested}")
+
+
+@dataclass
+class _Submission:
+    movements: list[tuple[str, dict]]  # (INSERT_*_SQL, params) como en insert_movement
+    check_stock: bool
+    future: Future = field(default_factory=Future)
+
+
+def _stock_key(params: dict) -> tuple:
+    return params["pid"], params["iid"], params["size"]
+
+
+def _check(sub: _Submission, stock: dict) -> dict:
+    """Valida las salidas del envío contra el saldo del grupo; devuelve cuánto mueve por clave."""
+    delta = {}
+    for _, p in sub.movements:
+        delta[_stock_key(p)] = delta.get(_stock_key(p), 0) + p["qty"]
+    if sub.check_stock:
+        for key, qty in delta.items():
+            available = stock.get(key, 0)
+            if qty < 0 and available + qty < 0:
+                raise InsufficientStockError(key[1], key[2], available, -qty)
+    return delta
+
+
+class WriteQueue:
+    def __init__(self, url: str, max_wait_ms: float = MAX_WAIT_MS, max_group: int = MAX_GROUP):
+        self.engine = get_engine(url)
+        self.max_wait = max_wait_ms / 1000
+        self.max_group = max_group
+        self._queue: queue.Queue[_Submission] = queue.Queue()
+        self.groups = 0
+        self.submissions = 0
+        threading.Thread(target=self._run, name="write-queue", daemon=True).start()
+
+    def submit(self, movements: list[tuple[str, dict]], check_stock: bool = True) -> Future:
+        """Encola un lote de movimientos (se escriben juntos o ninguno). Future -> [transaction_id, ...]."""
+        sub = _Submission(list(movements), check_stock)
+        self._queue.put(sub)
+        return sub.future
+
+    def _collect(self) -> list[_Submission]:
+        group = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(group) < self.max_group:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                group.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return group
+
+    def _run(self) -> None:
+        while True:
+            group = self._collect()
+            try:
+                self._write_group(group)
+            except Exception:
+                # El grupo no se confirmó: cada envío por separado, para que el error sea solo de quien lo causó
+                for sub in group:
+                    if not sub.future.done():
+                        self._write_group([sub])
+            self.groups += 1
+            self.submissions += len(group)
+
+    def _write_group(self, group: list[_Submission]) -> None:
+        done: list[tuple[_Submission, list[int]]] = []
+        try:
+            with self.engine.begin() as conn:
+                update_valuation(conn)
+                keys = [_stock_key(p) for sub in group if sub.check_stock for _, p in sub.movements if p["qty"] < 0]
+                stock = {}
+                if keys:
+                    rows = conn.execute(
+                        GROUP_STOCK_SQL,
+                        {"pids": sorted({k[0] for k in keys}), "iids": sorted({k[1] for k in keys})},
+                    )
+                    stock = {(r.project_id, r.item_id, r.size): r.stock for r in rows}
+                for sub in group:
+                    try:
+                        delta = _check(sub, stock)
+                    except InsufficientStockError as e:
+                        sub.future.set_exception(e)
+                        continue
+                    ids = [insert_movement(conn, sql, params) for sql, params in sub.movements]
+                    for key, qty in delta.items():
+                        stock[key] = stock.get(key, 0) + qty
+                    done.append((sub, ids))
+                if done:
+                    update_valuation(conn)
+        except Exception as e:
+            if len(group) == 1:
+                group[0].future.set_exception(e)
+                return
+            raise
+        for sub, ids in done:
+            sub.future.set_result(ids)
+
+
+_queues: dict[str, WriteQueue] = {}
+_queues_lock = threading.Lock()
+
+
+def get_write_queue(url: str) -> WriteQueue:
+    """Una cola (y un hilo escritor) por BD y por proceso, compartida por todas las sesiones."""
+    with _queues_lock:
+        if url not in _queues:
+            _queues[url] = WriteQueue(url)
+        return _queues[url]
+
+
+def write_movements(engine, movements: list[tuple[str, dict]], check_stock: bool = True) -> list[int]:
+    """Escribe los movimientos por la cola de la BD de `engine` y espera su commit."""
+    url = engine.url.render_as_string(hide_password=False)
+    return get_write_queue(url).submit(movements, check_stock).result(timeout=RESULT_TIMEOUT_S)
@@ -0,0 +1,91 @@
+# Métricas de render por página (opcional).
+# PAGE_METRICS=1 activa: cada página llama start_run() al inicio y envuelve sus secciones
+# con `with timed("...")`. Cada sección se escribe como una línea JSON en PAGE_METRICS_FILE
+# (archivo rotativo); la página 9_Metricas calcula percentiles a partir de ahí.
+import json
+import logging
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+
+import pandas as pd
+import streamlit as st
+
+ENABLED = os.getenv("PAGE_METRICS", "0") == "1"
+METRICS_FILE = Path(os.getenv("PAGE_METRICS_FILE", "logs/page_metrics.jsonl"))
+MAX_BYTES = int(os.getenv("PAGE_METRICS_MAX_BYTES", str(5 * 1024 * 1024)))
+BACKUP_COUNT = 3
+
+
+def _get_logger() -> logging.Logger:
+    logger = logging.getLogger("almacen.page_metrics")
+    if not logger.handlers:
+        METRICS_FILE.parent.mkdir(parents=True, exist_ok=True)
+        handler = RotatingFileHandler(
+            METRICS_FILE, maxBytes=MAX_BYTES, backupCount=BACKUP_COUNT, encoding="utf-8"
+        )
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+    return logger
+
+
+def start_run(page: str) -> None:
+    """Inicio de una ejecución de la página: cuenta el rerun de esta sesión y marca el tiempo cero."""
+    if not ENABLED:
+        return
+    ss = st.session_state
+    if "_metrics_session" not in ss:
+        ss["_metrics_session"] = uuid.uuid4().hex[:12]
+        ss["_metrics_reruns"] = {}
+    reruns = ss["_metrics_reruns"]
+    reruns[page] = reruns.get(page, 0) + 1
+    ss["_metrics_run"] = {
+        "page": page,
+        "run": uuid.uuid4().hex[:12],
+        "rerun": reruns[page],
+        "t0": time.perf_counter(),
+    }
+
+
+@contextmanager
+def timed(section: str):
+    """Mide una sección con nombre de la ejecución actual (catálogos, consulta, tz, tabla, export…)."""
+    run = st.session_state.get("_metrics_run") if ENABLED else None
+    if run is None:
+        yield
+        return
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        t1 = time.perf_counter()
+        rec = {
+            "ts": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            "session": st.session_state["_metrics_session"],
+            "page": run["page"],
+            "run": run["run"],
+            "rerun": run["rerun"],
+            "section": section,
+            "ms": round((t1 - t0) * 1000, 3),
+            "end_ms": round((t1 - run["t0"]) * 1000, 3),
+        }
+        _get_logger().info(json.dumps(rec, ensure_ascii=False))
+
+
+def load_metrics() -> pd.DataFrame:
+    """Lee el archivo de métricas y sus rotaciones (más antiguas primero)."""
+    paths = [Path(f"{METRICS_FILE}.{i}") for i in range(BACKUP_COUNT, 0, -1)] + [METRICS_FILE]
+    rows = []
+    for p in paths:
+        if p.exists():
+            with p.open(encoding="utf-8") as f:
+                rows.extend(json.loads(line) for line in f if line.strip())
+    return pd.DataFrame(
+        rows, columns=["ts", "session", "page", "run", "rerun", "section", "ms", "end_ms"]
+    )
@@ -1,19 +1,29 @@
-import pandas as pd
+from datetime import datetime
+
 import streamlit as st
 from db.connection import get_engine
-from sqlalchemy import text
+from db.frames import read_frame
+from db.localtime import LOCAL_TZ
+from db.stock_live import (
+    apply_delta,
+    change_token,
+    changed_mask,
+    load_board,
+    recheck_after,
+    touched_balances,
+)
+from instrumentation import start_run, timed
 
 st.set_page_config(page_title="Stock Actual", layout="wide")
 
 st.title("📦 Stock Actual por Proyecto")
+start_run("1_Stock_Actual")
 
 engine = get_engine()
 
 # Selector de proyecto
-with engine.connect() as conn:
-    projects = pd.read_sql(
-        text("SELECT code, name FROM projects WHERE is_active=1 ORDER BY name"), conn
-    )
+with engine.connect() as conn, timed("catalogos"):
+    projects = read_frame(conn, "SELECT code, name FROM projects WHERE is_active=1 ORDER BY name")
 
 project = st.selectbox(
     "Selecciona proyecto",
@@ -21,33 +31,75 @@ project = st.selectbox(
     format_func=lambda c: projects.loc[projects["code"] == c, "name"].values[0],
 )
 
-show_zero = st.checkbox("Mostrar EPP sin stock", value=False)
-
-query = """
-SELECT
-    i.name AS epp,
-    COALESCE(t.size, '-') AS talla,
-    COALESCE(SUM(t.qty), 0) AS stock
-FROM items i
-LEFT JOIN transactions t
-    ON t.item_id = i.item_id
-    AND t.project_id = (SELECT project_id FROM projects WHERE code = :project)
-WHERE i.is_active = 1
-GROUP BY i.name, t.size
-ORDER BY i.name, talla;
-"""
-
-with engine.connect() as conn:
-    df = pd.read_sql(text(query), conn, params={"project": project})
-
-if not show_zero:
-    df = df[df["stock"] > 0]
-
-st.subheader("Stock disponible")
-
-if df.empty:
-    st.info("No hay stock disponible para este proyecto.")
-else:
-    st.dataframe(df, use_container_width=True)
+colA, colB = st.columns([1, 1])
+with colA:
+    show_zero = st.checkbox("Mostrar EPP sin stock", value=False)
+with colB:
+    live = st.toggle("Tablero en vivo", value=False, help="Revisa cada pocos segundos si hubo movimientos")
+    every = st.select_slider("Cada (segundos)", options=[3, 5, 10, 30, 60], value=5, disabled=not live)
+
+HIGHLIGHT = "background-color: #fff3b0"
+
+
+def refresh_board() -> dict:
+    """
+    Tablero en sesión: completo al abrir o cambiar de proyecto; después solo consulta el token y,
+    si hubo movimientos, los saldos de los EPP tocados.
+    """
+    board = st.session_state.get("stock_board")
+    with engine.connect() as conn:
+        with timed("token"):
+            token = change_token(conn)
+        if board is None or board["project"] != project:
+            with timed("consulta"):
+                df = load_board(conn, project)
+            board = {"project": project, "token": token, "df": df, "changed": set(), "updated": None}
+        elif token != board["token"]:
+            with timed("delta"):
+                delta = touched_balances(conn, project, recheck_after(board["token"]), token[0])
+                df, changed = apply_delta(board["df"], delta)
+            board = {
+                **board,
+                "token": token,
+                "df": df,
+                # Si los movimientos nuevos son de otro proyecto no hay nada que resaltar de nuevo
+                "changed": changed or board["changed"],
+                "updated": datetime.now(LOCAL_TZ).strftime("%H:%M:%S") if changed else board["updated"],
+            }
+    st.session_state["stock_board"] = board
+    return board
+
+
+def render_board(board: dict) -> None:
+    df = board["df"]
+    mask = changed_mask(df, board["changed"])
+    if not show_zero:
+        keep = df["stock"] > 0
+        df, mask = df[keep], mask[keep]
+
+    st.subheader("Stock disponible")
+    if board["updated"]:
+        st.caption(f"🟨 Últimos cambios {board['updated']} ({int(mask.sum())} filas resaltadas)")
+
+    with timed("tabla"):
+        if df.empty:
+            st.info("No hay stock disponible para este proyecto.")
+            return
+        view = df[["epp", "talla", "stock"]].reset_index(drop=True)
+        rows = mask.to_numpy()
+        styled = view.style.apply(
+            lambda col: [HIGHLIGHT if r else "" for r in rows], axis=0
+        )
+        st.dataframe(styled, use_container_width=True)
+
+
+# En vivo: solo este bloque se reejecuta cada `every` segundos; sin cambios no toca la BD más que
+# para leer el token
+@st.fragment(run_every=f"{every}s" if live else None)
+def stock_board():
+    render_board(refresh_board())
+
+
+stock_board()
 
 st.caption("Fuente: Kardex (transactions)")
@@ -1,8 +1,15 @@
-from datetime import datetime, timezone
-
-import pandas as pd
 import streamlit as st
 from db.connection import get_engine
+from db.dictionaries import item_sizes, normalize_size
+from db.frames import read_frame
+from db.movements import (
+    DUP_OUT_SQL,
+    DUP_WINDOW_SECONDS,
+    INSERT_OUT_SQL,
+    utc_now_str,
+)
+from db.queries import STOCK_SQL
+from db.write_queue import InsufficientStockError, write_movements
 from sqlalchemy import text
 
 st.set_page_config(page_title="Entregar EPP", layout="wide")
@@ -15,11 +22,8 @@ engine = get_engine()
 # Helpers
 # -------------------------
 def get_projects(conn):
-    return pd.read_sql(
-        text(
-            "SELECT project_id, code, name FROM projects WHERE is_active=1 ORDER BY name"
-        ),
-        conn,
+    return read_frame(
+        conn, "SELECT project_id, code, name FROM projects WHERE is_active=1 ORDER BY name"
     )
 
 
@@ -31,36 +35,26 @@ def get_locations_for_project(conn, project_code: str):
     WHERE (p.code = :pcode)
     ORDER BY l.name;
     """
-    return pd.read_sql(text(q), conn, params={"pcode": project_code})
+    return read_frame(conn, q, {"pcode": project_code})
 
 
 def get_workers(conn):
     # Tabla employees creada por tu importador de personal.xlsx
-    return pd.read_sql(
-        text("SELECT employee_id, full_name, dni FROM employees ORDER BY full_name"),
-        conn,
+    # (solo activos: el sync de personal da de baja a los cesados)
+    return read_frame(
+        conn, "SELECT employee_id, full_name, dni FROM employees WHERE is_active=1 ORDER BY full_name"
     )
 
 
 def get_items(conn):
-    return pd.read_sql(
-        text(
-            "SELECT item_id, name, has_size FROM items WHERE is_active=1 ORDER BY name"
-        ),
-        conn,
+    return read_frame(
+        conn, "SELECT item_id, name, has_size FROM items WHERE is_active=1 ORDER BY name"
     )
 
 
 def get_stock(conn, project_id: int, item_id: int, size: str | None):
-    q = """
-    SELECT COALESCE(SUM(qty), 0) AS stock
-    FROM transactions
-    WHERE project_id=:pid
-      AND item_id=:iid
-      AND ((:size IS NULL AND size IS NULL) OR (:size IS NOT NULL AND size=:size));
-    """
     return conn.execute(
-        text(q), {"pid": project_id, "iid": item_id, "size": size}
+        text(STOCK_SQL), {"pid": project_id, "iid": item_id, "size": size}
     ).scalar_one()
 
 
@@ -137,7 +131,12 @@ with colB:
 
 size = None
 if has_size == 1:
-    size = st.text_input("Talla (ej: T/39)", value="").strip() or None
+    # Misma talla escrita distinto ("T/39", "t/39 ", "39") es una sola: se normaliza
+    size = normalize_size(st.text_input("Talla (ej: T/39)", value=""))
+    with engine.connect() as conn:
+        known = item_sizes(conn, item_id)
+    if known:
+        st.caption("Tallas registradas: " + ", ".join(known))
 else:
     st.text_input("Talla", value="(no aplica)", disabled=True)
 
@@ -229,31 +228,17 @@ if pending:
     )
 
     # Anti-duplicado (misma entrega en los últimos 10 segundos)
-    dup_q = """
-    SELECT transaction_id
-    FROM transactions
-    WHERE txn_type='OUT'
-      AND project_id=:pid
-      AND employee_id=:eid
-      AND item_id=:iid
-      AND qty=:neg_qty
-      AND ((:size IS NULL AND size IS NULL) OR (:size IS NOT NULL AND size=:size))
-      AND txn_datetime >= datetime(:now_utc,'-10 seconds')
-    ORDER BY transaction_id DESC
-    LIMIT 1;
-    """
-
-    now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    since_utc = utc_now_str(DUP_WINDOW_SECONDS)
     with engine.connect() as conn:
         dup = conn.execute(
-            text(dup_q),
+            text(DUP_OUT_SQL),
             {
                 "pid": pending["project_id"],
                 "eid": pending["worker_id"],
                 "iid": pending["item_id"],
                 "neg_qty": -pending["qty"],
                 "size": pending["size"],
-                "now_utc": now_utc,
+                "since_utc": since_utc,
             },
         ).fetchone()
 
@@ -273,54 +258,38 @@ if pending:
             type="primary",
             disabled=(dup is not None and not st.session_state["force_duplicate_out"]),
         ):
-            # Revalidar stock justo antes de registrar (seguridad extra)
-            with engine.connect() as conn:
-                current_stock = get_stock(
-                    conn, pending["project_id"], pending["item_id"], pending["size"]
-                )
-            if pending["qty"] > current_stock:
+            # Se registra por la cola de escritura: el stock se revalida dentro del mismo commit
+            try:
+                txn_id = write_movements(
+                    engine,
+                    [
+                        (
+                            INSERT_OUT_SQL,
+                            {
+                                "pid": pending["project_id"],
+                                "lid": pending["location_id"],
+                                "iid": pending["item_id"],
+                                "qty": -pending["qty"],  # salida es negativa
+                                "size": pending["size"],
+                                "eid": pending["worker_id"],
+                                "notes": f"{pending['motivo']}"
+                                + (
+                                    f" | {pending['observacion']}"
+                                    if pending["observacion"]
+                                    else ""
+                                ),
+                                "now_utc": utc_now_str(),
+                            },
+                        )
+                    ],
+                )[0]
+            except InsufficientStockError as e:
                 st.error(
-                    f"❌ Stock cambió mientras confirmabas. Stock actual: {current_stock}. "
+                    f"❌ Stock cambió mientras confirmabas. Stock actual: {e.available}. "
                     "Actualiza y vuelve a intentar."
                 )
                 st.stop()
 
-            with engine.begin() as conn:
-                conn.execute(text("PRAGMA foreign_keys=ON;"))
-                conn.execute(
-                    text(
-                        """
-                    INSERT INTO transactions (
-                        txn_datetime, txn_type, project_id, location_id,
-                        item_id, qty, size, employee_id,
-                        request_number, reference, notes, created_by
-                    ) VALUES (
-                        :now_utc,'OUT',:pid,:lid,
-                        :iid,:qty,:size,:eid,
-                        NULL,NULL,:notes,'kevin'
-                    )
-                    """
-                    ),
-                    {
-                        "pid": pending["project_id"],
-                        "lid": pending["location_id"],
-                        "iid": pending["item_id"],
-                        "qty": -pending["qty"],  # salida es negativa
-                        "size": pending["size"],
-                        "eid": pending["worker_id"],
-                        "notes": f"{pending['motivo']}"
-                        + (
-                            f" | {pending['observacion']}"
-                            if pending["observacion"]
-                            else ""
-                        ),
-                        "now_utc": datetime.now(timezone.utc).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        ),
-                    },
-                )
-                txn_id = conn.execute(text("SELECT last_insert_rowid();")).scalar_one()
-
             st.success(
                 f"✅ Entrega registrada correctamente | ID movimiento: **{txn_id}**"
             )
@@ -1,8 +1,15 @@
-from datetime import datetime, timezone
-
-import pandas as pd
 import streamlit as st
 from db.connection import get_engine
+from db.dictionaries import item_sizes, normalize_size
+from db.frames import read_frame
+from db.movements import (
+    DUP_IN_SQL,
+    DUP_WINDOW_SECONDS,
+    INSERT_IN_SQL,
+    utc_now_str,
+)
+from db.queries import STOCK_SQL
+from db.write_queue import write_movements
 from sqlalchemy import text
 
 st.set_page_config(page_title="Ingresar Stock", layout="wide")
@@ -13,11 +20,8 @@ engine = get_engine()
 
 # Helpers
 def get_projects(conn):
-    return pd.read_sql(
-        text(
-            "SELECT project_id, code, name FROM projects WHERE is_active=1 ORDER BY name"
-        ),
-        conn,
+    return read_frame(
+        conn, "SELECT project_id, code, name FROM projects WHERE is_active=1 ORDER BY name"
     )
 
 
@@ -30,28 +34,18 @@ def get_locations(conn, project_code: str):
     WHERE (p.code = :pcode) OR (l.project_id IS NULL AND l.is_segregation=1)
     ORDER BY l.is_segregation DESC, l.name;
     """
-    return pd.read_sql(text(q), conn, params={"pcode": project_code})
+    return read_frame(conn, q, {"pcode": project_code})
 
 
 def get_items(conn):
-    return pd.read_sql(
-        text(
-            "SELECT item_id, name, has_size FROM items WHERE is_active=1 ORDER BY name"
-        ),
-        conn,
+    return read_frame(
+        conn, "SELECT item_id, name, has_size FROM items WHERE is_active=1 ORDER BY name"
     )
 
 
 def get_current_stock(conn, project_id: int, item_id: int, size: str | None):
-    q = """
-    SELECT COALESCE(SUM(qty), 0) AS stock
-    FROM transactions
-    WHERE project_id=:pid AND item_id=:iid AND (
-        (:size IS NULL AND size IS NULL) OR (:size IS NOT NULL AND size=:size)
-    );
-    """
     return conn.execute(
-        text(q), {"pid": project_id, "iid": item_id, "size": size}
+        text(STOCK_SQL), {"pid": project_id, "iid": item_id, "size": size}
     ).scalar_one()
 
 
@@ -98,8 +92,12 @@ with colA:
 with colB:
     size = None
     if has_size == 1:
-        size = st.text_input("Talla (ej: T/39)", value="")
-        size = size.strip() or None
+        # Misma talla escrita distinto ("T/39", "t/39 ", "39") es una sola: se normaliza
+        size = normalize_size(st.text_input("Talla (ej: T/39)", value=""))
+        with engine.connect() as conn:
+            known = item_sizes(conn, item_id)
+        if known:
+            st.caption("Tallas registradas: " + ", ".join(known))
     else:
         st.text_input("Talla", value="(no aplica)", disabled=True)
 
@@ -107,6 +105,10 @@ with colC:
     qty = st.number_input("Cantidad a ingresar", min_value=1, step=1)
 
 guia_remision = st.text_input("Guía de remisión (opcional)", value="")
+# Costo de compra por unidad: alimenta el costo promedio (valorización de stock y consumo)
+unit_cost = st.number_input(
+    "Costo unitario S/ (opcional)", min_value=0.0, value=None, step=0.01, format="%.2f"
+)
 requerimiento = st.text_input("N° requerimiento a Lima (opcional)", value="")
 notes = st.text_area("Notas adicionales (opcional)", value="", height=80)
 
@@ -134,6 +136,7 @@ payload = {
     "size": size,
     "qty": int(qty),
     "guia": guia_remision.strip() or None,
+    "unit_cost": None if unit_cost is None else float(unit_cost),
     "req": requerimiento.strip() or None,
     "notes": notes.strip() or None,
 }
@@ -162,35 +165,23 @@ if pending:
 - Talla: {pending['size'] or '-'}
 - Cantidad: +{pending['qty']}
 - Guía: {pending['guia'] or '-'}
+- Costo unitario: {'S/ %.2f' % pending['unit_cost'] if pending['unit_cost'] is not None else '-'}
 - Requerimiento: {pending['req'] or '-'}
 """,
         icon="⚠️",
     )
 
-    dup_q = """
-    SELECT transaction_id
-    FROM transactions
-    WHERE txn_type='IN'
-      AND project_id=:pid
-      AND location_id=:lid
-      AND item_id=:iid
-      AND qty=:qty
-      AND ((:size IS NULL AND size IS NULL) OR (:size IS NOT NULL AND size=:size))
-      AND txn_datetime >= datetime(:now_utc,'-10 seconds')
-    LIMIT 1;
-    """
-
-    now_utc = datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+    since_utc = utc_now_str(DUP_WINDOW_SECONDS)
     with engine.connect() as conn:
         dup = conn.execute(
-            text(dup_q),
+            text(DUP_IN_SQL),
             {
                 "pid": pending["project_id"],
                 "lid": pending["location_id"],
                 "iid": pending["item_id"],
                 "qty": pending["qty"],
                 "size": pending["size"],
-                "now_utc": now_utc,
+                "since_utc": since_utc,
             },
         ).fetchone()
 
@@ -208,40 +199,29 @@ if pending:
             type="primary",
             disabled=(dup is not None and not st.session_state["force_duplicate_in"]),
         ):
-            with engine.begin() as conn:
-                conn.execute(text("PRAGMA foreign_keys=ON;"))
-                conn.execute(
-                    text(
-                        """
-                    INSERT INTO transactions (
-                        txn_datetime, txn_type, project_id, location_id,
-                        item_id, qty, size, employee_id,
-                        request_number, reference, notes, created_by
-                    ) VALUES (
-                        :now_utc,'IN',:pid,:lid,
-                        :iid,:qty,:size,NULL,
-                        NULL,:ref,:notes,'kevin'
+            txn_id = write_movements(
+                engine,
+                [
+                    (
+                        INSERT_IN_SQL,
+                        {
+                            "pid": pending["project_id"],
+                            "lid": pending["location_id"],
+                            "iid": pending["item_id"],
+                            "qty": pending["qty"],
+                            "size": pending["size"],
+                            "ref": pending["guia"],
+                            "unit_cost": pending["unit_cost"],
+                            "notes": (
+                                ("REQ: " + pending["req"])
+                                if pending["req"]
+                                else pending["notes"]
+                            ),
+                            "now_utc": utc_now_str(),
+                        },
                     )
-                    """
-                    ),
-                    {
-                        "pid": pending["project_id"],
-                        "lid": pending["location_id"],
-                        "iid": pending["item_id"],
-                        "qty": pending["qty"],
-                        "size": pending["size"],
-                        "ref": pending["guia"],
-                        "notes": (
-                            ("REQ: " + pending["req"])
-                            if pending["req"]
-                            else pending["notes"]
-                        ),
-                        "now_utc": datetime.now(timezone.utc).strftime(
-                            "%Y-%m-%d %H:%M:%S"
-                        ),
-                    },
-                )
-                txn_id = conn.execute(text("SELECT last_insert_rowid();")).scalar_one()
+                ],
+            )[0]
 
             st.success(f"✅ Ingreso registrado | ID movimiento: {txn_id}")
             st.session_state["pending_in"] = None
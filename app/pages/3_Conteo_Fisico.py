@@ -0,0 +1,218 @@
+import io
+
+import pandas as pd
+import streamlit as st
+from db.connection import get_engine
+from db.counts import (
+    book_lines,
+    cancel_count,
+    count_diff,
+    open_count,
+    open_count_for,
+    parse_count_sheet,
+    post_count,
+)
+from db.frames import read_frame
+from db.localtime import to_local_str
+
+st.set_page_config(page_title="Conteo Físico", layout="wide")
+st.title("🧮 Conteo Físico")
+
+engine = get_engine()
+USER = "kevin"
+
+
+# Helpers
+def get_projects(conn):
+    return read_frame(
+        conn, "SELECT project_id, code, name FROM projects WHERE is_active=1 ORDER BY name"
+    )
+
+
+def get_locations(conn, project_code: str):
+    q = """
+    SELECT l.location_id, l.code, l.name, l.is_segregation
+    FROM locations l
+    LEFT JOIN projects p ON p.project_id = l.project_id
+    WHERE (p.code = :pcode) OR (l.project_id IS NULL AND l.is_segregation=1)
+    ORDER BY l.is_segregation DESC, l.name;
+    """
+    return read_frame(conn, q, {"pcode": project_code})
+
+
+def get_items(conn):
+    return read_frame(
+        conn, "SELECT item_id, name, has_size FROM items ORDER BY name", categories=[]
+    )
+
+
+def read_sheet(upload) -> pd.DataFrame:
+    if upload.name.lower().endswith(".csv"):
+        return pd.read_csv(upload, dtype=str, sep=None, engine="python", encoding="utf-8-sig")
+    return pd.read_excel(upload, dtype=str)
+
+
+def sheet_template(book: pd.DataFrame) -> bytes:
+    """Hoja para imprimir/llenar: el saldo en libros no va, se cuenta a ciegas."""
+    df = pd.DataFrame(
+        {
+            "EPP": book["epp"].astype(str),
+            "TALLA": book["talla"].astype(object).fillna(""),
+            "CANTIDAD": "",
+        }
+    )
+    output = io.BytesIO()
+    with pd.ExcelWriter(output, engine="openpyxl") as writer:
+        df.to_excel(writer, index=False, sheet_name="conteo")
+    return output.getvalue()
+
+
+# UI
+with engine.connect() as conn:
+    projects = get_projects(conn)
+    items = get_items(conn)
+
+col1, col2 = st.columns(2)
+
+with col1:
+    project_code = st.selectbox(
+        "Proyecto",
+        projects["code"],
+        format_func=lambda c: projects.loc[projects["code"] == c, "name"].values[0],
+    )
+    project_id = int(
+        projects.loc[projects["code"] == project_code, "project_id"].values[0]
+    )
+
+with engine.connect() as conn:
+    locations = get_locations(conn, project_code)
+
+with col2:
+    location_code = st.selectbox(
+        "Ubicación",
+        locations["code"],
+        format_func=lambda c: locations.loc[locations["code"] == c, "name"].values[0],
+    )
+    location_id = int(
+        locations.loc[locations["code"] == location_code, "location_id"].values[0]
+    )
+
+if st.session_state.get("count_msg"):
+    st.success(st.session_state.pop("count_msg"))
+
+with engine.connect() as conn:
+    count = open_count_for(conn, project_id, location_id)
+
+st.divider()
+
+# 1) Sin conteo abierto: congelar saldos
+if count is None:
+    st.info(
+        f"No hay conteo abierto en **{location_code}**. Al iniciarlo se congela el saldo en libros: "
+        "los movimientos que se registren mientras se cuenta no alteran las diferencias."
+    )
+    if st.button("▶️ Iniciar conteo (congelar saldos)", type="primary"):
+        with engine.begin() as conn:
+            count = open_count(conn, project_id, location_id, location_code, USER)
+        st.session_state["count_msg"] = f"Conteo iniciado: {count['reference']}"
+        st.rerun()
+    st.stop()
+
+# 2) Conteo abierto: hoja de conteo
+with engine.connect() as conn:
+    book = book_lines(conn, count["count_id"])
+
+frozen_local = to_local_str(pd.Series([count["frozen_at"]])).iloc[0]
+st.subheader(f"📋 {count['reference']}")
+st.caption(
+    f"Saldos congelados el {frozen_local} (hasta el movimiento #{count['frozen_txn_id']}) | "
+    f"{len(book)} líneas en libros"
+)
+
+st.download_button(
+    "⬇️ Descargar hoja de conteo (Excel)",
+    data=sheet_template(book),
+    file_name=f"conteo_{location_code}.xlsx",
+    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+)
+
+mode = st.radio("Ingreso del conteo", ["Subir hoja (Excel/CSV)", "Llenar en pantalla"], horizontal=True)
+
+raw = None
+if mode.startswith("Subir"):
+    upload = st.file_uploader("Hoja de conteo (columnas EPP, TALLA, CANTIDAD)", type=["xlsx", "xls", "csv"])
+    if upload is not None:
+        raw = read_sheet(upload)
+else:
+    # Una fila por línea en libros (se pueden agregar las que aparezcan en el almacén)
+    editor = pd.DataFrame(
+        {
+            "EPP": book["epp"].astype(object),
+            "TALLA": book["talla"].astype(object),
+            "CANTIDAD": pd.Series([None] * len(book), dtype="Int64"),
+        }
+    )
+    raw = st.data_editor(
+        editor,
+        num_rows="dynamic",
+        hide_index=True,
+        use_container_width=True,
+        column_config={
+            "EPP": st.column_config.SelectboxColumn("EPP", options=list(items["name"]), required=True),
+            "CANTIDAD": st.column_config.NumberColumn("CANTIDAD", min_value=0, step=1),
+        },
+        key=f"count_editor_{count['count_id']}",
+    )
+
+missing_as_zero = st.checkbox(
+    "Conteo completo: lo que no figura en la hoja se contó en 0",
+    value=True,
+    help="Desmarcado: las líneas sin cantidad quedan fuera del ajuste (conteo parcial).",
+)
+
+if raw is not None:
+    counted, errors = parse_count_sheet(raw, items)
+    if errors:
+        st.error(f"{len(errors)} filas con errores (corrígelas y vuelve a subir):")
+        st.code("\n".join(errors[:50]))
+
+    diff = count_diff(book, counted, missing_as_zero)
+    view = diff.merge(items[["item_id", "name"]], on="item_id", how="left").rename(
+        columns={"name": "epp", "book_qty": "libros", "counted_qty": "contado"}
+    )[["epp", "talla", "libros", "contado", "diferencia"]]
+    adjust = view[view["diferencia"].fillna(0) != 0]
+
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Líneas contadas", int(diff["counted_qty"].notna().sum()))
+    k2.metric("Con diferencia", len(adjust))
+    k3.metric("Sobrantes (UND)", int(adjust["diferencia"].clip(lower=0).sum()))
+    k4.metric("Faltantes (UND)", int(-adjust["diferencia"].clip(upper=0).sum()))
+
+    only_diff = st.checkbox("Ver solo diferencias", value=True)
+    st.dataframe(adjust if only_diff else view, use_container_width=True, hide_index=True)
+
+    st.subheader("Contabilizar")
+    confirm = st.checkbox(
+        f"Confirmo el conteo: se registran {len(adjust)} ajustes (ADJUST) con la referencia {count['reference']}"
+    )
+    if st.button("✅ Contabilizar conteo", type="primary", disabled=not confirm or bool(errors)):
+        try:
+            with engine.begin() as conn:
+                n = post_count(conn, count["count_id"], diff, USER)
+        except RuntimeError as e:
+            st.error(str(e))
+            st.stop()
+        st.session_state["count_msg"] = f"✅ {count['reference']} contabilizado | {n} ajustes registrados"
+        st.rerun()
+
+st.divider()
+if st.button("🗑️ Anular conteo"):
+    with engine.begin() as conn:
+        cancel_count(conn, count["count_id"])
+    st.session_state["count_msg"] = f"Conteo {count['reference']} anulado (sin ajustes)."
+    st.rerun()
+
+st.caption(
+    "Cada diferencia crea un movimiento ADJUST (contado - libros al congelar) en la ubicación. "
+    "Todos se registran juntos en una sola transacción."
+)
@@ -1,131 +1,66 @@
-from datetime import datetime, time, timezone
-from zoneinfo import ZoneInfo
-
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import streamlit as st
 from db.connection import get_engine
-from sqlalchemy import text
+from db.frames import read_frame
+from db.localtime import LOCAL_TZ
+from db.snapshot import consumo, get_snapshot, sum_by, to_frame
+from db.valuation import consumption_cost, is_initialized, stock_value
+from instrumentation import start_run, timed
 
 st.set_page_config(page_title="Reportes KPI", layout="wide")
 st.title("📊 KPIs de Rotación / Consumo de EPP")
+start_run("6_Reportes")
 
 engine = get_engine()
 
-# Estrategia definitiva de fechas/horas:
-# - Guardar en BD en UTC (txn_datetime en UTC)
-# - Mostrar y filtrar en hora local (America/Lima), convirtiendo a UTC al consultar
-LOCAL_TZ = ZoneInfo("America/Lima")
-UTC_TZ = timezone.utc
-
 
 # -------------------------
 # Helpers
 # -------------------------
 def load_projects(conn) -> pd.DataFrame:
-    return pd.read_sql(
-        text(
-            "SELECT project_id, code, name FROM projects WHERE is_active=1 ORDER BY name"
-        ),
-        conn,
+    return read_frame(
+        conn, "SELECT project_id, code, name FROM projects WHERE is_active=1 ORDER BY name"
     )
 
 
 def load_items(conn) -> pd.DataFrame:
-    return pd.read_sql(
-        text(
-            "SELECT item_id, name, has_size FROM items WHERE is_active=1 ORDER BY name"
-        ),
-        conn,
+    return read_frame(
+        conn, "SELECT item_id, name, has_size FROM items WHERE is_active=1 ORDER BY name"
     )
 
 
 def load_employees(conn) -> pd.DataFrame:
-    return pd.read_sql(
-        text("SELECT employee_id, full_name, dni FROM employees ORDER BY full_name"),
-        conn,
-    )
+    return read_frame(conn, "SELECT employee_id, full_name, dni FROM employees ORDER BY full_name")
 
 
-def query_consumo(filters: dict) -> pd.DataFrame:
+def query_consumo(filters: dict) -> pa.Table:
     """
     Consumo = movimientos OUT (qty negativa). Para reportes usaremos unidades positivas: consumo_und = -qty.
+    Sale del snapshot Arrow compartido (db/snapshot.py): filtros y agrupaciones sin tocar la BD.
     """
-    where = [
-        "t.txn_datetime >= :dt_start",
-        "t.txn_datetime <= :dt_end",
-        "t.txn_type = 'OUT'",
-    ]
-    params = {
-        "dt_start": filters["dt_start"],
-        "dt_end": filters["dt_end"],
-    }
+    snap = get_snapshot()
+    with timed("consumo:snapshot"):
+        snap.refresh(min_interval=5)
+    with timed("consumo:consulta"):
+        return consumo(snap.table(), filters)
 
-    if filters.get("project_id"):
-        where.append("t.project_id = :pid")
-        params["pid"] = filters["project_id"]
-
-    if filters.get("item_id"):
-        where.append("t.item_id = :iid")
-        params["iid"] = filters["item_id"]
-
-    if filters.get("employee_id"):
-        where.append("t.employee_id = :eid")
-        params["eid"] = filters["employee_id"]
-
-    # Motivo (V1: está dentro de notes)
-    if filters.get("motivo"):
-        where.append("COALESCE(t.notes,'') LIKE :motivo_q")
-        params["motivo_q"] = f"%{filters['motivo']}%"
-
-    q = f"""
-    SELECT
-      t.transaction_id,
-      t.txn_datetime AS fecha_hora,
-      p.code AS proyecto,
-      e.full_name AS trabajador,
-      e.dni AS dni,
-      i.name AS epp,
-      t.size AS talla,
-      (-t.qty) AS consumo_und,
-      t.notes AS notas
-    FROM transactions t
-    LEFT JOIN projects p ON p.project_id = t.project_id
-    LEFT JOIN employees e ON e.employee_id = t.employee_id
-    LEFT JOIN items i ON i.item_id = t.item_id
-    WHERE {" AND ".join(where)}
-    """
-    with engine.connect() as conn:
-        df = pd.read_sql(text(q), conn, params=params)
-
-    # Mostrar fecha/hora en zona local (America/Lima).
-    # En BD se asume UTC; si viene naive, la tratamos como UTC.
-    if not df.empty and "fecha_hora" in df.columns:
-        fh = pd.to_datetime(df["fecha_hora"], errors="coerce")
-        try:
-            fh = fh.dt.tz_localize("UTC", nonexistent="shift_forward", ambiguous="NaT")
-        except Exception:
-            pass
-        try:
-            fh = fh.dt.tz_convert(LOCAL_TZ)
-        except Exception:
-            pass
-        df["fecha_hora"] = fh
-
-    # Normalizamos fecha
-    if not df.empty:
-        # Ya convertimos fecha_hora a hora local (tz-aware). Derivamos fecha/mes desde local.
-        df["fecha"] = df["fecha_hora"].dt.date
-        df["mes"] = df["fecha_hora"].dt.to_period("M").astype(str)
-        # Para tablas/export, mostramos sin sufijo de zona
-        df["fecha_hora"] = df["fecha_hora"].dt.strftime("%Y-%m-%d %H:%M:%S")
-
-    return df
+
+@st.fragment
+def serie_rotacion(tbl: pa.Table):
+    # Fragmento: cambiar la granularidad solo redibuja el gráfico (sin reconsultar)
+    gran = st.selectbox("Agrupar por", ["Mes", "Día"], index=0)
+    col = "mes" if gran == "Mes" else "fecha"
+    serie = sum_by(tbl, [col], "consumo_und").rename(columns={"consumo_und": "unidades"})
+    serie = serie.sort_values(col)
+    st.line_chart(serie.set_index(col)["unidades"])
 
 
 # -------------------------
 # Carga catálogos
 # -------------------------
-with engine.connect() as conn:
+with engine.connect() as conn, timed("catalogos"):
     projects = load_projects(conn)
     items = load_items(conn)
     employees = load_employees(conn)
@@ -141,85 +76,87 @@ if items.empty:
 # -------------------------
 # Filtros
 # -------------------------
+# En un formulario: cambiar filtros no reejecuta la página; la consulta solo corre al aplicar.
 st.subheader("Filtros")
 
 today = pd.Timestamp.now(tz=LOCAL_TZ).normalize()
 default_start = (today - pd.Timedelta(days=30)).date()
 
-c1, c2, c3, c4 = st.columns([1.2, 1.2, 1.6, 1.6])
-
-with c1:
-    date_start = st.date_input("Desde", value=default_start)
-with c2:
-    date_end = st.date_input("Hasta", value=today.date())
-
-# Convertimos rango seleccionado (hora local) a UTC para que el filtro calce con lo guardado en BD
-dt_start_local = datetime.combine(date_start, time.min).replace(tzinfo=LOCAL_TZ)
-dt_end_local = datetime.combine(date_end, time.max).replace(tzinfo=LOCAL_TZ)
-dt_start = dt_start_local.astimezone(UTC_TZ).strftime("%Y-%m-%d %H:%M:%S")
-dt_end = dt_end_local.astimezone(UTC_TZ).strftime("%Y-%m-%d %H:%M:%S")
-
-with c3:
-    proj_opt = st.selectbox(
-        "Proyecto",
-        ["(Todos)"] + projects["code"].tolist(),
-        index=0,
-        format_func=lambda c: (
-            "(Todos)"
-            if c == "(Todos)"
-            else projects.loc[projects["code"] == c, "name"].values[0]
-        ),
-    )
+with st.form("filtros_consumo"):
+    c1, c2, c3, c4 = st.columns([1.2, 1.2, 1.6, 1.6])
+
+    with c1:
+        date_start = st.date_input("Desde", value=default_start)
+    with c2:
+        date_end = st.date_input("Hasta", value=today.date())
+
+    with c3:
+        proj_opt = st.selectbox(
+            "Proyecto",
+            ["(Todos)"] + projects["code"].tolist(),
+            index=0,
+            format_func=lambda c: (
+                "(Todos)"
+                if c == "(Todos)"
+                else projects.loc[projects["code"] == c, "name"].values[0]
+            ),
+        )
+
+    with c4:
+        motivo_opts = [
+            "(Todos)",
+            "Entrega inicial",
+            "Renovación",
+            "Desgaste",
+            "Reposición",
+            "Cambio de talla",
+            "Otro",
+        ]
+        motivo_sel = st.selectbox("Motivo (según notas)", motivo_opts, index=0)
+
+    c5, c6 = st.columns([2.2, 2.2])
+
+    with c5:
+        item_opt = st.selectbox("EPP", ["(Todos)"] + items["name"].tolist(), index=0)
+
+    with c6:
+        worker_opt = st.selectbox(
+            "Trabajador", ["(Todos)"] + employees["full_name"].tolist(), index=0
+        )
+
+    aplicar = st.form_submit_button("🔎 Aplicar filtros", type="primary")
+
+# Primera visita: últimos 30 días; luego solo se consulta al aplicar
+if aplicar or "reportes_consumo" not in st.session_state:
     project_id = None
     if proj_opt != "(Todos)":
         project_id = int(
             projects.loc[projects["code"] == proj_opt, "project_id"].values[0]
         )
 
-with c4:
-    motivo_opts = [
-        "(Todos)",
-        "Entrega inicial",
-        "Renovación",
-        "Desgaste",
-        "Reposición",
-        "Cambio de talla",
-        "Otro",
-    ]
-    motivo_sel = st.selectbox("Motivo (según notas)", motivo_opts, index=0)
-    motivo = None if motivo_sel == "(Todos)" else motivo_sel
-
-c5, c6, c7 = st.columns([2.2, 2.2, 1.6])
-
-with c5:
-    item_opt = st.selectbox("EPP", ["(Todos)"] + items["name"].tolist(), index=0)
     item_id = None
     if item_opt != "(Todos)":
         item_id = int(items.loc[items["name"] == item_opt, "item_id"].values[0])
 
-with c6:
-    worker_opt = st.selectbox(
-        "Trabajador", ["(Todos)"] + employees["full_name"].tolist(), index=0
-    )
     employee_id = None
     if worker_opt != "(Todos)":
         employee_id = int(
             employees.loc[employees["full_name"] == worker_opt, "employee_id"].values[0]
         )
 
-with c7:
-    gran = st.selectbox("Agrupar por", ["Mes", "Día"], index=0)
-
-filters = {
-    "dt_start": dt_start,
-    "dt_end": dt_end,
-    "project_id": project_id,
-    "item_id": item_id,
-    "employee_id": employee_id,
-    "motivo": motivo,
-}
+    filters = {
+        # Días locales: se filtran contra txn_local_date (sin convertir a UTC)
+        "date_start": date_start,
+        "date_end": date_end,
+        "project_id": project_id,
+        "item_id": item_id,
+        "employee_id": employee_id,
+        "motivo": None if motivo_sel == "(Todos)" else motivo_sel,
+    }
+    st.session_state["reportes_consumo"] = (filters, query_consumo(filters))
 
-df = query_consumo(filters)
+filters, tbl = st.session_state["reportes_consumo"]
+project_id = filters["project_id"]
 
 st.divider()
 
@@ -228,167 +165,155 @@ st.divider()
 # -------------------------
 st.subheader("Resumen (solo Entregas / OUT)")
 
-if df.empty:
+if tbl.num_rows == 0:
     st.info("No hay entregas (OUT) en el rango seleccionado.")
     st.stop()
 
-total_und = int(df["consumo_und"].sum())
-movs = int(len(df))
-trabajadores = (
-    int(df["dni"].nunique()) if "dni" in df.columns else int(df["trabajador"].nunique())
-)
+with timed("kpis_graficos"):
+    total_und = int(pc.sum(tbl["consumo_und"]).as_py())
+    movs = tbl.num_rows
+    trabajadores = pc.count_distinct(tbl["dni"].cast(pa.string())).as_py()
+
+    # Top item
+    top_item = sum_by(tbl, ["epp"], "consumo_und", top=1)
+
+    k1, k2, k3, k4 = st.columns(4)
+    k1.metric("Unidades entregadas", f"{total_und}")
+    k2.metric("N° entregas (movimientos)", f"{movs}")
+    k3.metric("Trabajadores con entregas", f"{trabajadores}")
+    k4.metric(
+        "Mayor consumo",
+        f"{top_item['epp'].iloc[0]} ({int(top_item['consumo_und'].iloc[0])} und)"
+        if not top_item.empty
+        else "—",
+    )
 
-# Top item y top trabajador
-top_item = (
-    df.groupby("epp", dropna=False)["consumo_und"]
-    .sum()
-    .sort_values(ascending=False)
-    .head(1)
-)
-top_worker = (
-    df.groupby("trabajador", dropna=False)["consumo_und"]
-    .sum()
-    .sort_values(ascending=False)
-    .head(1)
-)
+    st.caption(
+        "Nota: El consumo se calcula como `-qty` para movimientos OUT (qty negativa)."
+    )
 
-k1, k2, k3, k4 = st.columns(4)
-k1.metric("Unidades entregadas", f"{total_und}")
-k2.metric("N° entregas (movimientos)", f"{movs}")
-k3.metric("Trabajadores con entregas", f"{trabajadores}")
-k4.metric(
-    "Mayor consumo",
-    f"{top_item.index[0]} ({int(top_item.iloc[0])} und)" if not top_item.empty else "—",
-)
+    st.divider()
+
+    # -------------------------
+    # Series temporales (rotación)
+    # -------------------------
+    st.subheader("Rotación en el tiempo")
+
+    serie_rotacion(tbl)
+
+    st.divider()
+
+    # -------------------------
+    # Top rankings
+    # -------------------------
+    colA, colB = st.columns(2)
+
+    with colA:
+        st.subheader("Top 10 EPP consumidos")
+        top_epp = sum_by(tbl, ["epp"], "consumo_und", top=10)
+        top_epp = top_epp.rename(columns={"consumo_und": "unidades"})
+        st.dataframe(top_epp, use_container_width=True, height=360)
+        if not top_epp.empty:
+            st.bar_chart(top_epp.set_index("epp")["unidades"])
+
+    with colB:
+        st.subheader("Top 10 trabajadores por consumo")
+        con_trabajador = tbl.filter(pc.is_valid(tbl["trabajador"]))
+        top_trab = sum_by(con_trabajador, ["trabajador", "dni"], "consumo_und", top=10)
+        top_trab = top_trab.rename(columns={"consumo_und": "unidades"})
+        st.dataframe(top_trab, use_container_width=True, height=360)
+
+    st.divider()
+
+    # -------------------------
+    # Consumo por motivo (KPI clave)
+    # -------------------------
+    st.subheader("Consumo por motivo de entrega")
+
+
+    # Extraemos motivo desde notas (V1): el primero de la lista que aparezca, sin distinguir mayúsculas
+    def extract_motivo(notas: pa.ChunkedArray) -> pa.ChunkedArray:
+        motivos = [
+            "Entrega inicial",
+            "Renovación",
+            "Desgaste",
+            "Reposición",
+            "Cambio de talla",
+            "Otro",
+        ]
+        motivo = pa.scalar("No especificado")
+        for m in reversed(motivos):
+            hit = pc.fill_null(pc.match_substring(notas, m, ignore_case=True), False)
+            motivo = pc.if_else(hit, m, motivo)
+        return motivo
+
+
+    tbl_m = tbl.append_column("motivo", extract_motivo(tbl["notas"]))
+    consumo_motivo = sum_by(tbl_m, ["motivo"], "consumo_und").rename(
+        columns={"consumo_und": "unidades"}
+    )
 
-st.caption(
-    "Nota: El consumo se calcula como `-qty` para movimientos OUT (qty negativa)."
-)
+    if consumo_motivo.empty:
+        st.info("No hay datos suficientes para mostrar consumo por motivo.")
+    else:
+        colM1, colM2 = st.columns([1.2, 1.8])
 
-st.divider()
+        with colM1:
+            st.dataframe(consumo_motivo, use_container_width=True, height=260)
 
-# -------------------------
-# Series temporales (rotación)
-# -------------------------
-st.subheader("Rotación en el tiempo")
-
-if gran == "Mes":
-    serie = (
-        df.groupby("mes")["consumo_und"]
-        .sum()
-        .reset_index()
-        .rename(columns={"consumo_und": "unidades"})
-    )
-    serie = serie.sort_values("mes")
-    st.line_chart(serie.set_index("mes")["unidades"])
-else:
-    serie = (
-        df.groupby("fecha")["consumo_und"]
-        .sum()
-        .reset_index()
-        .rename(columns={"consumo_und": "unidades"})
-    )
-    serie = serie.sort_values("fecha")
-    st.line_chart(serie.set_index("fecha")["unidades"])
+        with colM2:
+            st.bar_chart(consumo_motivo.set_index("motivo")["unidades"])
 
-st.divider()
+    # -------------------------
+    # Matriz EPP vs Proyecto (solo si estás en Todos)
+    # -------------------------
+    st.subheader("Consumo por proyecto (comparativo)")
 
-# -------------------------
-# Top rankings
-# -------------------------
-colA, colB = st.columns(2)
-
-with colA:
-    st.subheader("Top 10 EPP consumidos")
-    top_epp = (
-        df.groupby("epp")["consumo_und"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(10)
-        .reset_index()
-    )
-    top_epp = top_epp.rename(columns={"consumo_und": "unidades"})
-    st.dataframe(top_epp, use_container_width=True, height=360)
-    if not top_epp.empty:
-        st.bar_chart(top_epp.set_index("epp")["unidades"])
-
-with colB:
-    st.subheader("Top 10 trabajadores por consumo")
-    top_trab = (
-        df.groupby(["trabajador", "dni"])["consumo_und"]
-        .sum()
-        .sort_values(ascending=False)
-        .head(10)
-        .reset_index()
-    )
-    top_trab = top_trab.rename(columns={"consumo_und": "unidades"})
-    st.dataframe(top_trab, use_container_width=True, height=360)
+    if project_id is None:
+        piv = (
+            sum_by(tbl, ["proyecto", "epp"], "consumo_und")
+            .pivot(index="epp", columns="proyecto", values="consumo_und")
+            .fillna(0)
+            .astype(int)
+        )
+        st.dataframe(piv, use_container_width=True, height=420)
+    else:
+        st.info("Selecciona '(Todos)' en Proyecto para ver el comparativo entre proyectos.")
 
 st.divider()
 
 # -------------------------
-# Consumo por motivo (KPI clave)
+# Valorización (costo promedio ponderado, db/valuation.py)
 # -------------------------
-st.subheader("Consumo por motivo de entrega")
-
-
-# Extraemos motivo desde notas (V1)
-def extract_motivo(notes: str | None) -> str:
-    if not notes:
-        return "No especificado"
-    motivos = [
-        "Entrega inicial",
-        "Renovación",
-        "Desgaste",
-        "Reposición",
-        "Cambio de talla",
-        "Otro",
-    ]
-    for m in motivos:
-        if m.lower() in notes.lower():
-            return m
-    return "No especificado"
-
-
-df_m = df.copy()
-df_m["motivo"] = df_m["notas"].apply(extract_motivo)
-
-consumo_motivo = (
-    df_m.groupby("motivo")["consumo_und"]
-    .sum()
-    .reset_index()
-    .rename(columns={"consumo_und": "unidades"})
-    .sort_values("unidades", ascending=False)
-)
-
-if consumo_motivo.empty:
-    st.info("No hay datos suficientes para mostrar consumo por motivo.")
-else:
-    colM1, colM2 = st.columns([1.2, 1.8])
-
-    with colM1:
-        st.dataframe(consumo_motivo, use_container_width=True, height=260)
+st.subheader("Valorización (costo promedio ponderado)")
 
-    with colM2:
-        st.bar_chart(consumo_motivo.set_index("motivo")["unidades"])
+proj_code = None if project_id is None else proj_opt
+with engine.connect() as conn, timed("valorizacion"):
+    valued = is_initialized(conn)
+    if valued:
+        costo = consumption_cost(conn, filters["date_start"], filters["date_end"], proj_code)
+        valor = stock_value(conn, proj_code)
 
-# -------------------------
-# Matriz EPP vs Proyecto (solo si estás en Todos)
-# -------------------------
-st.subheader("Consumo por proyecto (comparativo)")
-
-if project_id is None:
-    piv = (
-        df.groupby(["proyecto", "epp"])["consumo_und"]
-        .sum()
-        .reset_index()
-        .pivot(index="epp", columns="proyecto", values="consumo_und")
-        .fillna(0)
-        .astype(int)
-    )
-    st.dataframe(piv, use_container_width=True, height=420)
+if not valued:
+    st.info("Valorización sin inicializar: `python -m scripts.valuation --backfill`.")
 else:
-    st.info("Selecciona '(Todos)' en Proyecto para ver el comparativo entre proyectos.")
+    costo_out = costo[costo["tipo"] == "OUT"]
+    v1, v2, v3 = st.columns(3)
+    v1.metric("Costo de entregas (rango)", f"S/ {costo_out['costo'].fillna(0).sum():,.2f}")
+    v2.metric("Valor del stock actual", f"S/ {valor['valor'].sum():,.2f}")
+    v3.metric("Unidades entregadas sin costo", f"{int(costo_out['unidades_sin_costo'].sum())}")
+
+    colV1, colV2 = st.columns(2)
+    with colV1:
+        st.caption("Costo de salidas por mes y proyecto")
+        st.dataframe(costo, use_container_width=True, height=300)
+    with colV2:
+        st.caption("Valor del stock por proyecto")
+        st.dataframe(
+            valor.groupby("proyecto", observed=True)[["valor"]].sum().reset_index(),
+            use_container_width=True,
+            height=300,
+        )
 
 st.divider()
 
@@ -397,13 +322,15 @@ st.divider()
 # -------------------------
 st.subheader("Exportar datos base (para BI)")
 
-csv_bytes = df.to_csv(index=False).encode("utf-8-sig")
-st.download_button(
-    "⬇️ Descargar datos de consumo (CSV)",
-    data=csv_bytes,
-    file_name="kpi_consumo_out.csv",
-    mime="text/csv",
-)
+with timed("export"):
+    csv_bytes = to_frame(tbl).to_csv(index=False).encode("utf-8-sig")
+    st.download_button(
+        "⬇️ Descargar datos de consumo (CSV)",
+        data=csv_bytes,
+        file_name="kpi_consumo_out.csv",
+        mime="text/csv",
+        on_click="ignore",
+    )
 
 st.caption(
     "Estos datos (OUT) son la base para dashboards en Power BI/Tableau. Más adelante agregaremos indicadores de stock crítico y vida útil."
@@ -0,0 +1,105 @@
+import pandas as pd
+import streamlit as st
+from db.archive import transactions_source
+from db.connection import get_engine
+from db.frames import read_frame
+from db.localtime import LOCAL_TZ, utc_bounds
+from db.queries import size_curve_query
+from db.size_curve import GLOBAL, size_curve
+from instrumentation import start_run, timed
+
+st.set_page_config(page_title="Curva de Tallas", layout="wide")
+st.title("📐 Curva de tallas para compras")
+start_run("7_Curva_de_Tallas")
+
+engine = get_engine()
+
+with engine.connect() as conn, timed("catalogos"):
+    projects = read_frame(
+        conn, "SELECT project_id, code, name FROM projects WHERE is_active=1 ORDER BY name"
+    )
+
+today = pd.Timestamp.now(tz=LOCAL_TZ).normalize()
+
+with st.form("filtros_curva"):
+    c1, c2, c3, c4 = st.columns([1.2, 1.2, 1.6, 1.2])
+    with c1:
+        date_start = st.date_input("Consumo desde", value=(today - pd.DateOffset(years=1)).date())
+    with c2:
+        date_end = st.date_input("Hasta", value=today.date())
+    with c3:
+        proj_opt = st.selectbox(
+            "Proyecto",
+            [GLOBAL] + projects["code"].tolist(),
+            format_func=lambda c: (
+                c if c == GLOBAL else projects.loc[projects["code"] == c, "name"].values[0]
+            ),
+        )
+    with c4:
+        purchase = st.number_input(
+            "Unidades a comprar por modelo",
+            min_value=0,
+            value=0,
+            step=10,
+            help="0 = reponer lo consumido en el rango",
+        )
+    aplicar = st.form_submit_button("🔎 Calcular", type="primary")
+
+if aplicar or "curva_tallas" not in st.session_state:
+    project_id = None
+    if proj_opt != GLOBAL:
+        project_id = int(projects.loc[projects["code"] == proj_opt, "project_id"].values[0])
+    filters = {"date_start": date_start, "date_end": date_end, "project_id": project_id}
+    with engine.connect() as conn, timed("curva:consulta"):
+        # El archivo solo se une si el rango toca años archivados
+        source = transactions_source(conn, *utc_bounds(date_start, date_end))
+        q, params = size_curve_query(filters, source)
+        raw = read_frame(conn, q, params, categories=[])
+    with timed("curva:calculo"):
+        curve = size_curve(raw, by_project=project_id is not None, purchase=int(purchase) or None)
+    st.session_state["curva_tallas"] = curve
+
+curve = st.session_state["curva_tallas"]
+
+if curve.empty:
+    st.info("No hay EPP con talla con consumo o stock para este filtro.")
+    st.stop()
+
+modelos = curve["modelo"].unique().tolist()
+modelo = st.selectbox("Modelo", modelos)
+sel = curve[curve["modelo"] == modelo]
+
+k1, k2, k3 = st.columns(3)
+k1.metric("Consumo en el rango", f"{int(sel['consumo'].sum())} und")
+k2.metric("Stock actual", f"{int(sel['stock'].sum())} und")
+k3.metric("Compra sugerida", f"{int(sel['compra_sugerida'].sum())} und")
+
+colA, colB = st.columns([1.2, 1.8])
+with colA:
+    st.dataframe(
+        sel.drop(columns=["ambito", "modelo"]).style.format(
+            {"pct_consumo": "{:.0%}", "pct_stock": "{:.0%}", "pct_compra": "{:.0%}"}, na_rep="—"
+        ),
+        use_container_width=True,
+        hide_index=True,
+    )
+with colB:
+    chart = sel.set_index("talla")[["pct_consumo", "pct_stock", "pct_compra"]].rename(
+        columns={"pct_consumo": "% consumo", "pct_stock": "% stock", "pct_compra": "% compra"}
+    )
+    st.bar_chart(chart.fillna(0), stack=False)
+
+st.divider()
+st.subheader("Todos los modelos")
+st.dataframe(curve, use_container_width=True, hide_index=True, height=420)
+st.download_button(
+    "⬇️ Descargar curva de tallas (CSV)",
+    data=curve.to_csv(index=False).encode("utf-8-sig"),
+    file_name="curva_tallas.csv",
+    mime="text/csv",
+    on_click="ignore",
+)
+st.caption(
+    "Consumo = entregas OUT del rango. Compra sugerida: deja el stock, después de comprar, con la "
+    "forma de la curva de consumo (las tallas con exceso no reciben compra)."
+)
@@ -0,0 +1,86 @@
+import pandas as pd
+import streamlit as st
+from db.connection import PROFILE_ENABLED, get_query_stats, reset_query_stats
+from instrumentation import ENABLED, METRICS_FILE, load_metrics
+
+st.set_page_config(page_title="Métricas", layout="wide")
+st.title("⏱️ Métricas de rendimiento (admin)")
+
+if not ENABLED:
+    st.info(
+        "Las métricas de página están desactivadas. Activa `PAGE_METRICS=1` en el .env y reinicia la app."
+    )
+    st.stop()
+
+df = load_metrics()
+if df.empty:
+    st.info(f"Aún no hay métricas en {METRICS_FILE}. Navega por las páginas y vuelve.")
+    st.stop()
+
+df["ts"] = pd.to_datetime(df["ts"], errors="coerce")
+
+c1, c2 = st.columns([1.2, 2.8])
+with c1:
+    horas = st.selectbox("Ventana", [1, 24, 24 * 7, 24 * 30], index=1, format_func=lambda h: f"Últimas {h} h")
+with c2:
+    pages = sorted(df["page"].unique())
+    page_sel = st.multiselect("Páginas", pages, default=pages)
+
+desde = df["ts"].max() - pd.Timedelta(hours=horas)
+df = df[(df["ts"] >= desde) & df["page"].isin(page_sel)]
+if df.empty:
+    st.info("No hay métricas en esa ventana.")
+    st.stop()
+
+
+def percentiles(g: pd.Series) -> pd.Series:
+    q = g.quantile([0.5, 0.9, 0.95, 0.99])
+    return pd.Series(
+        {
+            "n": int(g.size),
+            "p50_ms": q.loc[0.5],
+            "p90_ms": q.loc[0.9],
+            "p95_ms": q.loc[0.95],
+            "p99_ms": q.loc[0.99],
+            "max_ms": g.max(),
+        }
+    ).round(1)
+
+
+# Duración de la ejecución completa = fin de la última sección medida
+st.subheader("Ejecución completa por página")
+runs = df.groupby(["page", "run"], as_index=False)["end_ms"].max()
+por_pagina = runs.groupby("page")["end_ms"].apply(percentiles).unstack().astype({"n": int})
+st.dataframe(por_pagina, use_container_width=True)
+
+st.subheader("Secciones (¿qué está esperando el usuario?)")
+secciones = (
+    df.groupby(["page", "section"])["ms"]
+    .apply(percentiles)
+    .unstack()
+    .astype({"n": int})
+    .sort_values("p95_ms", ascending=False)
+)
+st.dataframe(secciones, use_container_width=True, height=420)
+
+st.subheader("Reruns por sesión")
+reruns = df.groupby(["page", "session"])["rerun"].max().reset_index()
+rr = reruns.groupby("page")["rerun"].agg(
+    sesiones="size", mediana="median", p90=lambda s: s.quantile(0.9), maximo="max"
+)
+st.dataframe(rr.round(1), use_container_width=True)
+
+st.divider()
+st.subheader("Consultas SQL (este proceso)")
+if not PROFILE_ENABLED:
+    st.caption("Activa `SQL_PROFILE=1` para ver el costo por consulta.")
+else:
+    stats = pd.DataFrame(get_query_stats())
+    if stats.empty:
+        st.caption("Sin consultas registradas todavía.")
+    else:
+        stats["pages"] = stats["pages"].map(lambda d: ", ".join(f"{k} ({v})" for k, v in d.items()))
+        st.dataframe(stats, use_container_width=True, height=420)
+    if st.button("Reiniciar estadísticas SQL"):
+        reset_query_stats()
+        st.rerun()
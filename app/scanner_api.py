@@ -0,0 +1,321 @@
+# API JSON para las pistolas/handhelds del mostrador (Tornado, ya viene con Streamlit).
+# Sin sesión de Streamlit ni rerun por lectura: cada escaneo es un request corto.
+#   GET  /api/stock?project=OBRAS&item_id=12&size=T/39     (o sku=... en vez de item_id)
+#   GET  /api/employees/<fotocheck>                         (o el DNI)
+#   POST /api/deliveries  {project, location, fotocheck, item_id|sku, size, qty, motivo, notes, force}
+#   POST /api/receipts    {project, location, item_id|sku, size, qty, guia, unit_cost, notes, force}
+# Mismas consultas y reglas que las páginas: talla normalizada, EPP con talla la exige,
+# anti-duplicado de 10 s (409 salvo force=true) y escritura por la cola con el stock validado
+# dentro del commit (db/write_queue.py).
+# Las consultas a la BD corren en el pool de hilos del IOLoop con el mismo engine (pool de conexiones).
+# Escucha solo en 127.0.0.1; para las pistolas en la red (--host 0.0.0.0) exige SCANNER_API_TOKEN.
+import asyncio
+import hmac
+import ipaddress
+import json
+import os
+import sys
+
+from sqlalchemy import text
+from tornado.ioloop import IOLoop
+from tornado.web import Application, HTTPError, RequestHandler
+
+from .db.connection import get_engine
+from .db.dictionaries import normalize_size
+from .db.movements import (
+    DUP_IN_SQL,
+    DUP_OUT_SQL,
+    DUP_WINDOW_SECONDS,
+    INSERT_IN_SQL,
+    INSERT_OUT_SQL,
+    utc_now_str,
+)
+from .db.queries import STOCK_SQL
+from .db.write_queue import InsufficientStockError, get_write_queue
+
+DEFAULT_PORT = 8600
+DEFAULT_HOST = "127.0.0.1"
+# Si se define, cada request debe traer el mismo valor en la cabecera X-Api-Key
+API_TOKEN = os.getenv("SCANNER_API_TOKEN") or None
+
+PROJECT_SQL = "SELECT project_id, code FROM projects WHERE code = :code AND is_active = 1"
+LOCATION_SQL = """
+SELECT l.location_id, l.code
+FROM locations l
+WHERE l.code = :code AND l.is_active = 1
+  AND (l.project_id = :pid OR (l.project_id IS NULL AND l.is_segregation = 1))
+"""
+ITEM_BY_ID_SQL = "SELECT item_id, sku, name, has_size FROM items WHERE item_id = :v AND is_active = 1"
+ITEM_BY_SKU_SQL = "SELECT item_id, sku, name, has_size FROM items WHERE sku = :v AND is_active = 1"
+EMPLOYEE_SQL = """
+SELECT employee_id, full_name, dni, fotocheck_code, is_active
+FROM employees
+WHERE fotocheck_code = :code OR dni = :code
+"""
+
+
+class ApiError(HTTPError):
+    def __init__(self, status: int, message: str, **extra):
+        super().__init__(status, reason=None)
+        self.message = message
+        self.extra = extra
+
+
+def _one(conn, sql: str, params: dict) -> dict | None:
+    row = conn.execute(text(sql), params).mappings().first()
+    return dict(row) if row else None
+
+
+def resolve_project(conn, code) -> dict:
+    project = _one(conn, PROJECT_SQL, {"code": str(code or "").strip().upper()})
+    if project is None:
+        raise ApiError(404, f"Proyecto no encontrado: {code}")
+    return project
+
+
+def resolve_item(conn, item_id=None, sku=None) -> dict:
+    if item_id not in (None, ""):
+        try:
+            item = _one(conn, ITEM_BY_ID_SQL, {"v": int(item_id)})
+        except (TypeError, ValueError):
+            raise ApiError(400, f"item_id inválido: {item_id}")
+    elif sku not in (None, ""):
+        item = _one(conn, ITEM_BY_SKU_SQL, {"v": str(sku).strip()})
+    else:
+        raise ApiError(400, "Indica item_id o sku")
+    if item is None:
+        raise ApiError(404, f"EPP no encontrado: {item_id or sku}")
+    return item
+
+
+def resolve_size(item: dict, raw) -> str | None:
+    size = normalize_size(raw)
+    if item["has_size"] == 1 and not size:
+        raise ApiError(422, "Este EPP requiere talla.")
+    return size if item["has_size"] == 1 else None
+
+
+def current_stock(conn, pid: int, iid: int, size: str | None) -> int:
+    return conn.execute(text(STOCK_SQL), {"pid": pid, "iid": iid, "size": size}).scalar_one()
+
+
+def parse_cost(raw) -> float | None:
+    if raw in (None, ""):
+        return None
+    try:
+        cost = float(raw)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Costo unitario inválido: {raw}")
+    if not cost >= 0:
+        raise ApiError(400, "El costo unitario no puede ser negativo")
+    return cost
+
+
+def parse_qty(raw) -> int:
+    try:
+        qty = int(raw)
+    except (TypeError, ValueError):
+        raise ApiError(400, f"Cantidad inválida: {raw}")
+    if qty < 1:
+        raise ApiError(400, "La cantidad debe ser mayor a 0")
+    return qty
+
+
+class BaseHandler(RequestHandler):
+    def initialize(self, engine):
+        self.engine = engine
+
+    def prepare(self):
+        token = self.settings.get("api_token")
+        if token and not hmac.compare_digest(
+            self.request.headers.get("X-Api-Key", "").encode(), token.encode()
+        ):
+            raise ApiError(401, "X-Api-Key inválida")
+
+    def set_default_headers(self):
+        self.set_header("Content-Type", "application/json; charset=utf-8")
+
+    def write_error(self, status_code, **kwargs):
+        exc = kwargs.get("exc_info", (None, None))[1]
+        if isinstance(exc, ApiError):
+            body = {"error": exc.message, **exc.extra}
+        else:
+            body = {"error": self._reason}
+        self.finish(json.dumps(body, ensure_ascii=False))
+
+    def send(self, body: dict, status: int = 200):
+        self.set_status(status)
+        self.finish(json.dumps(body, ensure_ascii=False, default=str))
+
+    def body_json(self) -> dict:
+        try:
+            data = json.loads(self.request.body or b"{}")
+        except json.JSONDecodeError:
+            raise ApiError(400, "JSON inválido")
+        if not isinstance(data, dict):
+            raise ApiError(400, "Se espera un objeto JSON")
+        return data
+
+    async def db(self, fn, *args):
+        """Consulta bloqueante en el pool de hilos (el IOLoop sigue atendiendo otros escaneos)."""
+        return await IOLoop.current().run_in_executor(None, fn, *args)
+
+    async def write_movement(self, sql: str, params: dict) -> int:
+        url = self.engine.url.render_as_string(hide_password=False)
+        future = get_write_queue(url).submit([(sql, params)])
+        return (await asyncio.wrap_future(future))[0]
+
+
+class StockHandler(BaseHandler):
+    async def get(self):
+        args = {k: self.get_query_argument(k, None) for k in ("project", "item_id", "sku", "size")}
+
+        def lookup():
+            with self.engine.connect() as conn:
+                project = resolve_project(conn, args["project"])
+                item = resolve_item(conn, args["item_id"], args["sku"])
+                size = resolve_size(item, args["size"])
+                stock = current_stock(conn, project["project_id"], item["item_id"], size)
+            return {
+                "project": project["code"],
+                "item_id": item["item_id"],
+                "epp": item["name"],
+                "size": size,
+                "stock": stock,
+            }
+
+        self.send(await self.db(lookup))
+
+
+class EmployeeHandler(BaseHandler):
+    async def get(self, code):
+        def lookup():
+            with self.engine.connect() as conn:
+                return _one(conn, EMPLOYEE_SQL, {"code": code.strip()})
+
+        employee = await self.db(lookup)
+        if employee is None:
+            raise ApiError(404, f"Trabajador no encontrado: {code}")
+        self.send(employee)
+
+
+class MovementHandler(BaseHandler):
+    """POST de entregas (OUT) y de ingresos (IN): `kind` viene de la ruta."""
+
+    def initialize(self, engine, kind: str):
+        super().initialize(engine)
+        self.kind = kind
+
+    def validate(self, data: dict) -> dict:
+        with self.engine.connect() as conn:
+            project = resolve_project(conn, data.get("project"))
+            location = _one(
+                conn, LOCATION_SQL, {"code": str(data.get("location") or "").strip(), "pid": project["project_id"]}
+            )
+            if location is None:
+                raise ApiError(404, f"Ubicación no encontrada en {project['code']}: {data.get('location')}")
+            item = resolve_item(conn, data.get("item_id"), data.get("sku"))
+            size = resolve_size(item, data.get("size"))
+            qty = parse_qty(data.get("qty"))
+            params = {
+                "pid": project["project_id"],
+                "lid": location["location_id"],
+                "iid": item["item_id"],
+                "size": size,
+            }
+
+            if self.kind == "OUT":
+                code = str(data.get("fotocheck") or data.get("dni") or "").strip()
+                employee = _one(conn, EMPLOYEE_SQL, {"code": code})
+                if employee is None or not employee["is_active"]:
+                    raise ApiError(404, "Trabajador no encontrado o inactivo")
+                motivo = data.get("motivo") or "Entrega"
+                notes = f"{motivo} | {data['notes']}" if data.get("notes") else motivo
+                params.update(qty=-qty, eid=employee["employee_id"], notes=notes)
+                dup_sql = DUP_OUT_SQL
+                dup_params = {"pid": params["pid"], "eid": params["eid"], "iid": params["iid"], "neg_qty": -qty}
+            else:
+                params.update(
+                    qty=qty,
+                    ref=data.get("guia") or None,
+                    notes=data.get("notes") or None,
+                    unit_cost=parse_cost(data.get("unit_cost")),
+                )
+                dup_sql = DUP_IN_SQL
+                dup_params = {"pid": params["pid"], "lid": params["lid"], "iid": params["iid"], "qty": qty}
+
+            if not data.get("force"):
+                dup = conn.execute(
+                    text(dup_sql), {**dup_params, "size": size, "since_utc": utc_now_str(DUP_WINDOW_SECONDS)}
+                ).fetchone()
+                if dup:
+                    raise ApiError(
+                        409,
+                        "Posible duplicado (mismo movimiento en los últimos 10 segundos)",
+                        transaction_id=dup[0],
+                    )
+        return params
+
+    async def post(self):
+        params = await self.db(self.validate, self.body_json())
+        params["now_utc"] = utc_now_str()
+        try:
+            txn_id = await self.write_movement(INSERT_OUT_SQL if self.kind == "OUT" else INSERT_IN_SQL, params)
+        except InsufficientStockError as e:
+            raise ApiError(409, "Stock insuficiente", stock=e.available, requested=e.requested)
+
+        def stock_after():
+            with self.engine.connect() as conn:
+                return current_stock(conn, params["pid"], params["iid"], params["size"])
+
+        self.send({"transaction_id": txn_id, "stock": await self.db(stock_after)}, status=201)
+
+
+def make_app(engine=None, api_token: str | None = API_TOKEN) -> Application:
+    engine = engine or get_engine()
+    return Application(
+        [
+            (r"/api/stock", StockHandler, {"engine": engine}),
+            (r"/api/employees/([^/]+)", EmployeeHandler, {"engine": engine}),
+            (r"/api/deliveries", MovementHandler, {"engine": engine, "kind": "OUT"}),
+            (r"/api/receipts", MovementHandler, {"engine": engine, "kind": "IN"}),
+        ],
+        api_token=api_token,
+    )
+
+
+def is_loopback(host: str) -> bool:
+    if host == "localhost":
+        return True
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except ValueError:
+        return False
+
+
+def main():
+    # uso:
+    # python -m app.scanner_api [--port 8600] [--host 127.0.0.1]
+    # Contra un archivo local: DATABASE_URL=sqlite:///data/prueba.db python -m app.scanner_api
+    # Para las pistolas en la red: SCANNER_API_TOKEN=... python -m app.scanner_api --host 0.0.0.0
+    # (sin token solo escucha en la máquina local: los POST registran entregas e ingresos)
+    opts = {"--port": str(DEFAULT_PORT), "--host": DEFAULT_HOST}
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a not in opts:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+        opts[a] = args.pop(0)
+
+    host = opts["--host"]
+    if not API_TOKEN and not is_loopback(host):
+        raise SystemExit(f"Para escuchar en {host} define SCANNER_API_TOKEN (las pistolas lo envían en X-Api-Key)")
+
+    app = make_app()
+    app.listen(int(opts["--port"]), address=host)
+    print(f"📡 API de escáneres en http://{host}:{opts['--port']}/api")
+    IOLoop.current().start()
+
+
+if __name__ == "__main__":
+    main()
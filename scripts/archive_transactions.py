@@ -0,0 +1,303 @@
+import os
+import stat
+import sys
+from datetime import datetime, timedelta, timezone
+
+from sqlalchemy import text
+
+from app.db.archive import (
+    ARCHIVE_DIR,
+    LOCAL_TZ,
+    OPENING_TYPE,
+    archive_file,
+    archived_periods,
+    attach_archives,
+    transactions_source,
+    year_bounds_utc,
+)
+from app.db.connection import get_engine
+from app.db.migrations import migrate
+
+# Saldo por proyecto × ubicación × EPP × talla (lo que debe quedar igual antes y después)
+BALANCES_SQL = """
+SELECT project_id, location_id, item_id, size_id, SUM(qty) AS qty
+FROM {source}
+{where}
+GROUP BY project_id, location_id, item_id, size_id
+"""
+
+# Huella de un conjunto de movimientos: si coincide en el archivo y en la BD viva, se copió todo
+STATS_SQL = """
+SELECT COUNT(*) AS n, COALESCE(SUM(qty), 0) AS qty, COALESCE(SUM(transaction_id), 0) AS ids,
+       MIN(txn_datetime) AS first_dt, COALESCE(MAX(transaction_id), 0) AS max_id
+FROM {source}
+{where}
+"""
+
+# Id explícito: por encima de todo lo que ya existió (archivo incluido), ver next_txn_id
+INSERT_OPENING_SQL = f"""
+INSERT INTO transactions (
+    transaction_id, txn_datetime, txn_type, project_id, location_id, item_id, qty, size, size_id,
+    employee_id, request_number, reference, notes, created_by
+) VALUES (
+    :id, :dt, '{OPENING_TYPE}', :pid, :lid, :iid, :qty,
+    (SELECT code FROM sizes WHERE size_id = :sid), :sid,
+    NULL, NULL, :ref, :notes, 'system'
+)
+"""
+
+
+def balances(conn, source: str = "transactions", where: str = "", params: dict | None = None) -> dict:
+    rows = conn.execute(text(BALANCES_SQL.format(source=source, where=where)), params or {})
+    return {(r.project_id, r.location_id, r.item_id, r.size_id): r.qty for r in rows if r.qty}
+
+
+def stats(conn, source: str, where: str, params: dict | None = None) -> dict:
+    row = conn.execute(text(STATS_SQL.format(source=source, where=where)), params or {}).mappings().one()
+    return dict(row)
+
+
+def next_txn_id(conn) -> int:
+    """
+    Próximo id que daría la BD viva: el mayor entre MAX(transaction_id) y sqlite_sequence (con
+    AUTOINCREMENT no se reutilizan ids borrados; sin él, sí).
+    """
+    live = conn.execute(text("SELECT COALESCE(MAX(transaction_id), 0) FROM main.transactions")).scalar_one()
+    seq = 0
+    if conn.exec_driver_sql("SELECT 1 FROM sqlite_master WHERE name = 'sqlite_sequence'").first():
+        seq = conn.execute(text("SELECT seq FROM sqlite_sequence WHERE name = 'transactions'")).scalar() or 0
+    return max(live, seq) + 1
+
+
+def archived_max_id(engine) -> int:
+    """Mayor transaction_id de los años ya archivados (0 = nada archivado)."""
+    with engine.connect() as conn:
+        aliases = attach_archives(conn, archived_periods(conn))
+        return max(
+            (conn.exec_driver_sql(f"SELECT COALESCE(MAX(transaction_id), 0) FROM {a}.transactions").scalar_one()
+             for a in aliases),
+            default=0,
+        )
+
+
+def diff_balances(a: dict, b: dict) -> list[str]:
+    keys = sorted(set(a) | set(b), key=str)
+    return [f"{k}: {a.get(k, 0)} -> {b.get(k, 0)}" for k in keys if a.get(k, 0) != b.get(k, 0)]
+
+
+def write_archive(engine, year: int, end_utc: str) -> dict:
+    """Copia a ARCHIVE_DIR/transactions_YYYY.db todo lo anterior a end_utc (sin OPENING)."""
+    path = ARCHIVE_DIR / archive_file(year)
+    if path.exists():
+        # Resto de una corrida que no llegó a registrarse: se rehace
+        os.chmod(path, stat.S_IWUSR | stat.S_IRUSR)
+        path.unlink()
+    ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
+
+    where = f"WHERE txn_datetime < :end AND txn_type <> '{OPENING_TYPE}'"
+    with engine.connect() as conn:
+        # Todas las columnas actuales (no solo COLUMNS), sin FK: el archivo no tiene catálogos
+        cols = [(r[1], r[2]) for r in conn.exec_driver_sql("PRAGMA table_info(transactions)")]
+        ddl = ",\n  ".join(
+            "transaction_id INTEGER PRIMARY KEY" if name == "transaction_id" else f"{name} {typ}"
+            for name, typ in cols
+        )
+        names = ", ".join(name for name, _ in cols)
+
+        conn.exec_driver_sql("ATTACH DATABASE ? AS arc_new", (str(path),))
+        conn.exec_driver_sql(f"CREATE TABLE arc_new.transactions (\n  {ddl}\n)")
+        conn.execute(
+            text(
+                f"INSERT INTO arc_new.transactions ({names}) "
+                f"SELECT {names} FROM main.transactions {where}"
+            ),
+            {"end": end_utc},
+        )
+        conn.exec_driver_sql(
+            "CREATE INDEX arc_new.idx_arc_project_item_date ON transactions(project_id, item_id, txn_datetime)"
+        )
+        conn.exec_driver_sql("CREATE INDEX arc_new.idx_arc_date ON transactions(txn_datetime)")
+        conn.commit()
+        arc = stats(conn, "arc_new.transactions", "")
+        conn.exec_driver_sql("DETACH DATABASE arc_new")
+    return arc
+
+
+def archive_year(engine, year: int) -> None:
+    start_utc, end_utc = year_bounds_utc(year)
+    prior_max = archived_max_id(engine)
+    arc = write_archive(engine, year, end_utc)
+    if arc["n"] == 0:
+        (ARCHIVE_DIR / archive_file(year)).unlink()
+        print(f"   {year}: sin movimientos, nada que archivar")
+        return
+
+    where = f"WHERE txn_datetime < :end AND txn_type <> '{OPENING_TYPE}'"
+    with engine.begin() as conn:
+        # Primero una escritura: toma el bloqueo de escritura y nadie inserta mientras verificamos
+        conn.execute(
+            text(
+                "INSERT INTO archive_periods "
+                "(year, file_name, start_utc, end_utc, rows_count, qty_sum, id_sum, archived_at) "
+                "VALUES (:y, :f, :s, :e, :n, :q, :i, :t)"
+            ),
+            {
+                "y": year,
+                "f": archive_file(year),
+                # Movimientos rezagados de años ya archivados (importados después) van en este archivo
+                "s": min(start_utc, arc["first_dt"]),
+                "e": end_utc,
+                "n": arc["n"],
+                "q": arc["qty"],
+                "i": arc["ids"],
+                "t": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+            },
+        )
+        hot = stats(conn, "transactions", where, {"end": end_utc})
+        if (hot["n"], hot["qty"], hot["ids"]) != (arc["n"], arc["qty"], arc["ids"]):
+            raise RuntimeError(f"{year}: el archivo no coincide con la BD viva ({arc} vs {hot})")
+
+        before = balances(conn)
+        at_close = balances(conn, where="WHERE txn_datetime < :end", params={"end": end_utc})
+
+        # Los ids nuevos (OPENING y lo que venga) quedan por encima de todo lo archivado: los cursores
+        # por transaction_id (snapshot, valorización, tablero de stock) suponen ids que solo crecen
+        first_id = max(next_txn_id(conn), prior_max + 1, arc["max_id"] + 1)
+        conn.execute(text("DELETE FROM transactions WHERE txn_datetime < :end"), {"end": end_utc})
+        # Un segundo antes del corte: el saldo inicial queda primero en el kardex del año siguiente
+        opening_dt = (
+            datetime.strptime(end_utc, "%Y-%m-%d %H:%M:%S") - timedelta(seconds=1)
+        ).strftime("%Y-%m-%d %H:%M:%S")
+        if at_close:
+            conn.execute(
+                text(INSERT_OPENING_SQL),
+                [
+                    {
+                        "id": first_id + i,
+                        "dt": opening_dt,
+                        "pid": pid,
+                        "lid": lid,
+                        "iid": iid,
+                        "qty": qty,
+                        "sid": sid,
+                        "ref": f"CIERRE {year}",
+                        "notes": f"Saldo inicial (detalle en {archive_file(year)})",
+                    }
+                    for i, ((pid, lid, iid, sid), qty) in enumerate(at_close.items())
+                ],
+            )
+
+        after = balances(conn)
+        diffs = diff_balances(before, after)
+        if diffs:
+            raise RuntimeError(f"{year}: los saldos cambiaron, se revierte:\n   " + "\n   ".join(diffs[:20]))
+
+    # Adjuntado en solo lectura por la app; también lo protegemos en disco
+    os.chmod(ARCHIVE_DIR / archive_file(year), stat.S_IRUSR | stat.S_IRGRP | stat.S_IROTH)
+    print(f"✅ {year}: {arc['n']:,} movimientos -> {archive_file(year)} | {len(at_close):,} saldos iniciales")
+
+
+def first_hot_year(engine) -> int | None:
+    with engine.connect() as conn:
+        first = conn.execute(
+            text(f"SELECT MIN(txn_datetime) FROM transactions WHERE txn_type <> '{OPENING_TYPE}'")
+        ).scalar_one()
+    if first is None:
+        return None
+    dt = datetime.strptime(first, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return dt.astimezone(LOCAL_TZ).year
+
+
+def verify(engine) -> bool:
+    """Cada archivo coincide con su registro y archivo + BD viva da los mismos saldos que la BD viva."""
+    ok = True
+    with engine.connect() as conn:
+        periods = archived_periods(conn)
+        if not periods:
+            print("Nada archivado.")
+            return True
+        aliases = attach_archives(conn, periods)
+        max_archived = 0
+        for p, alias in zip(periods, aliases):
+            s = stats(conn, f"{alias}.transactions", "")
+            match = (s["n"], s["qty"], s["ids"]) == (p["rows_count"], p["qty_sum"], p["id_sum"])
+            ok &= match
+            print(f"   {p['year']} | {p['file_name']} | {s['n']:,} movimientos | {'OK' if match else 'NO COINCIDE'}")
+            max_archived = max(max_archived, s["max_id"])
+
+        # Ids únicos y crecientes: ninguno repetido entre archivos y BD viva, y los nuevos por encima
+        repeated = conn.exec_driver_sql(
+            "SELECT COUNT(*) FROM ("
+            + " UNION ALL ".join(f"SELECT transaction_id FROM {a}.transactions" for a in aliases + ["main"])
+            + ") GROUP BY transaction_id HAVING COUNT(*) > 1"
+        ).fetchall()
+        if repeated:
+            ok = False
+            print(f"❌ {len(repeated):,} transaction_id repetidos entre el archivo y la BD viva")
+        next_id = next_txn_id(conn)
+        if next_id <= max_archived:
+            ok = False
+            print(f"❌ El próximo transaction_id ({next_id:,}) reutilizaría ids archivados (hasta {max_archived:,})")
+
+        # Sin rango: todos los archivos + la BD viva sin OPENING (lo mismo que ve el Kardex histórico)
+        diffs = diff_balances(balances(conn, transactions_source(conn)), balances(conn))
+    if diffs:
+        ok = False
+        print("❌ Saldos distintos (histórico completo vs BD viva):\n   " + "\n   ".join(diffs[:20]))
+    print("✅ Archivo verificado" if ok else "❌ Verificación con errores")
+    return ok
+
+
+def main():
+    # uso:
+    # python -m scripts.archive_transactions --until 2024 [--vacuum]
+    # python -m scripts.archive_transactions --verify
+    # Mueve los años cerrados (hasta --until, hora de Lima) a ARCHIVE_DIR, uno por archivo y en orden.
+    opts = {"--until": None}
+    args = sys.argv[1:]
+    do_verify = "--verify" in args
+    vacuum = "--vacuum" in args
+    args = [a for a in args if a not in ("--verify", "--vacuum")]
+    while args:
+        a = args.pop(0)
+        if a not in opts:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+        opts[a] = args.pop(0)
+
+    engine = get_engine()
+    if engine.dialect.name != "sqlite":
+        raise SystemExit(
+            "El archivado por archivos es para SQLite. En PostgreSQL usa particiones por año de transactions."
+        )
+    migrate(engine, log=lambda *_: None)
+
+    if do_verify:
+        raise SystemExit(0 if verify(engine) else 1)
+
+    if opts["--until"] is None:
+        raise SystemExit("Indica --until AÑO (último año a archivar) o --verify")
+    until = int(opts["--until"])
+    current = datetime.now(LOCAL_TZ).year
+    if until >= current:
+        raise SystemExit(f"Solo se archivan años cerrados (< {current}).")
+
+    with engine.connect() as conn:
+        periods = archived_periods(conn)
+    first = periods[-1]["year"] + 1 if periods else first_hot_year(engine)
+    if first is None or first > until:
+        print("Nada que archivar.")
+        return
+
+    for year in range(first, until + 1):
+        archive_year(engine, year)
+
+    if vacuum:
+        # Devuelve al disco el espacio de lo archivado (bloquea la BD mientras corre)
+        with engine.connect() as conn:
+            conn.exec_driver_sql("VACUUM")
+
+    verify(engine)
+
+
+if __name__ == "__main__":
+    main()
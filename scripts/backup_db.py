@@ -0,0 +1,139 @@
+import sys
+import time
+from pathlib import Path
+
+from app.db.backup import (
+    BACKUP_DIR,
+    KEEP,
+    PAGES_PER_STEP,
+    create_backup,
+    list_backups,
+    restore_backup,
+    sqlite_path,
+    verify_backup,
+)
+from app.db.connection import get_database_url
+
+
+def _mb(n: int) -> str:
+    return f"{n / 1024**2:,.1f} MB"
+
+
+def run_backup(db_path: Path, opts: dict) -> None:
+    res = create_backup(
+        db_path,
+        Path(opts["--dir"]),
+        keep=int(opts["--keep"]),
+        pages=int(opts["--pages"]),
+        pause_s=float(opts["--sleep-ms"]) / 1000,
+    )
+    copia = res["copia"]
+    if copia["modo"] == "wal":
+        detalle = "WAL, una pasada"
+    else:
+        detalle = f"{copia['pasos']} pasos, {copia['reinicios']} reinicios, {copia['intentos']} intento(s)"
+    print(
+        f"✅ {res['respaldo']}: {_mb(res['bytes_db'])} -> {_mb(res['bytes_gz'])} | "
+        f"{res['saldos']['claves']:,} saldos | {copia['segundos']:.1f}s ({detalle})"
+    )
+    for name in res["archivos_copiados"]:
+        print(f"   año archivado copiado: {name}")
+    for path in res["borrados"]:
+        print(f"   rotado: {path.name}")
+
+
+def main():
+    # uso:
+    # python -m scripts.backup_db [--dir data/backups] [--keep 14] [--pages 256] [--sleep-ms 0] [--every MIN]
+    # python -m scripts.backup_db --verify [data/backups/almacen_20260301_0200.db.gz]   (por defecto el último)
+    # python -m scripts.backup_db --restore data/backups/almacen_....db.gz --to data/almacen.db [--force]
+    # Respaldo en línea (db/backup.py): no hace falta detener la app. Programado:
+    #   cron:  0 */4 * * *  cd /ruta/almacen-epp && python -m scripts.backup_db
+    #   o dejarlo corriendo: python -m scripts.backup_db --every 240
+    # --verify y --restore salen con código 1 si el respaldo no cuadra con su manifiesto;
+    # --restore no toca el destino en ese caso. Restaurar sobre la BD en uso: con la app detenida.
+    opts = {
+        "--dir": str(BACKUP_DIR),
+        "--keep": str(KEEP),
+        "--pages": str(PAGES_PER_STEP),
+        "--sleep-ms": "0",
+        "--every": None,
+        "--restore": None,
+        "--to": None,
+    }
+    flags = {"--verify": False, "--force": False}
+    verify_file = None
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a == "--verify":
+            flags[a] = True
+            if args and not args[0].startswith("--"):
+                verify_file = args.pop(0)
+        elif a in flags:
+            flags[a] = True
+        elif a in opts:
+            opts[a] = args.pop(0)
+        else:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+
+    if flags["--verify"]:
+        backups = [Path(verify_file)] if verify_file else list_backups(Path(opts["--dir"]))[-1:]
+        if not backups:
+            raise SystemExit(f"No hay respaldos en {opts['--dir']}")
+        try:
+            counts, problems = verify_backup(backups[0])
+        except FileNotFoundError as e:
+            raise SystemExit(str(e))
+        print(f"🔎 {backups[0]}: {sum(counts['tablas'].values()):,} filas en {len(counts['tablas'])} tablas | "
+              f"{counts['saldos']['claves']:,} saldos | stock total {counts['saldos']['stock_total']:,}")
+        _report(problems)
+        return
+
+    if opts["--restore"]:
+        if not opts["--to"]:
+            raise SystemExit("Indica el destino: --restore RESPALDO --to ruta.db")
+        try:
+            counts, problems, copied = restore_backup(Path(opts["--restore"]), Path(opts["--to"]), flags["--force"])
+        except (FileExistsError, FileNotFoundError) as e:
+            raise SystemExit(str(e))
+        if not problems:
+            print(f"♻️ Restaurado en {opts['--to']}: {counts['saldos']['claves']:,} saldos, "
+                  f"stock total {counts['saldos']['stock_total']:,}")
+            for name in copied:
+                print(f"   año archivado restaurado: {name}")
+        _report(problems)
+        return
+
+    try:
+        db_path = sqlite_path(get_database_url())
+    except ValueError as e:
+        raise SystemExit(str(e))
+    if not db_path.exists():
+        raise SystemExit(f"No existe la BD {db_path}")
+
+    if not opts["--every"]:
+        run_backup(db_path, opts)
+        return
+    every_s = float(opts["--every"]) * 60
+    while True:
+        t0 = time.monotonic()
+        try:
+            run_backup(db_path, opts)
+        except Exception as e:  # un respaldo fallido no detiene los siguientes
+            print(f"❌ Respaldo fallido: {e}")
+        time.sleep(max(0.0, every_s - (time.monotonic() - t0)))
+
+
+def _report(problems: list[str]) -> None:
+    if not problems:
+        print("✅ Filas y saldos iguales al manifiesto.")
+        return
+    print("⚠️ El respaldo no cuadra con su manifiesto:")
+    for p in problems:
+        print(f"   {p}")
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,248 @@
+import json
+import platform
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+
+import pandas as pd
+import pyarrow as pa
+import sqlalchemy
+from sqlalchemy import text
+
+from app.db.connection import get_engine
+from app.db.frames import frame_bytes, read_frame
+from app.db.migrations import migrate
+from app.db.queries import STOCK_SQL, kardex_item_query
+from app.db.snapshot import MovementSnapshot, consumo, movements, sum_by, to_frame
+from app.db.stock_live import change_token, load_board, touched_balances
+from scripts.gen_synthetic_data import generate
+
+DEFAULT_SCALES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def pick_params(conn) -> dict:
+    """Parámetros representativos tomados de la propia BD (como los elegiría un usuario)."""
+    last = conn.execute(text("SELECT MAX(txn_local_date) FROM transactions")).scalar_one()
+    today = date.fromisoformat(last)
+    project_id, project_code = conn.execute(
+        text("SELECT project_id, code FROM projects ORDER BY project_id LIMIT 1")
+    ).one()
+    top_item = conn.execute(
+        text(
+            "SELECT item_id FROM transactions WHERE project_id=:pid "
+            "GROUP BY item_id ORDER BY COUNT(*) DESC LIMIT 1"
+        ),
+        {"pid": project_id},
+    ).scalar_one()
+    sized_item, size = conn.execute(
+        text(
+            "SELECT item_id, size FROM transactions WHERE project_id=:pid AND size IS NOT NULL "
+            "GROUP BY item_id, size ORDER BY COUNT(*) DESC LIMIT 1"
+        ),
+        {"pid": project_id},
+    ).one()
+
+    def rng(days):
+        return (today - timedelta(days=days)).isoformat(), last
+
+    return {
+        "last_id": conn.execute(text("SELECT MAX(transaction_id) FROM transactions")).scalar_one(),
+        "project_id": project_id,
+        "project_code": project_code,
+        "top_item": top_item,
+        "sized_item": sized_item,
+        "size": size,
+        "d30": rng(30),
+        "d365": rng(365),
+    }
+
+
+def _sql(sql: str, params: dict, mode: str = "df"):
+    def run(conn, _tbl):
+        if mode == "df":
+            return read_frame(conn, sql, params)
+        return conn.execute(text(sql), params).scalar_one()
+
+    return run
+
+
+def build_cases(p: dict) -> dict:
+    """
+    caso -> fn(conn, snapshot) con lo mismo que hace la página: Kardex > Movimientos y Reportes
+    filtran el snapshot Arrow (db/snapshot.py); Stock Actual es el tablero de db/stock_live.py;
+    Kardex por ítem y el saldo al registrar siguen en SQL.
+    """
+    d30_start, d30_end = p["d30"]
+    d365_start, d365_end = p["d365"]
+    d30 = {"date_start": d30_start, "date_end": d30_end}
+    d365_project = {"date_start": d365_start, "date_end": d365_end, "project_id": p["project_id"]}
+    project = p["project_code"]
+    return {
+        # Kardex: valores por defecto de la pestaña Movimientos (30 días, IN+OUT)
+        "movements_30d_default": lambda conn, tbl: to_frame(movements(tbl, {**d30, "txn_types": ["IN", "OUT"]})),
+        "movements_365d_project_item": lambda conn, tbl: to_frame(
+            movements(tbl, {**d365_project, "item_id": p["top_item"]})
+        ),
+        "movements_30d_text_search": lambda conn, tbl: to_frame(movements(tbl, {**d30, "text_search": "GR-0"})),
+        "query_kardex_item": _sql(*kardex_item_query(p["project_id"], p["top_item"], "cualquiera", None)),
+        "query_kardex_item_size": _sql(
+            *kardex_item_query(p["project_id"], p["sized_item"], "talla específica", p["size"])
+        ),
+        "consumo_30d": lambda conn, tbl: consumo(tbl, d30),
+        "consumo_365d_project": lambda conn, tbl: consumo(tbl, d365_project),
+        # Reportes: top 10 EPP del año (filtro + group_by)
+        "consumo_365d_top_epp": lambda conn, tbl: sum_by(consumo(tbl, d365_project), ["epp"], "consumo_und", top=10),
+        "get_stock": _sql(STOCK_SQL, {"pid": p["project_id"], "iid": p["sized_item"], "size": p["size"]}, "scalar"),
+        # Stock Actual: tablero al abrir, token en cada refresco y saldos de lo último registrado
+        "stock_board": lambda conn, tbl: load_board(conn, project),
+        "stock_change_token": lambda conn, tbl: change_token(conn),
+        "stock_touched_last_100": lambda conn, tbl: touched_balances(
+            conn, project, p["last_id"] - 100, p["last_id"]
+        ),
+    }
+
+
+def _size(result) -> tuple[int, float | None]:
+    if isinstance(result, pd.DataFrame):
+        return len(result), round(frame_bytes(result) / 1024**2, 3)
+    if isinstance(result, pa.Table):
+        return result.num_rows, round(result.nbytes / 1024**2, 3)
+    return 1, None
+
+
+def run_case(engine, fn, snapshot: MovementSnapshot, repeat: int) -> dict:
+    timings = []
+    with engine.connect() as conn:
+        for _ in range(repeat + 1):  # la primera corrida calienta caché y se descarta
+            t0 = time.perf_counter()
+            result = fn(conn, snapshot.table())
+            timings.append((time.perf_counter() - t0) * 1000)
+    rows, mb = _size(result)
+    timings = sorted(timings[1:])
+    p95 = timings[min(len(timings) - 1, int(round(0.95 * (len(timings) - 1))))]
+    return {
+        "rows": rows,
+        "mb": mb,
+        "runs": repeat,
+        "min_ms": round(timings[0], 3),
+        "p50_ms": round(statistics.median(timings), 3),
+        "p95_ms": round(p95, 3),
+        "max_ms": round(timings[-1], 3),
+    }
+
+
+def git_commit() -> str | None:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def compare(results: list[dict], baseline_path: Path, threshold: float) -> list[dict]:
+    base = json.loads(baseline_path.read_text(encoding="utf-8"))
+    base_idx = {(r["scale"], r["case"]): r for r in base["results"]}
+    regressions = []
+    for r in results:
+        b = base_idx.get((r["scale"], r["case"]))
+        if not b or not b["p50_ms"]:
+            continue
+        r["baseline_p50_ms"] = b["p50_ms"]
+        r["ratio"] = round(r["p50_ms"] / b["p50_ms"], 3)
+        if r["ratio"] > threshold:
+            regressions.append(r)
+    return regressions
+
+
+def main():
+    # uso:
+    # python -m scripts.bench_queries [--scales 10000,100000,1000000,10000000] [--repeat 5] \
+    #     [--data-dir bench/data] [--out bench/report.json] [--baseline bench/baseline.json] [--threshold 1.25]
+    # Los casos son lo que corre cada página (snapshot Arrow, tablero de stock, SQL donde aún lo hay):
+    # un baseline de antes de los snapshots no tiene los mismos nombres de caso y no se compara.
+    opts = {
+        "--scales": ",".join(str(s) for s in DEFAULT_SCALES),
+        "--repeat": "5",
+        "--data-dir": "bench/data",
+        "--out": "bench/report.json",
+        "--baseline": None,
+        "--threshold": "1.25",
+    }
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a not in opts:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+        opts[a] = args.pop(0)
+
+    scales = [int(s) for s in opts["--scales"].split(",") if s.strip()]
+    repeat = int(opts["--repeat"])
+    data_dir = Path(opts["--data-dir"])
+    data_dir.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    for scale in scales:
+        db_path = data_dir / f"synthetic_{scale}.db"
+        if not db_path.exists():
+            print(f"🏗️ Generando {db_path} ({scale:,} movimientos)…")
+            # catálogo proporcional al volumen (tope: miles de trabajadores, cientos de EPP)
+            generate(
+                db_path,
+                rows=scale,
+                employees=min(5000, max(200, scale // 200)),
+                n_items=min(400, max(80, scale // 2000)),
+            )
+
+        engine = get_engine(f"sqlite:///{db_path}")
+        migrate(engine, log=lambda *_: None)  # BD generadas antes de las últimas migraciones
+        with engine.connect() as conn:
+            params = pick_params(conn)
+        # El snapshot de las páginas, construido desde cero (lo que hace la app al primer arranque)
+        snapshot = MovementSnapshot(engine, data_dir / f"snapshot_{scale}")
+        t0 = time.perf_counter()
+        snapshot.refresh(full=True)
+        print(f"   {scale:>10,} | {'snapshot (carga completa)':<40} | {time.perf_counter() - t0:>13.2f} s")
+        for case, fn in build_cases(params).items():
+            r = run_case(engine, fn, snapshot, repeat)
+            r = {"scale": scale, "case": case, **r}
+            results.append(r)
+            mem = f" | {r['mb']} MB" if r["mb"] is not None else ""
+            print(f"   {scale:>10,} | {case:<40} | p50 {r['p50_ms']:>10.2f} ms | filas {r['rows']:,}{mem}")
+        engine.dispose()
+
+    report = {
+        "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "pandas": pd.__version__,
+        "sqlalchemy": sqlalchemy.__version__,
+        "repeat": repeat,
+        "results": results,
+    }
+
+    regressions = []
+    if opts["--baseline"]:
+        regressions = compare(results, Path(opts["--baseline"]), float(opts["--threshold"]))
+        report["baseline"] = opts["--baseline"]
+        report["regressions"] = [(r["scale"], r["case"], r["ratio"]) for r in regressions]
+
+    out = Path(opts["--out"])
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+    print(f"\n✅ Reporte: {out}")
+
+    if regressions:
+        print(f"\n❌ Regresiones (p50 > {opts['--threshold']}x baseline):")
+        for r in regressions:
+            print(f"   {r['scale']:>10,} | {r['case']:<40} | {r['baseline_p50_ms']} → {r['p50_ms']} ms ({r['ratio']}x)")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
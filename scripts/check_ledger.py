@@ -0,0 +1,84 @@
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from app.db.connection import get_engine
+from app.db.integrity import check_project, findings_frame, load_catalogs, orphan_findings
+
+
+def verify_project(url: str, project_id: int) -> tuple[int, dict[str, pd.DataFrame], float]:
+    """En un proceso aparte: su propio engine (y sus ATTACH del archivo), un proyecto completo."""
+    t0 = time.perf_counter()
+    engine = get_engine(url)
+    try:
+        with engine.connect() as conn:
+            checks = check_project(conn, project_id)
+    finally:
+        engine.dispose()
+    return project_id, checks, time.perf_counter() - t0
+
+
+def main():
+    # uso:
+    # python -m scripts.check_ledger [--workers 4] [--project OBRAS] [--out ledger_check.csv|.xlsx]
+    # Recorre todo el histórico (archivo incluido). Sale con código 1 si hay hallazgos (para el cron nocturno).
+    opts = {"--workers": str(os.cpu_count() or 2), "--project": None, "--out": "ledger_check.csv"}
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a not in opts:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+        opts[a] = args.pop(0)
+
+    t0 = time.perf_counter()
+    engine = get_engine()
+    url = engine.url.render_as_string(hide_password=False)
+    with engine.connect() as conn:
+        catalogs = load_catalogs(conn)
+        orphans = orphan_findings(conn)
+    # Los procesos abren sus propias conexiones: ninguna heredada del padre
+    engine.dispose()
+
+    projects = catalogs["projects"]
+    if opts["--project"]:
+        projects = projects[projects["code"] == opts["--project"]]
+        if projects.empty:
+            raise SystemExit(f"Proyecto no encontrado: {opts['--project']}")
+    project_ids = [int(p) for p in projects["project_id"]]
+
+    workers = max(1, min(int(opts["--workers"]), len(project_ids)))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(verify_project, [url] * len(project_ids), project_ids))
+
+    findings = pd.concat(
+        [orphans] + [findings_frame(pid, checks, catalogs) for pid, checks, _ in results],
+        ignore_index=True,
+    ).sort_values(["check", "proyecto", "fecha"], ignore_index=True)
+    findings = findings.astype({"transaction_id": "Int64", "qty": "Int64"})
+    elapsed = time.perf_counter() - t0
+
+    out = Path(opts["--out"])
+    if out.suffix.lower() == ".xlsx":
+        findings.to_excel(out, index=False, sheet_name="integridad")
+    else:
+        findings.to_csv(out, index=False, encoding="utf-8-sig")
+
+    codes = dict(zip(catalogs["projects"]["project_id"], catalogs["projects"]["code"]))
+    print(f"🔎 {len(project_ids)} proyectos en {workers} procesos | {elapsed:.2f}s en total")
+    for pid, _, seconds in sorted(results, key=lambda r: -r[2]):
+        print(f"   {codes.get(pid, pid):<12} {seconds:.2f}s")
+    if findings.empty:
+        print("✅ Sin hallazgos.")
+        return
+    print("\n⚠️ Hallazgos por verificación y proyecto:")
+    print(findings.groupby(["check", "proyecto"]).size().rename("hallazgos").to_string())
+    print(f"\n📄 Detalle: {out}")
+    raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+import re
+import unicodedata
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+
+
+def normalize_header(x) -> str:
+    if x is None:
+        return ""
+    return re.sub(r"\s+", " ", str(x)).strip().upper()
+
+
+def norm_key(x) -> str:
+    """Llave de comparación: mayúsculas, sin tildes, sin puntuación y espacios simples."""
+    s = unicodedata.normalize("NFKD", str(x or ""))
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    s = re.sub(r"[^\w/ ]+", " ", s.upper())
+    return re.sub(r"\s+", " ", s).strip()
+
+
+def cell_str(x):
+    """
+    Valor de celda como texto (equivalente a read_excel(dtype=str)).
+    Los números enteros guardados como float (73067972.0) se devuelven sin decimal.
+    """
+    if x is None:
+        return None
+    if isinstance(x, float):
+        if pd.isna(x):
+            return None
+        if x.is_integer():
+            return str(int(x))
+    s = str(x)
+    return None if s.strip() == "" else s
+
+
+def _is_header(row, tokens) -> bool:
+    for v in row:
+        h = normalize_header(v)
+        if h and all(t in h for t in tokens):
+            return True
+    return False
+
+
+def read_sheet(
+    path: Path,
+    sheet_name: str,
+    columns: dict[str, str],
+    header_tokens: tuple[str, ...],
+    max_col: int | None = None,
+    max_scan_rows: int = 60,
+    blank_run: int = 10,
+) -> pd.DataFrame:
+    """
+    Lee una hoja en modo streaming (openpyxl read_only) y devuelve solo las columnas pedidas.
+
+    - columns: {nombre_salida: texto que debe contener el encabezado}. Se toma la primera
+      coincidencia de izquierda a derecha; si no hay coincidencia la columna no se devuelve.
+    - header_tokens: la fila de encabezado es la primera (dentro de max_scan_rows) con una
+      celda que contiene todos estos textos.
+    - max_col: limita el ancho donde se buscan encabezados (ej: evitar el pivot a la derecha).
+    - blank_run: se deja de leer tras N filas seguidas vacías en las columnas pedidas, así
+      el costo no depende del rango "formateado" de la hoja.
+
+    Los valores se devuelven como texto (o None), igual que read_excel(dtype=str).
+    """
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb[sheet_name]
+
+        # 1) Buscar encabezado fila por fila (sin cargar la hoja completa)
+        header_row = None
+        header = None
+        for i, row in enumerate(
+            ws.iter_rows(max_row=max_scan_rows, max_col=max_col, values_only=True)
+        ):
+            if _is_header(row, header_tokens):
+                header_row = i
+                header = [normalize_header(v) for v in row]
+                break
+
+        if header_row is None:
+            raise RuntimeError(
+                f"No pude detectar encabezado {' / '.join(header_tokens)} en {Path(path).name} ({sheet_name})"
+            )
+
+        # 2) Resolver índice de cada columna pedida
+        col_idx = {}
+        for name, contains in columns.items():
+            needle = normalize_header(contains)
+            for j, h in enumerate(header):
+                if needle in h:
+                    col_idx[name] = j
+                    break
+
+        if not col_idx:
+            return pd.DataFrame(columns=list(columns))
+
+        # 3) Leer solo el rango de columnas necesario, desde la fila siguiente al encabezado
+        lo = min(col_idx.values())
+        hi = max(col_idx.values())
+        pos = {name: j - lo for name, j in col_idx.items()}
+
+        records = []
+        blanks = 0
+        for row in ws.iter_rows(
+            min_row=header_row + 2, min_col=lo + 1, max_col=hi + 1, values_only=True
+        ):
+            values = {name: cell_str(row[p]) if p < len(row) else None for name, p in pos.items()}
+            if all(v is None for v in values.values()):
+                blanks += 1
+                if blanks >= blank_run:
+                    break
+                continue
+            blanks = 0
+            records.append(values)
+    finally:
+        wb.close()
+
+    return pd.DataFrame.from_records(records, columns=list(col_idx))
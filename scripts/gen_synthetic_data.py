@@ -0,0 +1,288 @@
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+from app.db.connection import get_engine
+from app.db.dictionaries import BACKFILL_SIZES_SQL, BACKFILL_TXN_SQL, FILL_ITEM_SIZES_SQL
+from app.db.migrations import migrate
+
+CHUNK_ROWS = 200_000
+
+# Distribución de tipos de movimiento (aprox. a lo real: casi todo son entregas)
+TXN_TYPES = ["OUT", "IN", "RETURN", "ADJUST", "TRANSFER_OUT", "TRANSFER_IN"]
+TXN_WEIGHTS = [0.82, 0.10, 0.03, 0.02, 0.015, 0.015]
+
+MOTIVOS = ["Entrega inicial", "Renovación", "Desgaste", "Reposición", "Cambio de talla", "Otro"]
+MOTIVO_WEIGHTS = [0.20, 0.40, 0.20, 0.10, 0.05, 0.05]
+
+CLERKS = ["kevin", "almacen1", "almacen2", "almacen3"]
+
+BASE_EPP = [
+    "RESPIRADOR", "CARTUCHO P/POLVO -P 100", "CARTUCHO P/GASES -6003", "ADAPTADOR DE FILTRO",
+    "CASCO DE SEGURIDAD", "TAFILETE", "CORTAVIENTO", "BARBIQUEJO", "PROTECTOR AUDITIVO",
+    "LENTES DE SEGURIDAD", "VISOR PARA PROTECTOR FACIAL", "GUANTES DE JEBE", "GUANTES NITRILO",
+    "GUANTES ANTICORTE", "GUANTES DE BADANA", "GUANTES CUERO", "DISPENSADOR / BLOQUEADOR",
+    "APROM DE CUERO", "TRAJE TYVEK", "CAPOTÍN/ROPA PARA AGUA", "ARNÉS", "LÍNEA DE VIDA",
+]
+# Familias con talla: (nombre, tallas, pesos de consumo por talla)
+SIZED_EPP = [
+    ("CAMISA CON CINTA REFLECTIVA", ["S", "M", "L", "XL"], [0.15, 0.40, 0.35, 0.10]),
+    ("PANTALÓN CON CINTA REFLECTIVA", ["S", "M", "L", "XL"], [0.15, 0.40, 0.35, 0.10]),
+    ("CHOMPA JORGE CHAVEZ", ["S", "M", "L"], [0.25, 0.45, 0.30]),
+    ("ZAPATO DE SEGURIDAD", [str(t) for t in range(37, 45)], [0.03, 0.08, 0.17, 0.24, 0.23, 0.15, 0.07, 0.03]),
+    ("BOTAS DE JEBE PUNTA DE ACERO", [str(t) for t in range(37, 45)], [0.03, 0.08, 0.17, 0.24, 0.23, 0.15, 0.07, 0.03]),
+]
+
+SURNAMES = [
+    "QUISPE", "FLORES", "SANCHEZ", "RODRIGUEZ", "GARCIA", "ROJAS", "CASTILLO", "VASQUEZ",
+    "HUAMAN", "CHAVEZ", "TORRES", "RAMIREZ", "MENDOZA", "CRUZ", "DIAZ", "LOPEZ", "PEREZ",
+    "GONZALES", "SALAZAR", "LINARES", "CERDAN", "TISNADO", "ARIAS", "NARRO", "CORDOVA",
+]
+NAMES = [
+    "JUAN", "CARLOS", "JOSE", "LUIS", "JORGE", "PEDRO", "MIGUEL", "VICTOR", "CESAR", "WILMER",
+    "EDUARDO", "MANUEL", "JAIME", "FRANKLIN", "ROBERTO", "ALEXANDER", "SEGUNDO", "DAVID",
+]
+
+
+def apply_migrations(engine) -> None:
+    # Mismo esquema real que init_db, con todas las migraciones en orden
+    migrate(engine, log=lambda *_: None)
+
+
+def build_items(n_items: int) -> list[tuple]:
+    """(name, has_size, size, familia, peso_talla) — un item por talla, como en el master EPP."""
+    items = [
+        (f"{fam} T/{s}", 1, s, f, w)
+        for f, (fam, sizes, weights) in enumerate(SIZED_EPP)
+        for s, w in zip(sizes, weights)
+    ]
+    items += [(name, 0, None, len(SIZED_EPP) + k, 1.0) for k, name in enumerate(BASE_EPP)]
+    # Completar el catálogo con modelos adicionales
+    k = 0
+    while len(items) < n_items:
+        name = f"{BASE_EPP[k % len(BASE_EPP)]} MODELO {k // len(BASE_EPP) + 1:03d}"
+        items.append((name, 0, None, len(SIZED_EPP) + len(BASE_EPP) + k, 1.0))
+        k += 1
+    return items
+
+
+def fmt_datetimes(secs: np.ndarray) -> np.ndarray:
+    s = np.datetime_as_string(secs.astype("datetime64[s]"), unit="s")
+    return np.char.replace(s, "T", " ")
+
+
+def generate(
+    db_path: Path,
+    rows: int,
+    employees: int = 3000,
+    n_items: int = 300,
+    n_projects: int = 2,
+    years: int = 3,
+    end: str = "2026-01-01",
+    seed: int = 42,
+    quiet: bool = False,
+) -> None:
+    """Crea una BD SQLite nueva con el esquema real y datos sintéticos deterministas."""
+    rng = np.random.default_rng(seed)
+    t0 = time.perf_counter()
+
+    engine = get_engine(f"sqlite:///{db_path}")
+    apply_migrations(engine)
+
+    raw = engine.raw_connection()
+    try:
+        cur = raw.cursor()
+        # BD desechable: priorizamos velocidad de carga
+        cur.execute("PRAGMA journal_mode = OFF")
+        cur.execute("PRAGMA synchronous = OFF")
+        # los ids se generan aquí mismo y son consistentes: no validamos FK fila por fila
+        cur.execute("PRAGMA foreign_keys = OFF")
+
+        # --- Catálogos ---
+        codes = ["OBRAS", "RELAV"] + [f"PRY{i:02d}" for i in range(3, n_projects + 1)]
+        codes = codes[:n_projects]
+        cur.executemany(
+            "INSERT INTO projects (code, name, is_active) VALUES (?, ?, 1)",
+            [(c, f"Proyecto {c}") for c in codes],
+        )
+        cur.execute("INSERT INTO warehouses (name) VALUES ('Almacén central')")
+        cur.executemany(
+            "INSERT INTO locations (warehouse_id, project_id, code, name, is_segregation, is_active) VALUES (1, ?, ?, ?, 0, 1)",
+            [(i + 1, f"Z-{c}", f"Zona {c}") for i, c in enumerate(codes)],
+        )
+        cur.execute(
+            "INSERT INTO locations (warehouse_id, project_id, code, name, is_segregation, is_active) VALUES (1, NULL, 'Z-SEGR', 'Segregación', 1, 1)"
+        )
+
+        sn = rng.integers(0, len(SURNAMES), size=(employees, 2))
+        nm = rng.integers(0, len(NAMES), size=employees)
+        dnis = 40_000_000 + rng.choice(40_000_000, size=employees, replace=False)
+        active = rng.random(employees) < 0.85
+        cur.executemany(
+            "INSERT INTO employees (dni, fotocheck_code, full_name, phone, address, is_active) VALUES (?, ?, ?, ?, NULL, ?)",
+            [
+                (
+                    str(dnis[i]),
+                    f"GC{i + 1:07d}",
+                    f"{SURNAMES[sn[i, 0]]} {SURNAMES[sn[i, 1]]} {NAMES[nm[i]]} {i + 1}",
+                    f"9{rng.integers(10_000_000, 99_999_999)}",
+                    int(active[i]),
+                )
+                for i in range(employees)
+            ],
+        )
+
+        items = build_items(n_items)
+        cur.executemany(
+            "INSERT INTO items (sku, name, category, unit, has_size, useful_life_days, min_stock, is_active) VALUES (NULL, ?, 'EPP', 'UND', ?, NULL, ?, 1)",
+            [(name, has_size, int(rng.integers(0, 50))) for name, has_size, *_ in items],
+        )
+        raw.commit()
+
+        # Popularidad tipo Zipf por familia; dentro de la familia, la curva de tallas
+        family = np.array([f for *_, f, _ in items])
+        rank = rng.permutation(family.max() + 1) + 1
+        item_w = np.array([w for *_, w in items]) / rank[family] ** 0.8
+        item_w = item_w / item_w.sum()
+        item_size = np.array([s for _, _, s, *_ in items], dtype=object)
+
+        # --- Movimientos (en orden cronológico, por bloques) ---
+        t_end = int(datetime.fromisoformat(end).replace(tzinfo=timezone.utc).timestamp())
+        t_start = t_end - years * 365 * 86400
+        n_chunks = max(1, -(-rows // CHUNK_ROWS))
+        bounds = np.linspace(t_start, t_end, n_chunks + 1).astype(np.int64)
+        loc_ids = np.arange(1, n_projects + 1)
+
+        done = 0
+        for k in range(n_chunks):
+            n = min(CHUNK_ROWS, rows - done)
+            # horario de almacén 06:00-18:00 Lima (11:00-23:00 UTC)
+            day = rng.integers(bounds[k], bounds[k + 1], size=n) // 86400 * 86400
+            secs = np.sort(day + 11 * 3600 + rng.integers(0, 12 * 3600, size=n))
+            dts = fmt_datetimes(secs)
+
+            ttype = rng.choice(len(TXN_TYPES), size=n, p=TXN_WEIGHTS)
+            proj = rng.integers(1, n_projects + 1, size=n)
+            iid = rng.choice(len(items), size=n, p=item_w) + 1
+            emp = rng.integers(1, employees + 1, size=n)
+
+            qty = np.where(rng.random(n) < 0.85, 1, rng.integers(2, 6, size=n))
+            # ADJUST nunca en 0: -5..4 -> -5..-1, 1..5
+            adjust = rng.integers(-5, 5, size=n)
+            adjust += adjust >= 0
+            qty = np.select(
+                [ttype == 0, ttype == 1, ttype == 2, ttype == 3, ttype == 4, ttype == 5],
+                [-qty, rng.integers(10, 101, size=n), np.ones(n, dtype=np.int64),
+                 adjust, -rng.integers(5, 21, size=n), rng.integers(5, 21, size=n)],
+            )
+
+            size = item_size[iid - 1]
+            # 5% de tallas con variantes tipeadas a mano ("T/39", "t/39 ")
+            noisy = (size != None) & (rng.random(n) < 0.05)  # noqa: E711
+            size = size.copy()
+            size[noisy] = np.array([f"T/{s}" if j % 2 else f"t/{s} " for j, s in enumerate(size[noisy])], dtype=object)
+
+            tt = np.array(TXN_TYPES, dtype=object)[ttype]
+            motivo = np.array(MOTIVOS, dtype=object)[rng.choice(len(MOTIVOS), size=n, p=MOTIVO_WEIGHTS)]
+            clerk = np.array(CLERKS, dtype=object)[rng.integers(0, len(CLERKS), size=n)]
+            req = rng.integers(1000, 9999, size=n)
+
+            is_out = tt == "OUT"
+            is_in = tt == "IN"
+            emp_col = np.where(is_out | (tt == "RETURN"), emp.astype(object), None)
+            ref_col = np.where(is_in, np.char.add("GR-0", req.astype(str)).astype(object), None)
+            notes = np.where(is_out, motivo, None)
+            notes = np.where(is_in & (req % 2 == 1), np.char.add("REQ: R-", req.astype(str)).astype(object), notes)
+
+            batch = list(
+                zip(
+                    dts.tolist(),
+                    tt.tolist(),
+                    proj.tolist(),
+                    loc_ids[proj - 1].tolist(),
+                    iid.tolist(),
+                    qty.tolist(),
+                    size.tolist(),
+                    emp_col.tolist(),
+                    ref_col.tolist(),
+                    notes.tolist(),
+                    clerk.tolist(),
+                )
+            )
+            cur.executemany(
+                """
+                INSERT INTO transactions (
+                    txn_datetime, txn_type, project_id, location_id, item_id, qty, size,
+                    employee_id, reference, notes, created_by
+                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                batch,
+            )
+            raw.commit()
+            done += n
+            if not quiet:
+                print(f"   … {done:,}/{rows:,} movimientos", end="\r")
+
+        # Como una BD heredada: las tallas con ruido se normalizan con el mismo backfill de la migración 008
+        span = {"lo": 0, "hi": cur.execute("SELECT COALESCE(MAX(transaction_id), 0) FROM transactions").fetchone()[0]}
+        cur.execute(BACKFILL_SIZES_SQL, span)
+        cur.execute(BACKFILL_TXN_SQL, span)
+        cur.execute(FILL_ITEM_SIZES_SQL)
+        cur.execute("ANALYZE")
+        raw.commit()
+    finally:
+        raw.close()
+        engine.dispose()
+
+    if not quiet:
+        print(
+            f"\n✅ {db_path}: {rows:,} movimientos | {employees:,} trabajadores | {len(items)} items | {time.perf_counter() - t0:.1f}s"
+        )
+
+
+def main():
+    # uso:
+    # python -m scripts.gen_synthetic_data --db /tmp/synthetic.db --rows 100000 \
+    #     [--employees 3000] [--items 300] [--projects 2] [--years 3] [--end 2026-01-01] [--seed 42] [--force]
+    opts = {
+        "--db": "synthetic.db",
+        "--rows": "100000",
+        "--employees": "3000",
+        "--items": "300",
+        "--projects": "2",
+        "--years": "3",
+        "--end": "2026-01-01",
+        "--seed": "42",
+    }
+    args = sys.argv[1:]
+    force = "--force" in args
+    args = [a for a in args if a != "--force"]
+    while args:
+        a = args.pop(0)
+        if a not in opts:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+        opts[a] = args.pop(0)
+
+    db_path = Path(opts["--db"])
+    if db_path.exists():
+        if not force:
+            raise SystemExit(f"Ya existe {db_path}. Usa --force para regenerarla.")
+        db_path.unlink()
+
+    generate(
+        db_path,
+        rows=int(opts["--rows"]),
+        employees=int(opts["--employees"]),
+        n_items=int(opts["--items"]),
+        n_projects=int(opts["--projects"]),
+        years=int(opts["--years"]),
+        end=opts["--end"],
+        seed=int(opts["--seed"]),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,9 @@ import pandas as pd
 from sqlalchemy import text
 
 from app.db.connection import get_engine
+from app.db.dictionaries import SIZE_ID_SQL, normalize_size, register_sizes
+from scripts.excel_reader import read_sheet
+from scripts.import_kardex_history import rebase_seed
 
 
 def parse_int(x):
@@ -29,14 +32,6 @@ def clean_str(x):
     return None if s == "" or s.lower() == "nan" else s
 
 
-def detect_header_row(df):
-    for i in range(min(len(df), 60)):
-        v = str(df.iloc[i, 0]).upper() if not pd.isna(df.iloc[i, 0]) else ""
-        if "DESCRIPCION" in v and "EPP" in v:
-            return i
-    return None
-
-
 def infer_has_size(desc, talla):
     d = (desc or "").upper()
     t = (talla or "").upper()
@@ -56,53 +51,36 @@ def parse_date_from_filename(name):
 
 
 def read_kardex_total(path: Path) -> pd.DataFrame:
-    raw = pd.read_excel(path, sheet_name="KARDEX TOTAL", header=None, dtype=str)
-    header_row = detect_header_row(raw)
-    if header_row is None:
-        raise RuntimeError(
-            f"No pude detectar encabezado 'DESCRIPCION DE EPP' en {path.name}"
-        )
-
-    # encabezado + datos
-    header = raw.iloc[header_row].tolist()
-    data = raw.iloc[header_row + 1 :].copy()
-
-    # usamos solo las primeras 7 columnas (evita el pivot a la derecha)
-    data = data.iloc[:, :7]
-    header = header[:7]
-    data.columns = [
-        str(c).strip() if c is not None else f"col_{i}" for i, c in enumerate(header)
-    ]
-
-    # limpiar filas vacías
-    data = data.dropna(how="all")
-    # normalizar nombres de columnas (por si hay espacios)
-    data.columns = [re.sub(r"\s+", " ", c).strip() for c in data.columns]
-
-    # columnas esperadas (en tus kardex)
+    # Lectura en streaming: solo las columnas que usamos y hasta el fin real de los datos.
+    # Columnas esperadas (en tus kardex):
     # DESCRIPCION DE EPP | TALLAS | CANTIDAD /REQUERIDA | STOCK | CONSUMO 25-Ene | % TOTAL DEL STOCK
     # Las tomamos por contains para no depender 100%
-    def pick(col_contains):
-        for c in data.columns:
-            if col_contains in c.upper():
-                return c
-        return None
-
-    c_desc = pick("DESCRIPCION")
-    c_talla = pick("TALLA")
-    c_req = pick("REQUER")
-    c_stock = pick("STOCK")
-
-    if not c_desc or not c_stock:
+    data = read_sheet(
+        path,
+        "KARDEX TOTAL",
+        columns={
+            "description": "DESCRIPCION",
+            "size": "TALLA",
+            "required_qty": "REQUER",
+            "stock_qty": "STOCK",
+        },
+        header_tokens=("DESCRIPCION", "EPP"),
+        # usamos solo las primeras 7 columnas (evita el pivot a la derecha)
+        max_col=7,
+    )
+
+    if "description" not in data.columns or "stock_qty" not in data.columns:
         raise RuntimeError(
             f"No encontré columnas claves (DESCRIPCION/STOCK) en {path.name}. Columnas: {list(data.columns)}"
         )
 
     out = pd.DataFrame()
-    out["description"] = data[c_desc].apply(clean_str)
-    out["size"] = data[c_talla].apply(clean_str) if c_talla else None
-    out["required_qty"] = data[c_req].apply(parse_int) if c_req else None
-    out["stock_qty"] = data[c_stock].apply(parse_int)
+    out["description"] = data["description"].apply(clean_str)
+    out["size"] = data["size"].apply(clean_str) if "size" in data.columns else None
+    out["required_qty"] = (
+        data["required_qty"].apply(parse_int) if "required_qty" in data.columns else None
+    )
+    out["stock_qty"] = data["stock_qty"].apply(parse_int)
 
     # filtrar filas válidas
     out = out[out["description"].notna()]
@@ -126,8 +104,6 @@ def upsert_items_and_seed_stock(
     reference = f"INIT_STOCK_{project_code}_{txn_datetime[:10]}"
 
     with engine.begin() as conn:
-        conn.execute(text("PRAGMA foreign_keys = ON;"))
-
         # obtener project_id y location_id
         project_id = conn.execute(
             text("SELECT project_id FROM projects WHERE code=:c"), {"c": project_code}
@@ -186,16 +162,18 @@ def upsert_items_and_seed_stock(
             ).scalar_one()
 
             # Sembrar stock como ADJUST (+)
-            # Si talla viene, la guardamos en size, si no, NULL
+            # Si talla viene, la guardamos normalizada en size (y su size_id), si no, NULL
             if stock > 0:
+                talla = normalize_size(talla)
+                register_sizes(conn, [(item_id, talla)])
                 conn.execute(
                     text(
-                        """
+                        f"""
                     INSERT INTO transactions (
-                        txn_datetime, txn_type, project_id, location_id, item_id, qty, size,
+                        txn_datetime, txn_type, project_id, location_id, item_id, qty, size, size_id,
                         employee_id, request_number, reference, notes, created_by
                     ) VALUES (
-                        :dt, 'ADJUST', :pid, :lid, :iid, :qty, :size,
+                        :dt, 'ADJUST', :pid, :lid, :iid, :qty, :size, {SIZE_ID_SQL},
                         NULL, NULL, :ref, 'Seed inicial desde KARDEX TOTAL', 'system'
                     )
                     """
@@ -212,9 +190,17 @@ def upsert_items_and_seed_stock(
                 )
                 txn_inserted += 1
 
+        # Con el histórico ya cargado, el STOCK de la fecha del libro pasa a saldo inicial
+        rebased = rebase_seed(conn, project_code, project_id, location_id)
+
         print(
             f"✅ {project_code}: items procesados={len(df)} | transacciones ADJUST insertadas={txn_inserted} | reference={reference}"
         )
+        if rebased and rebased["movimientos"]:
+            print(
+                f"↩️ Seed como saldo inicial ({rebased['fecha']}): {rebased['unidades']:,} und "
+                f"en {rebased['claves']:,} EPP/talla | {rebased['movimientos']:,} ajustes nuevos"
+            )
 
 
 def main():
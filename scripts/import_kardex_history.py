@@ -0,0 +1,554 @@
+import hashlib
+import re
+import sys
+from datetime import date, datetime, timedelta
+from pathlib import Path
+
+import pandas as pd
+from openpyxl import load_workbook
+from sqlalchemy import text
+
+from app.db.connection import get_engine
+from app.db.dictionaries import SIZE_ID_SQL, normalize_size, register_sizes
+from app.db.migrations import migrate
+from scripts.excel_reader import cell_str, norm_key, normalize_header
+
+# Hojas del KARDEX DIGITAL que no son fichas de trabajador
+NON_WORKER_SHEETS = {"KARDEX TOTAL", "ESTADISTICOS", "INDICE"}
+
+MONTHS = {
+    "ENERO": 1,
+    "FEBRERO": 2,
+    "MARZO": 3,
+    "ABRIL": 4,
+    "MAYO": 5,
+    "JUNIO": 6,
+    "JULIO": 7,
+    "AGOSTO": 8,
+    "SETIEMBRE": 9,
+    "SEPTIEMBRE": 9,
+    "OCTUBRE": 10,
+    "NOVIEMBRE": 11,
+    "DICIEMBRE": 12,
+}
+
+# En la ficha: fila 4 = meses, fila 5 = días, fila 6 = encabezado, luego ítems (1-based)
+HEADER_SCAN_ROWS = 12
+CHUNK_SIZE = 5000
+BLANK_RUN = 10
+
+SOURCE_KEY_VERSION = "003"  # sql/migrations/003_txn_source_key.sql
+
+# Seed del KARDEX TOTAL (scripts/import_items_stock_from_kardex.py): INIT_STOCK_<proyecto>_<fecha>
+SEED_REFERENCE = re.compile(r"^INIT_STOCK_(?P<code>.+)_(?P<date>\d{4}-\d{2}-\d{2})$")
+# Movimientos nuevos que lo vuelven saldo inicial (rebase_seed); el seed en sí no se toca
+SEED_OPENING_SUFFIX = "_APERTURA"
+SEED_REVERSAL_SUFFIX = "_REVERSO"
+
+INSERT_SQL = f"""
+INSERT INTO transactions (
+    txn_datetime, txn_type, project_id, location_id, item_id, qty, size, size_id,
+    employee_id, request_number, reference, notes, created_by, source_key
+) VALUES (
+    :dt, :txn_type, :pid, :lid, :iid, :qty, :size, {SIZE_ID_SQL},
+    :eid, NULL, :ref, :notes, 'system', :source_key
+)
+ON CONFLICT(source_key) DO NOTHING
+"""
+
+INSERT_SEED_ADJUST_SQL = f"""
+INSERT INTO transactions (
+    txn_datetime, txn_type, project_id, location_id, item_id, qty, size, size_id,
+    employee_id, request_number, reference, notes, created_by
+) VALUES (
+    :dt, 'ADJUST', :pid, :lid, :iid, :qty, :size, {SIZE_ID_SQL},
+    NULL, NULL, :ref, :notes, 'system'
+)
+"""
+
+REFERENCE_TOTALS_SQL = """
+SELECT item_id, COALESCE(size_id, 0) AS size_key, MIN(size) AS size, txn_datetime AS dt, SUM(qty) AS qty
+FROM transactions
+WHERE reference = :ref AND project_id = :pid AND txn_datetime <= :until
+GROUP BY item_id, COALESCE(size_id, 0), txn_datetime
+"""
+
+
+def parse_year(ws_title_cell, path: Path, default: int | None = None) -> int:
+    # "CARDEX GRUPO CREDCO -2026"; si no, el año del nombre de archivo (dd_mm_yyyy)
+    # y por último el año visto en otras fichas del mismo libro
+    m = re.search(r"(20\d{2})", str(ws_title_cell or "")) or re.search(
+        r"\d{2}[._-]\d{2}[._-](20\d{2})", path.name
+    )
+    if m:
+        return int(m.group(1))
+    if default:
+        return default
+    raise RuntimeError(f"No pude determinar el año del kardex en {path.name}")
+
+
+def parse_qty(x):
+    if x is None or isinstance(x, bool):
+        return None
+    if isinstance(x, (int, float)):
+        return None if pd.isna(x) or x == 0 else int(x)
+    s = str(x).strip().replace(",", "")
+    try:
+        v = int(float(s))
+    except ValueError:
+        return None
+    return v or None
+
+
+def find_header(head) -> int | None:
+    for i, row in enumerate(head):
+        if row and "DESCRIPCION" in normalize_header(row[0]):
+            return i
+    return None
+
+
+def find_sheet_dni(head):
+    # Si la ficha trae DNI en la cabecera ("DNI:" | 12345678) lo usamos como llave
+    for row in head:
+        for k, v in enumerate(row[:4]):
+            if "DNI" in normalize_header(v) and k + 1 < len(row):
+                dni = re.sub(r"\D+", "", cell_str(row[k + 1]) or "")
+                if len(dni) == 8:
+                    return dni
+    return None
+
+
+def column_dates(months_row, days_row, year: int) -> dict[int, date]:
+    # columna -> fecha (el mes "arrastra" hacia la derecha hasta el siguiente mes)
+    col_dates = {}
+    month = None
+    for j in range(len(days_row)):
+        m = MONTHS.get(normalize_header(months_row[j]) if j < len(months_row) else "")
+        if m:
+            month = m
+        day = parse_qty(days_row[j])
+        if month and day:
+            try:
+                col_dates[j] = date(year, month, day)
+            except ValueError:
+                pass  # 30 de febrero, etc.
+    return col_dates
+
+
+def iter_worker_sheet(ws, path: Path, years: list[int]):
+    """
+    Recorre una ficha de trabajador en una sola pasada y produce
+    (dni, descripcion, talla, fecha, cantidad). No produce nada si la hoja no es una ficha.
+    `years` acumula el año de cada ficha leída (respaldo para fichas sin título).
+    """
+    rows = ws.iter_rows(values_only=True)
+    head = []
+    for row in rows:
+        head.append(row)
+        if len(head) >= HEADER_SCAN_ROWS or find_header(head[-1:]) is not None:
+            break
+
+    header_row = find_header(head)
+    if header_row is None or header_row < 2:
+        return
+
+    year = parse_year(
+        head[0][3] if len(head[0]) > 3 else None, path, years[-1] if years else None
+    )
+    years.append(year)
+    col_dates = column_dates(head[header_row - 2], head[header_row - 1], year)
+    if not col_dates:
+        return
+    dni = find_sheet_dni(head[:header_row])
+
+    lo = min(col_dates)
+    desc = None
+    blanks = 0
+    for row in rows:
+        d = cell_str(row[0]) if row else None
+        talla = cell_str(row[1]) if len(row) > 1 else None
+        if d is None and talla is None:
+            blanks += 1
+            if blanks >= BLANK_RUN:
+                break
+            continue
+        blanks = 0
+        if d is not None:
+            desc = d.strip()
+        if desc is None:
+            continue
+
+        for j in range(lo, len(row)):
+            if row[j] is None or j not in col_dates:
+                continue
+            qty = parse_qty(row[j])
+            if qty is not None:
+                yield dni, desc, (talla.strip() if talla else None), col_dates[j], qty
+
+
+def parse_workbook(path: Path) -> tuple[pd.DataFrame, list[str]]:
+    """Lee todas las fichas de trabajador en streaming y devuelve los movimientos en un DataFrame."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    records = []
+    skipped = []
+    years = []
+    try:
+        for name in wb.sheetnames:
+            if normalize_header(name) in NON_WORKER_SHEETS:
+                continue
+            n = len(records)
+            for dni, desc, talla, d, qty in iter_worker_sheet(wb[name], path, years):
+                records.append(
+                    {
+                        "sheet": name,
+                        "dni": dni,
+                        "description": desc,
+                        "size": talla,
+                        "date": d,
+                        "qty": qty,
+                    }
+                )
+            if len(records) == n:
+                skipped.append(name)
+    finally:
+        wb.close()
+
+    df = pd.DataFrame.from_records(
+        records, columns=["sheet", "dni", "description", "size", "date", "qty"]
+    )
+    # Vacíos como None (no NaN): se usan como llave en diccionarios y en la huella
+    for c in ("dni", "size"):
+        df[c] = df[c].astype(object).where(df[c].notna(), None)
+    return df, skipped
+
+
+def ensure_source_key(engine) -> None:
+    # Aplica (si falta) todo hasta la migración de source_key, con el registro de versiones
+    migrate(engine, target=SOURCE_KEY_VERSION)
+
+
+def build_resolvers(conn):
+    employees = pd.read_sql(
+        text("SELECT employee_id, dni, full_name FROM employees"), conn
+    )
+    items = pd.read_sql(text("SELECT item_id, name FROM items"), conn)
+
+    by_dni = {
+        str(d): int(e) for d, e in zip(employees["dni"], employees["employee_id"]) if d
+    }
+    by_name = {}
+    by_surnames = {}
+    for e, full in zip(employees["employee_id"], employees["full_name"]):
+        k = norm_key(full)
+        by_name[k] = int(e)
+        by_surnames.setdefault(" ".join(k.split()[:2]), []).append((k, int(e)))
+
+    items_by_name = {norm_key(n): int(i) for i, n in zip(items["item_id"], items["name"])}
+
+    def resolve_worker(sheet: str, dni: str | None):
+        if dni and dni in by_dni:
+            return by_dni[dni]
+        k = norm_key(sheet)
+        if k in by_name:
+            return by_name[k]
+        # La hoja suele llamarse "APELLIDO APELLIDO NOMBRE" (sin segundo nombre)
+        cands = [
+            e
+            for full, e in by_surnames.get(" ".join(k.split()[:2]), [])
+            if full.startswith(k + " ") or k.startswith(full + " ")
+        ]
+        return cands[0] if len(cands) == 1 else None
+
+    def resolve_item(desc: str, size: str | None):
+        if size:
+            iid = items_by_name.get(norm_key(f"{desc} T/{size}"))
+            if iid:
+                return iid
+        return items_by_name.get(norm_key(desc))
+
+    return resolve_worker, resolve_item
+
+
+def source_key(project_code: str, sheet: str, desc: str, size, d: date) -> str:
+    # Identidad de la celda (no depende del nombre/versión del archivo)
+    raw = "|".join(
+        ["KDX", project_code, norm_key(sheet), norm_key(desc), norm_key(size), d.isoformat()]
+    )
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def history_reference(project_code: str) -> str:
+    return f"KARDEX_HIST_{project_code}"
+
+
+def existing_history(conn, project_code: str, project_id: int) -> dict[str, tuple[int, int]]:
+    """
+    Lo ya importado por celda: huella -> (qty vigente, correcciones). Las correcciones llevan la
+    huella de la celda con ":n" (una por cada vez que cambió la cantidad en el libro).
+    """
+    rows = conn.execute(
+        text(
+            "SELECT source_key, qty FROM transactions "
+            "WHERE reference = :ref AND project_id = :pid AND source_key IS NOT NULL"
+        ),
+        {"ref": history_reference(project_code), "pid": project_id},
+    )
+    out = {}
+    for key, qty in rows:
+        base = key.split(":", 1)[0]
+        total, n = out.get(base, (0, -1))
+        out[base] = (total + qty, n + 1)
+    return out
+
+
+def _reference_totals(conn, project_id: int, reference: str, until: str = "9999-12-31 23:59:59") -> pd.DataFrame:
+    """qty por EPP × talla × fecha de los movimientos con esa reference (hasta `until`)."""
+    df = pd.read_sql(text(REFERENCE_TOTALS_SQL), conn, params={"ref": reference, "pid": project_id, "until": until})
+    return df.assign(qty=pd.to_numeric(df["qty"]).fillna(0).astype(int))
+
+
+def _by_key(df: pd.DataFrame) -> pd.DataFrame:
+    return df.groupby(["item_id", "size_key"], as_index=False).agg(
+        size=("size", "first"), dt=("dt", "min"), qty=("qty", "sum")
+    )
+
+
+def _pending(target: pd.DataFrame, posted: pd.DataFrame) -> pd.DataFrame:
+    """Lo que falta mover por EPP × talla para que `posted` sume `target` (columnas item_id, size_key, size, qty)."""
+    df = target.merge(posted, on=["item_id", "size_key"], how="outer", suffixes=("", "_posted"))
+    df["size"] = df["size"].astype(object).where(df["size"].notna(), df["size_posted"])
+    df["qty"] = df["qty"].fillna(0).astype(int) - df["qty_posted"].fillna(0).astype(int)
+    return df[df["qty"] != 0]
+
+
+def rebase_seed(conn, project_code: str, project_id: int, location_id: int) -> dict | None:
+    """
+    El seed del KARDEX TOTAL es el STOCK a la fecha del libro: ya descuenta las entregas del
+    histórico. Con el histórico cargado, se vuelve saldo inicial solo con movimientos nuevos
+    (no se editan movimientos; se corrige con nuevos movimientos):
+    - <seed>_REVERSO: anula el seed en su misma fecha;
+    - <seed>_APERTURA: saldo inicial un segundo antes de la primera entrega, el seed más lo
+      entregado hasta la fecha del seed.
+    Se puede repetir (otro libro, más histórico): solo agrega la diferencia. Si la primera entrega
+    pasa a ser más antigua, la apertura anterior se anula en su fecha y se registra en la nueva.
+    Devuelve lo hecho, o None si no hay seed o histórico.
+    """
+    refs = conn.execute(
+        text(
+            "SELECT DISTINCT reference FROM transactions "
+            "WHERE txn_type = 'ADJUST' AND project_id = :pid AND location_id = :lid AND reference LIKE :like"
+        ),
+        {"pid": project_id, "lid": location_id, "like": f"INIT_STOCK_{project_code}_%"},
+    ).scalars()
+    seeds = sorted(
+        (m.group("date"), m.group(0))
+        for m in map(SEED_REFERENCE.match, refs)
+        if m and m.group("code") == project_code
+    )
+    first = conn.execute(
+        text("SELECT MIN(txn_datetime) FROM transactions WHERE reference = :ref AND project_id = :pid"),
+        {"ref": history_reference(project_code), "pid": project_id},
+    ).scalar_one()
+    if not seeds or first is None:
+        return None
+    seed_date, seed_ref = seeds[-1]
+    opening_ref, reversal_ref = seed_ref + SEED_OPENING_SUFFIX, seed_ref + SEED_REVERSAL_SUFFIX
+    cutoff = f"{seed_date} 23:59:59"
+    if first > cutoff:
+        return {"seed": seed_ref, "movimientos": 0}
+
+    seed = _by_key(_reference_totals(conn, project_id, seed_ref))
+    delivered = _by_key(_reference_totals(conn, project_id, history_reference(project_code), cutoff))
+    target = seed.merge(delivered, on=["item_id", "size_key"], how="outer", suffixes=("", "_hist"))
+    target["size"] = target["size"].astype(object).where(target["size"].notna(), target["size_hist"])
+    target["qty"] = target["qty"].fillna(0).astype(int) - target["qty_hist"].fillna(0).astype(int)
+
+    opening = (datetime.strptime(first, "%Y-%m-%d %H:%M:%S") - timedelta(seconds=1)).strftime("%Y-%m-%d %H:%M:%S")
+    posted = _reference_totals(conn, project_id, opening_ref)
+    moved = posted[(posted["dt"] != opening) & (posted["qty"] != 0)]
+    at_opening = _by_key(posted[posted["dt"] == opening])
+
+    rows = []
+
+    def post(df, ref, notes, dt=None):
+        rows.extend(
+            {
+                "dt": dt or r.dt,
+                "pid": project_id,
+                "lid": location_id,
+                "iid": int(r.item_id),
+                "qty": int(r.qty),
+                "size": None if pd.isna(r.size) else r.size,
+                "ref": ref,
+                "notes": notes,
+            }
+            for r in df.itertuples(index=False)
+        )
+
+    post(moved.assign(qty=-moved["qty"]), opening_ref, "Anula saldo inicial anterior: hay entregas más antiguas")
+    opened = _pending(target, at_opening)
+    post(opened, opening_ref, "Saldo inicial: STOCK del seed más lo entregado hasta su fecha", opening)
+    reversed_ = _pending(seed.assign(qty=-seed["qty"]), _by_key(_reference_totals(conn, project_id, reversal_ref)))
+    # Cada clave se anula en la fecha de su fila de seed (las claves nuevas del reverso no tienen seed)
+    reversed_ = reversed_.assign(dt=reversed_["dt"].fillna(reversed_["dt_posted"]))
+    post(reversed_, reversal_ref, "Anula el seed: pasa a saldo inicial antes de la primera entrega")
+    if rows:
+        conn.execute(text(INSERT_SEED_ADJUST_SQL), rows)
+    return {
+        "seed": seed_ref,
+        "movimientos": len(rows),
+        "claves": len(target),
+        "unidades": int(target["qty"].sum()),
+        "fecha": opening,
+    }
+
+
+def import_history(kardex_path: Path, project_code: str, location_code: str) -> None:
+    engine = get_engine()
+    ensure_source_key(engine)
+
+    df, skipped = parse_workbook(kardex_path)
+    print(f"📄 {kardex_path.name}: {len(df)} celdas con movimiento")
+    if skipped:
+        print(f"   (hojas sin movimientos: {', '.join(skipped)})")
+    if df.empty:
+        return
+
+    with engine.connect() as conn:
+        project_id = conn.execute(
+            text("SELECT project_id FROM projects WHERE code=:c"), {"c": project_code}
+        ).scalar_one()
+        location_id = conn.execute(
+            text("SELECT location_id FROM locations WHERE code=:c"),
+            {"c": location_code},
+        ).scalar_one()
+        resolve_worker, resolve_item = build_resolvers(conn)
+
+    # Resolución con diccionarios en memoria (una vez por hoja / por ítem+talla)
+    workers = {
+        (s, d): resolve_worker(s, d)
+        for s, d in df[["sheet", "dni"]].drop_duplicates().itertuples(index=False)
+    }
+    items = {
+        (d, s): resolve_item(d, s)
+        for d, s in df[["description", "size"]].drop_duplicates().itertuples(index=False)
+    }
+    df["employee_id"] = [workers[(s, d)] for s, d in zip(df["sheet"], df["dni"])]
+    df["item_id"] = [items[(d, s)] for d, s in zip(df["description"], df["size"])]
+
+    no_worker = sorted(df.loc[df["employee_id"].isna(), "sheet"].unique())
+    no_item = sorted(
+        {
+            f"{d} ({s})" if s else d
+            for d, s in df.loc[df["item_id"].isna(), ["description", "size"]].itertuples(
+                index=False
+            )
+        }
+    )
+    ok = df[df["employee_id"].notna() & df["item_id"].notna()]
+    ok = ok.assign(
+        source_key=[
+            source_key(project_code, s, d, z, dt)
+            for s, d, z, dt in zip(ok["sheet"], ok["description"], ok["size"], ok["date"])
+        ]
+    )
+    # La misma celda en dos filas (EPP repetido en la ficha): una sola entrega por la suma
+    ok = ok.assign(qty=ok.groupby("source_key")["qty"].transform("sum")).drop_duplicates("source_key")
+
+    reference = history_reference(project_code)
+    with engine.connect() as conn:
+        existing = existing_history(conn, project_code, project_id)
+    inserted = 0
+    batch = []
+    corrections = []
+
+    def flush():
+        nonlocal inserted
+        if not batch:
+            return
+        with engine.begin() as conn:
+            register_sizes(conn, [(r["iid"], r["size"]) for r in batch])
+            res = conn.execute(text(INSERT_SQL), batch)
+            inserted += max(res.rowcount, 0)
+        batch.clear()
+
+    for r in ok.itertuples(index=False):
+        # Positivo = entrega al trabajador (OUT, qty negativa); negativo = devolución
+        qty, key = -r.qty, r.source_key
+        notes = f"Histórico KARDEX DIGITAL ({r.sheet})"
+        if key in existing:
+            # Celda ya importada: si el libro trae otra cantidad, se corrige con un movimiento
+            # por la diferencia (el de antes no se toca)
+            current, n = existing[key]
+            if qty == current:
+                continue
+            corrections.append(f"{r.sheet} | {r.description} {r.size or ''} | {r.date}: {-current} -> {r.qty}")
+            qty, key = qty - current, f"{key}:{n + 1}"
+            notes = f"Corrección histórico KARDEX DIGITAL ({r.sheet}): {-current} -> {r.qty}"
+        elif qty == 0:
+            continue
+        batch.append(
+            {
+                "dt": f"{r.date.isoformat()} 13:00:00",
+                "txn_type": "OUT" if qty < 0 else "RETURN",
+                "pid": project_id,
+                "lid": location_id,
+                "iid": int(r.item_id),
+                "qty": qty,
+                "size": normalize_size(r.size),
+                "eid": int(r.employee_id),
+                "ref": reference,
+                "notes": notes,
+                "source_key": key,
+            }
+        )
+        if len(batch) >= CHUNK_SIZE:
+            flush()
+    flush()
+
+    with engine.begin() as conn:
+        rebased = rebase_seed(conn, project_code, project_id, location_id)
+
+    print(
+        f"✅ {project_code}: movimientos válidos={len(ok)} | insertados={inserted - len(corrections)} | "
+        f"corregidos={len(corrections)} | ya existentes={len(ok) - inserted}"
+    )
+    if corrections:
+        print(f"✏️ Celdas con otra cantidad que la ya importada ({len(corrections)}), corregidas por la diferencia:")
+        for c in corrections[:20]:
+            print(f"   {c}")
+    if rebased and rebased["movimientos"]:
+        print(
+            f"↩️ Seed {rebased['seed']} como saldo inicial ({rebased['fecha']}): {rebased['unidades']:,} und "
+            f"en {rebased['claves']:,} EPP/talla | {rebased['movimientos']:,} ajustes nuevos"
+        )
+    if no_worker:
+        print(f"⚠️ Hojas sin trabajador en employees ({len(no_worker)}): {', '.join(no_worker)}")
+    if no_item:
+        print(f"⚠️ EPP no encontrados en items ({len(no_item)}): {', '.join(no_item)}")
+
+
+def main():
+    # uso:
+    # python -m scripts.import_kardex_history data/raw/kardex_obras.xlsm data/raw/kardex_relav.xlsm
+    # Se puede correr antes o después del seed (import_items_stock_from_kardex): el seed queda como
+    # saldo inicial antes de la primera entrega (rebase_seed). Repetirlo con un libro más nuevo
+    # agrega las celdas nuevas y corrige por la diferencia las que cambiaron de cantidad.
+    obras = Path("data/raw/kardex_obras.xlsm")
+    relav = Path("data/raw/kardex_relav.xlsm")
+
+    if len(sys.argv) >= 3:
+        obras = Path(sys.argv[1])
+        relav = Path(sys.argv[2])
+
+    if not obras.exists():
+        raise FileNotFoundError(f"No existe: {obras}")
+    if not relav.exists():
+        raise FileNotFoundError(f"No existe: {relav}")
+
+    import_history(obras, project_code="OBRAS", location_code="Z-OBRAS")
+    import_history(relav, project_code="RELAV", location_code="Z-RELAV")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,10 +6,25 @@ import pandas as pd
 from sqlalchemy import text
 
 from app.db.connection import get_engine
+from scripts.excel_reader import read_sheet
 
 
 SHEET = "PERSONAL ACTIVO"
 
+# Columnas que se comparan en el sync (además del DNI, que es la llave)
+SYNC_COLS = ["fotocheck_code", "full_name", "phone", "address"]
+
+UPSERT_SQL = """
+INSERT INTO employees (dni, fotocheck_code, full_name, phone, address, is_active)
+VALUES (:dni, :fotocheck_code, :full_name, :phone, :address, 1)
+ON CONFLICT(dni) DO UPDATE SET
+    fotocheck_code=excluded.fotocheck_code,
+    full_name=excluded.full_name,
+    phone=excluded.phone,
+    address=excluded.address,
+    is_active=1
+"""
+
 
 def clean_digits(x: str) -> str:
     if x is None:
@@ -19,43 +34,117 @@ def clean_digits(x: str) -> str:
     return s
 
 
+def row_hash(df: pd.DataFrame) -> pd.Series:
+    # Hash vectorizado de la fila normalizada (None y "" cuentan igual)
+    norm = df[SYNC_COLS].fillna("").astype(str).apply(lambda s: s.str.strip())
+    return pd.util.hash_pandas_object(norm, index=False)
+
+
+def sync_employees(engine, out: pd.DataFrame, dry_run: bool = False) -> None:
+    """
+    Sincroniza employees contra la hoja: carga el estado actual una sola vez, compara por DNI
+    (hash de la fila normalizada) y escribe solo altas, cambios y bajas en lote.
+    Las bajas son lógicas (is_active=0): el historial de movimientos se conserva.
+    """
+    with engine.connect() as conn:
+        current = pd.read_sql(
+            text(
+                "SELECT employee_id, dni, fotocheck_code, full_name, phone, address, is_active "
+                "FROM employees WHERE dni IS NOT NULL"
+            ),
+            conn,
+        )
+
+    sheet = out.copy()
+    sheet["_hash"] = row_hash(sheet)
+    current["_hash"] = row_hash(current)
+
+    merged = sheet.merge(
+        current[["employee_id", "dni", "is_active", "_hash"]],
+        on="dni",
+        how="outer",
+        suffixes=("", "_db"),
+        indicator=True,
+    )
+
+    in_sheet = merged["_merge"] != "right_only"
+    to_insert = merged[merged["_merge"] == "left_only"]
+    to_update = merged[
+        (merged["_merge"] == "both")
+        & ((merged["_hash"] != merged["_hash_db"]) | (merged["is_active"] != 1))
+    ]
+    to_deactivate = merged[~in_sheet & (merged["is_active"] == 1)]
+    unchanged = int(in_sheet.sum()) - len(to_insert) - len(to_update)
+
+    print("\n🔁 Sync de personal")
+    print(f"   ➕ Altas: {len(to_insert)}")
+    print(f"   ✏️ Cambios / reactivaciones: {len(to_update)}")
+    print(f"   ➖ Bajas (is_active=0): {len(to_deactivate)}")
+    print(f"   = Sin cambios: {unchanged}")
+
+    if dry_run:
+        print("\n🧪 Dry-run: no se escribió nada.")
+        return
+
+    def records(df: pd.DataFrame) -> list[dict]:
+        return (
+            df[["dni"] + SYNC_COLS]
+            .astype(object)
+            .where(df[["dni"] + SYNC_COLS].notna(), None)
+            .to_dict("records")
+        )
+
+    with engine.begin() as conn:
+        # executemany: un solo statement por tipo de cambio
+        if not to_insert.empty or not to_update.empty:
+            conn.execute(text(UPSERT_SQL), records(pd.concat([to_insert, to_update])))
+        if not to_deactivate.empty:
+            conn.execute(
+                text("UPDATE employees SET is_active=0 WHERE employee_id=:eid"),
+                [{"eid": int(e)} for e in to_deactivate["employee_id"]],
+            )
+
+        total = conn.execute(
+            text("SELECT COUNT(*) FROM employees WHERE is_active=1")
+        ).scalar_one()
+
+    print(f"\n✅ Sync OK. Activos en employees: {total}")
+
+
 def main():
+    # uso:
+    # python -m scripts.import_personal_activo [personal.xlsx] [--sync] [--dry-run]
+    args = [a for a in sys.argv[1:] if not a.startswith("--")]
+    sync = "--sync" in sys.argv[1:]
+    dry_run = "--dry-run" in sys.argv[1:]
+
     excel_path = Path("data/raw/personal.xlsx")  # fijo para tu V1
-    if len(sys.argv) >= 2:
-        excel_path = Path(sys.argv[1]).expanduser()
+    if args:
+        excel_path = Path(args[0]).expanduser()
 
     if not excel_path.exists():
         raise FileNotFoundError(f"No existe el archivo: {excel_path}")
 
-    # Leemos SIN headers porque tus headers están en la fila 5 (índice 4)
-    raw = pd.read_excel(excel_path, sheet_name=SHEET, header=None, dtype=str)
-
-    # Fila 4 (índice 4) = nombres de columnas reales
-    header = raw.iloc[4].tolist()
-
-    # Datos empiezan en la fila 6 (índice 5)
-    data = raw.iloc[5:].copy()
-    data.columns = header
-    data = data.dropna(how="all")
-
-    # Renombrar columnas NaN (en tu excel hay 2 columnas sin nombre)
-    fixed_cols = []
-    nan_count = 0
-    for c in data.columns:
-        if c is None or (isinstance(c, float) and pd.isna(c)) or str(c).strip() == "":
-            nan_count += 1
-            fixed_cols.append("TIEMPO_MESES" if nan_count == 1 else "TIEMPO_DIAS")
-        else:
-            fixed_cols.append(str(c).strip())
-    data.columns = fixed_cols
-
-    # Columnas clave según tu plantilla
+    # Lectura en streaming: el encabezado real está en la fila 5 (se detecta solo)
+    # y tomamos únicamente las columnas clave según tu plantilla
     col_dni = "NRO DOCUMENTO"
     col_fot = "CODIGO"
-    col_full = "APELLIDOS Y NOMBRES COMPLETOS\n(NO TOCAR ESTA FILA)"
+    col_full = "APELLIDOS Y NOMBRES COMPLETOS"
     col_tel = "CELULAR"
     col_dir = "DIRECCION"
 
+    data = read_sheet(
+        excel_path,
+        SHEET,
+        columns={c: c for c in (col_dni, col_fot, col_full, col_tel, col_dir)},
+        header_tokens=(col_dni,),
+    )
+
+    if col_dni not in data.columns or col_full not in data.columns:
+        raise RuntimeError(
+            f"No encontré columnas claves ({col_dni} / {col_full}) en {excel_path.name}. Columnas: {list(data.columns)}"
+        )
+
     # Filtrar filas que NO son personas (STAFF, CONDUCTORES, etc.)
     data[col_dni] = data[col_dni].apply(clean_digits)
     data = data[(data[col_dni].notna()) & (data[col_dni] != "")]
@@ -86,21 +175,14 @@ def main():
     print(out.head(5).to_string(index=False))
 
     engine = get_engine()
-    with engine.begin() as conn:
-        conn.execute(text("PRAGMA foreign_keys = ON;"))
+    if sync:
+        sync_employees(engine, out, dry_run=dry_run)
+        return
 
+    with engine.begin() as conn:
         for _, r in out.iterrows():
             conn.execute(
-                text("""
-                INSERT INTO employees (dni, fotocheck_code, full_name, phone, address, is_active)
-                VALUES (:dni, :fotocheck_code, :full_name, :phone, :address, 1)
-                ON CONFLICT(dni) DO UPDATE SET
-                    fotocheck_code=excluded.fotocheck_code,
-                    full_name=excluded.full_name,
-                    phone=excluded.phone,
-                    address=excluded.address,
-                    is_active=1
-                """),
+                text(UPSERT_SQL),
                 {
                     "dni": r["dni"],
                     "fotocheck_code": r["fotocheck_code"],
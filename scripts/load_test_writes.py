@@ -0,0 +1,372 @@
+import json
+import platform
+import random
+import shutil
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import sqlalchemy
+from sqlalchemy import text
+from sqlalchemy.exc import DBAPIError
+
+from app.db.connection import get_engine
+from app.db.dictionaries import SIZE_ID_SQL
+from app.db.movements import (
+    DUP_IN_SQL,
+    DUP_OUT_SQL,
+    DUP_WINDOW_SECONDS,
+    INSERT_IN_SQL,
+    INSERT_OUT_SQL,
+    insert_movement,
+    utc_now_str,
+)
+from app.db.queries import STOCK_SQL
+from app.db.write_queue import InsufficientStockError, get_write_queue, write_movements
+from scripts.gen_synthetic_data import generate
+
+# Prueba de carga de escrituras: N almaceneros entregando/ingresando a la vez con el
+# mismo flujo de las páginas (anti-duplicado -> revalidar stock -> INSERT en su transacción).
+# --queue: el INSERT va por la cola de escritura (db/write_queue.py), como en las páginas; solo
+# tiene sentido con --mode thread (la cola es por proceso).
+# Mide throughput, latencias, errores de bloqueo y si el stock llegó a quedar negativo.
+
+INIT_REF = "LOADTEST_INIT"
+
+
+def classify_error(exc: Exception) -> str:
+    msg = str(exc).lower()
+    if any(k in msg for k in ("locked", "busy", "deadlock", "could not serialize", "lock timeout")):
+        return "bloqueo"
+    return "error"
+
+
+def prepare(engine, n_hot: int, stock: int) -> dict:
+    """
+    Elige las combinaciones proyecto × EPP × talla más movidas del primer proyecto y deja su stock
+    exactamente en `stock` con un ADJUST. Así los almaceneros compiten por pocas filas y el stock se agota.
+    """
+    with engine.begin() as conn:
+        pid = conn.execute(text("SELECT MIN(project_id) FROM projects")).scalar_one()
+        lid = conn.execute(
+            text("SELECT MIN(location_id) FROM locations WHERE project_id=:pid"), {"pid": pid}
+        ).scalar_one()
+        hot = conn.execute(
+            text(
+                """
+                SELECT t.item_id, s.code AS size, COALESCE(SUM(t.qty), 0) AS stock
+                FROM transactions t
+                LEFT JOIN sizes s ON s.size_id = t.size_id
+                WHERE t.project_id=:pid
+                GROUP BY t.item_id, t.size_id, s.code
+                ORDER BY COUNT(*) DESC
+                LIMIT :n
+                """
+            ),
+            {"pid": pid, "n": n_hot},
+        ).all()
+        employees = conn.execute(
+            text("SELECT employee_id FROM employees WHERE is_active=1 ORDER BY employee_id")
+        ).scalars().all()
+        if not hot or not employees:
+            raise RuntimeError("La BD no tiene movimientos ni trabajadores activos para la prueba.")
+
+        now_utc = utc_now_str()
+        conn.execute(
+            text(
+                f"""
+                INSERT INTO transactions (txn_datetime, txn_type, project_id, location_id,
+                                          item_id, qty, size, size_id, reference, created_by)
+                VALUES (:now_utc, 'ADJUST', :pid, :lid, :iid, :qty, :size, {SIZE_ID_SQL}, :ref, 'loadtest')
+                """
+            ),
+            [
+                {
+                    "now_utc": now_utc,
+                    "pid": pid,
+                    "lid": lid,
+                    "iid": iid,
+                    "qty": stock - cur,
+                    "size": size,
+                    "ref": INIT_REF,
+                }
+                for iid, size, cur in hot
+                if cur != stock
+            ],
+        )
+        start_id = conn.execute(text("SELECT MAX(transaction_id) FROM transactions")).scalar_one()
+
+    return {
+        "pid": pid,
+        "lid": lid,
+        "hot": [(iid, size) for iid, size, _ in hot],
+        "employees": employees,
+        "start_id": start_id,
+    }
+
+
+def deliver(engine, plan: dict, rng: random.Random) -> str:
+    """Mismo flujo que 2_Entregar_a_Personal: anti-duplicado, revalidar stock e insertar OUT."""
+    iid, size = rng.choice(plan["hot"])
+    eid = rng.choice(plan["employees"])
+    qty = rng.randint(1, 3)
+    with engine.connect() as conn:
+        dup = conn.execute(
+            text(DUP_OUT_SQL),
+            {
+                "pid": plan["pid"],
+                "eid": eid,
+                "iid": iid,
+                "neg_qty": -qty,
+                "size": size,
+                "since_utc": utc_now_str(DUP_WINDOW_SECONDS),
+            },
+        ).fetchone()
+        if dup:
+            return "duplicado"
+        current = conn.execute(
+            text(STOCK_SQL), {"pid": plan["pid"], "iid": iid, "size": size}
+        ).scalar_one()
+    if qty > current:
+        return "sin_stock"
+    params = {
+        "pid": plan["pid"],
+        "lid": plan["lid"],
+        "iid": iid,
+        "qty": -qty,
+        "size": size,
+        "eid": eid,
+        "notes": "Reposición | loadtest",
+        "now_utc": utc_now_str(),
+    }
+    if plan["queue"]:
+        try:
+            write_movements(engine, [(INSERT_OUT_SQL, params)])
+        except InsufficientStockError:
+            return "sin_stock"
+        return "ok"
+    with engine.begin() as conn:
+        insert_movement(conn, INSERT_OUT_SQL, params)
+    return "ok"
+
+
+def receive(engine, plan: dict, rng: random.Random) -> str:
+    """Mismo flujo que 2_Ingresar_Stock: anti-duplicado e insertar IN."""
+    iid, size = rng.choice(plan["hot"])
+    qty = rng.randint(5, 20)
+    params = {
+        "pid": plan["pid"],
+        "lid": plan["lid"],
+        "iid": iid,
+        "qty": qty,
+        "size": size,
+    }
+    with engine.connect() as conn:
+        dup_params = {**params, "since_utc": utc_now_str(DUP_WINDOW_SECONDS)}
+        if conn.execute(text(DUP_IN_SQL), dup_params).fetchone():
+            return "duplicado"
+    params = {
+        **params,
+        "ref": f"GR-LT-{rng.randint(0, 10**6)}",
+        "notes": "loadtest",
+        "now_utc": utc_now_str(),
+    }
+    if plan["queue"]:
+        write_movements(engine, [(INSERT_IN_SQL, params)])
+        return "ok"
+    with engine.begin() as conn:
+        insert_movement(conn, INSERT_IN_SQL, params)
+    return "ok"
+
+
+def clerk(idx: int, url: str, plan: dict, cfg: dict) -> list[tuple[str, str, float]]:
+    """Un almacenero: su propio engine (como una sesión de Streamlit) y operaciones hasta que acabe el tiempo."""
+    rng = random.Random(cfg["seed"] * 1000 + idx)
+    engine = get_engine(url)
+    samples = []
+    # todos arrancan a la vez
+    time.sleep(max(0.0, cfg["start_at"] - time.time()))
+    while time.time() < cfg["end_at"]:
+        kind = "IN" if rng.random() < cfg["in_ratio"] else "OUT"
+        t0 = time.perf_counter()
+        try:
+            outcome = (receive if kind == "IN" else deliver)(engine, plan, rng)
+        except DBAPIError as e:
+            outcome = classify_error(e)
+        samples.append((kind, outcome, (time.perf_counter() - t0) * 1000))
+        if cfg["think_ms"]:
+            time.sleep(rng.uniform(0, cfg["think_ms"]) / 1000)
+    engine.dispose()
+    return samples
+
+
+def check_invariant(engine, plan: dict, stock: int) -> dict:
+    """Reproduce el saldo de cada combinación caliente en orden de transaction_id y cuenta los negativos."""
+    with engine.connect() as conn:
+        df = pd.read_sql(
+            text(
+                """
+                SELECT transaction_id, item_id, size, qty
+                FROM transactions
+                WHERE project_id=:pid AND transaction_id > :start_id
+                ORDER BY transaction_id
+                """
+            ),
+            conn,
+            params={"pid": plan["pid"], "start_id": plan["start_id"]},
+        )
+    hot = pd.DataFrame(plan["hot"], columns=["item_id", "size"])
+    df = df.merge(hot, on=["item_id", "size"], how="inner").sort_values("transaction_id")
+    if df.empty:
+        return {"violations": 0, "keys_negative": 0, "min_balance": stock}
+    df["saldo"] = stock + df.groupby(["item_id", "size"], dropna=False)["qty"].cumsum()
+    neg = df[df["saldo"] < 0]
+    return {
+        "violations": int(len(neg)),
+        "keys_negative": int(neg[["item_id", "size"]].drop_duplicates().shape[0]),
+        "min_balance": int(df["saldo"].min()),
+    }
+
+
+def summarize(samples: list[tuple[str, str, float]], duration: float) -> dict:
+    df = pd.DataFrame(samples, columns=["kind", "outcome", "ms"])
+    out = {}
+    for kind, g in df.groupby("kind"):
+        counts = g["outcome"].value_counts().to_dict()
+        ok_ms = g.loc[g["outcome"] == "ok", "ms"].to_numpy()
+        p50, p95, p99 = np.percentile(ok_ms, [50, 95, 99]) if len(ok_ms) else (0, 0, 0)
+        out[kind] = {
+            "ops": int(len(g)),
+            **{k: int(counts.get(k, 0)) for k in ("ok", "sin_stock", "duplicado", "bloqueo", "error")},
+            "ok_per_s": round(counts.get("ok", 0) / duration, 2),
+            "p50_ms": round(float(p50), 3),
+            "p95_ms": round(float(p95), 3),
+            "p99_ms": round(float(p99), 3),
+            "max_ms": round(float(ok_ms.max()), 3) if len(ok_ms) else 0,
+        }
+    return out
+
+
+def main():
+    # uso:
+    # python -m scripts.load_test_writes [--url sqlite:///bench/data/loadtest.db | postgresql+psycopg2://...] \
+    #     [--clerks 8] [--mode thread|process] [--duration 10] [--in-ratio 0.1] [--think-ms 0] \
+    #     [--hot 5] [--stock 200] [--seed-rows 10000] [--seed 42] [--out bench/loadtest.json] [--queue]
+    # Sin --url se genera una BD SQLite sintética nueva en cada corrida.
+    opts = {
+        "--url": None,
+        "--clerks": "8",
+        "--mode": "thread",
+        "--duration": "10",
+        "--in-ratio": "0.1",
+        "--think-ms": "0",
+        "--hot": "5",
+        "--stock": "200",
+        "--seed-rows": "10000",
+        "--seed": "42",
+        "--out": "bench/loadtest.json",
+    }
+    args = sys.argv[1:]
+    use_queue = "--queue" in args
+    args = [a for a in args if a != "--queue"]
+    while args:
+        a = args.pop(0)
+        if a not in opts:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+        opts[a] = args.pop(0)
+    if opts["--mode"] not in ("thread", "process"):
+        raise SystemExit("--mode debe ser thread o process")
+    if use_queue and opts["--mode"] != "thread":
+        raise SystemExit("--queue requiere --mode thread (una cola por proceso)")
+
+    clerks = int(opts["--clerks"])
+    duration = float(opts["--duration"])
+    stock = int(opts["--stock"])
+    seed = int(opts["--seed"])
+
+    url = opts["--url"]
+    if url is None:
+        data_dir = Path("bench/data")
+        data_dir.mkdir(parents=True, exist_ok=True)
+        template = data_dir / f"loadtest_template_{opts['--seed-rows']}.db"
+        if not template.exists():
+            print(f"🏗️ Generando {template}…")
+            generate(template, rows=int(opts["--seed-rows"]), employees=500, n_items=80, seed=seed)
+        db_path = data_dir / "loadtest.db"
+        shutil.copyfile(template, db_path)
+        url = f"sqlite:///{db_path}"
+
+    engine = get_engine(url)
+    plan = {**prepare(engine, int(opts["--hot"]), stock), "queue": use_queue}
+    print(
+        f"🔥 {len(plan['hot'])} combinaciones calientes con stock {stock} | "
+        f"{clerks} almaceneros ({opts['--mode']}{', cola' if use_queue else ''}) durante {duration:g}s"
+    )
+
+    start_at = time.time() + 0.5
+    cfg = {
+        "seed": seed,
+        "in_ratio": float(opts["--in-ratio"]),
+        "think_ms": float(opts["--think-ms"]),
+        "start_at": start_at,
+        "end_at": start_at + duration,
+    }
+    pool_cls = ThreadPoolExecutor if opts["--mode"] == "thread" else ProcessPoolExecutor
+    with pool_cls(max_workers=clerks) as pool:
+        futures = [pool.submit(clerk, i, url, plan, cfg) for i in range(clerks)]
+        samples = [s for f in futures for s in f.result()]
+    elapsed = max(time.time() - start_at, duration)
+
+    kinds = summarize(samples, elapsed)
+    invariant = check_invariant(engine, plan, stock)
+    group = None
+    if use_queue:
+        wq = get_write_queue(engine.url.render_as_string(hide_password=False))
+        group = {"groups": wq.groups, "avg_group": round(wq.submissions / max(wq.groups, 1), 2)}
+    engine.dispose()
+
+    total_ok = sum(k["ok"] for k in kinds.values())
+    report = {
+        "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S"),
+        "backend": sqlalchemy.engine.make_url(url).get_backend_name(),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "sqlalchemy": sqlalchemy.__version__,
+        "config": {**{k.lstrip("-"): v for k, v in opts.items() if k != "--url"}, "queue": use_queue},
+        "duration_s": round(elapsed, 3),
+        "ok_per_s": round(total_ok / elapsed, 2),
+        "by_type": kinds,
+        "invariant": invariant,
+        "group_commit": group,
+    }
+
+    out = Path(opts["--out"])
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
+
+    print(f"\n⚡ Throughput: {report['ok_per_s']} movimientos/s")
+    for kind, k in kinds.items():
+        print(
+            f"   {kind:<3} | ok {k['ok']:>6} | sin stock {k['sin_stock']:>5} | dup {k['duplicado']:>4} | "
+            f"bloqueo {k['bloqueo']:>4} | error {k['error']:>4} | "
+            f"p50 {k['p50_ms']:.1f} p95 {k['p95_ms']:.1f} p99 {k['p99_ms']:.1f} ms"
+        )
+    if group:
+        print(f"   cola: {group['groups']} commits, {group['avg_group']} envíos por commit en promedio")
+    print(f"\n✅ Reporte: {out}")
+
+    if invariant["violations"]:
+        print(
+            f"\n❌ Stock negativo: {invariant['violations']} movimientos en "
+            f"{invariant['keys_negative']} combinaciones (mínimo {invariant['min_balance']})"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
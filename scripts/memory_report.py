@@ -0,0 +1,90 @@
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+import pyarrow as pa
+from sqlalchemy import text
+
+from app.db.connection import get_engine
+from app.db.frames import frame_bytes, memory_report, read_frame
+from app.db.queries import STOCK_BOARD_SQL
+from app.db.snapshot import MovementSnapshot, consumo, movements, to_frame
+from app.db.stock_live import load_board
+
+CATALOGS = {
+    "trabajadores": "SELECT employee_id, full_name, dni FROM employees ORDER BY full_name",
+    "epp": "SELECT item_id, name, has_size FROM items WHERE is_active=1 ORDER BY name",
+}
+
+
+def screens(conn, tbl, date_start: str, date_end: str, project: str) -> dict[str, tuple]:
+    """
+    Los resultados que una sesión guarda en memoria, como (antes, ahora): catálogos y tablero de stock
+    con pd.read_sql vs read_frame; kardex y consumo del snapshot Arrow como objetos Python vs como
+    los guardan Kardex (to_frame) y Reportes (la tabla Arrow).
+    """
+    rango = {"date_start": date_start, "date_end": date_end}
+    out = {name: (pd.read_sql(text(q), conn), read_frame(conn, q)) for name, q in CATALOGS.items()}
+    out["stock_actual"] = (
+        pd.read_sql(text(STOCK_BOARD_SQL), conn, params={"project": project}),
+        load_board(conn, project),
+    )
+    kardex = movements(tbl, rango)
+    out["kardex"] = (kardex.to_pandas(), to_frame(kardex))
+    consumo_tbl = consumo(tbl, rango)
+    out["consumo"] = (consumo_tbl.to_pandas(), consumo_tbl)
+    return out
+
+
+def _bytes(result) -> int:
+    return result.nbytes if isinstance(result, pa.Table) else frame_bytes(result)
+
+
+def main():
+    # uso:
+    # python -m scripts.memory_report [--desde 2025-01-01] [--hasta 2025-12-31] [--project OBRAS]
+    # Compara la memoria de los mismos resultados cargados como antes (pd.read_sql, objetos Python)
+    # y como los guardan hoy las páginas (read_frame, o el snapshot Arrow). Por defecto: el último año
+    # con movimientos. El snapshot en sí (SNAPSHOT_DIR) es uno por proceso, no por sesión.
+    opts = {"--desde": None, "--hasta": None, "--project": None}
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a not in opts:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+        opts[a] = args.pop(0)
+
+    engine = get_engine()
+    with engine.connect() as conn:
+        last = conn.execute(text("SELECT MAX(txn_local_date) FROM transactions")).scalar_one()
+        date_end = opts["--hasta"] or last or date.today().isoformat()
+        date_start = opts["--desde"] or (date.fromisoformat(date_end) - timedelta(days=365)).isoformat()
+        project = opts["--project"] or conn.execute(
+            text("SELECT code FROM projects WHERE is_active=1 ORDER BY name LIMIT 1")
+        ).scalar_one()
+
+        snapshot = MovementSnapshot(engine)
+        snapshot.refresh()
+        results = screens(conn, snapshot.table(), date_start, date_end, project)
+
+    antes = {name: a for name, (a, _) in results.items()}
+    ahora = {name: b for name, (_, b) in results.items()}
+    # memory_report describe DataFrames; el tamaño de la tabla Arrow de Reportes es su nbytes
+    rep = memory_report({n: to_frame(b) if isinstance(b, pa.Table) else b for n, b in ahora.items()})
+    rep = rep.rename(columns={"mb": "mb_arrow"})
+    rep["mb_arrow"] = [round(_bytes(b) / 1024**2, 3) for b in ahora.values()]
+    rep.insert(3, "mb_objeto", [round(frame_bytes(df) / 1024**2, 3) for df in antes.values()])
+    rep.insert(5, "fraccion", (rep["mb_arrow"] / rep["mb_objeto"]).round(2))
+
+    print(f"📅 {date_start} → {date_end} | proyecto {project}\n")
+    print(rep.to_string(index=False))
+    total_antes = sum(frame_bytes(df) for df in antes.values()) / 1024**2
+    total_ahora = sum(_bytes(b) for b in ahora.values()) / 1024**2
+    print(
+        f"\n✅ Por sesión: {total_antes:.2f} MB -> {total_ahora:.2f} MB "
+        f"({total_ahora / total_antes:.0%} de la memoria anterior)"
+    )
+
+
+if __name__ == "__main__":
+    main()
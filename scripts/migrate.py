@@ -0,0 +1,42 @@
+import sys
+
+from app.db.connection import get_engine
+from app.db.migrations import migrate, status
+
+
+def main():
+    # uso:
+    # python -m scripts.migrate [--status] [--target 004] [--batch-size 20000] [--pause-ms 50]
+    # Aplica en orden las migraciones pendientes de sql/migrations (ver app/db/migrations.py).
+    # Las migraciones de datos se pueden cortar (Ctrl+C) y retomar: avanzan por lotes.
+    opts = {"--target": None, "--batch-size": None, "--pause-ms": "0"}
+    show_status = False
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a == "--status":
+            show_status = True
+        elif a in opts:
+            opts[a] = args.pop(0)
+        else:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+
+    engine = get_engine()
+
+    if show_status:
+        for r in status(engine):
+            flag = " ⚠️ archivo modificado" if r.get("modificada") else ""
+            print(f"   {r['version']} | {r['kind']:<4} | {r['estado']:<22} | {r['name']}{flag}")
+        return
+
+    ran = migrate(
+        engine,
+        target=opts["--target"],
+        batch_size=int(opts["--batch-size"]) if opts["--batch-size"] else None,
+        pause_ms=int(opts["--pause-ms"]),
+    )
+    print(f"✅ Migraciones aplicadas: {len(ran)}" + (f" ({', '.join(ran)})" if ran else " (al día)"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,284 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import bindparam, text
+
+from app.db.connection import get_engine
+from app.db.dictionaries import SIZE_ID_SQL, normalize_size, register_sizes
+from app.db.migrations import migrate
+from app.db.movements import utc_now_str
+from app.db.offline import CENTRAL_BALANCE_REF, OFFLINE_PREFIX, SYNC_TABLE_SQL
+from app.db.valuation import update_valuation
+
+BATCH_SIZE = 500
+# Código de salida de --push: los envíos programados distinguen qué revisar
+EXIT_REJECTED = 1  # catálogos que faltan en la central: quedan pendientes, reintentar
+EXIT_CONFLICTS = 2  # salidas que dejaron el stock central en negativo: ajustar
+
+# Catálogos que el frente necesita para registrar (en orden de FK) y su clave primaria
+CATALOGS = {
+    "projects": ("project_id",),
+    "warehouses": ("warehouse_id",),
+    "locations": ("location_id",),
+    "employees": ("employee_id",),
+    "items": ("item_id",),
+    "sizes": ("size_id",),
+    "item_sizes": ("item_id", "size_id"),
+}
+
+CENTRAL_BALANCES_SQL = """
+SELECT project_id, location_id, item_id, size_id, SUM(qty) AS qty
+FROM transactions
+GROUP BY project_id, location_id, item_id, size_id
+HAVING SUM(qty) <> 0
+"""
+
+INSERT_BALANCE_SQL = f"""
+INSERT INTO transactions (
+    txn_datetime, txn_type, project_id, location_id, item_id, qty, size, size_id,
+    employee_id, request_number, reference, notes, created_by
+) VALUES (
+    :dt, 'OPENING', :project_id, :location_id, :item_id, :qty,
+    (SELECT code FROM sizes WHERE size_id = :size_id), :size_id,
+    NULL, NULL, '{CENTRAL_BALANCE_REF}', 'Saldo de la BD central al preparar el frente', 'system'
+)
+"""
+
+PENDING_SQL = f"""
+SELECT t.txn_datetime, t.txn_type, t.project_id, t.location_id, t.item_id, t.qty, t.size,
+       t.employee_id, t.request_number, t.reference, t.notes, t.created_by, t.source_key, t.unit_cost
+FROM transactions t
+LEFT JOIN offline_sync s ON s.source_key = t.source_key
+WHERE t.source_key LIKE '{OFFLINE_PREFIX}%' AND s.source_key IS NULL
+ORDER BY t.transaction_id
+"""
+
+# Reintento idempotente: lo que ya llegó en un envío anterior choca con source_key y se omite
+PUSH_SQL = f"""
+INSERT INTO transactions (
+    txn_datetime, txn_type, project_id, location_id, item_id, qty, size, size_id,
+    employee_id, request_number, reference, notes, created_by, source_key, unit_cost
+) VALUES (
+    :txn_datetime, :txn_type, :project_id, :location_id, :item_id, :qty, :size, {SIZE_ID_SQL},
+    :employee_id, :request_number, :reference, :notes, :created_by, :source_key, :unit_cost
+)
+ON CONFLICT(source_key) DO NOTHING
+"""
+
+PUSHED_IDS_SQL = text(
+    "SELECT source_key, transaction_id, project_id, item_id, size_id FROM transactions "
+    "WHERE source_key IN :keys"
+).bindparams(bindparam("keys", expanding=True))
+
+# Conflicto: saldo del proyecto que quedó negativo en la central (otro almacén entregó lo mismo)
+NEGATIVE_SQL = text(
+    """
+    SELECT project_id, item_id, size_id, SUM(qty) AS stock
+    FROM transactions
+    WHERE project_id IN :pids AND item_id IN :iids
+    GROUP BY project_id, item_id, size_id
+    HAVING SUM(qty) < 0
+    """
+).bindparams(bindparam("pids", expanding=True), bindparam("iids", expanding=True))
+
+MARK_SYNCED_SQL = """
+INSERT INTO offline_sync (source_key, central_id, status, detail, synced_at)
+VALUES (:source_key, :central_id, :status, :detail, :synced_at)
+ON CONFLICT(source_key) DO NOTHING
+"""
+
+
+def local_engine(path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    return get_engine(f"sqlite:///{path}")
+
+
+def upsert_sql(table: str, cols: list[str], pk: tuple[str, ...]) -> str:
+    updates = [c for c in cols if c not in pk]
+    action = (
+        "DO UPDATE SET " + ", ".join(f"{c} = excluded.{c}" for c in updates) if updates else "DO NOTHING"
+    )
+    return (
+        f"INSERT INTO {table} ({', '.join(cols)}) VALUES ({', '.join(':' + c for c in cols)}) "
+        f"ON CONFLICT ({', '.join(pk)}) {action}"
+    )
+
+
+def pull(central, local) -> None:
+    """Prepara o actualiza el archivo del frente: catálogos y saldos actuales de la central."""
+    migrate(local, log=lambda *_: None)
+    with central.connect() as conn:
+        catalogs = {t: [dict(r) for r in conn.execute(text(f"SELECT * FROM {t}")).mappings()] for t in CATALOGS}
+        balances = [dict(r) for r in conn.execute(text(CENTRAL_BALANCES_SQL)).mappings()]
+
+    with local.begin() as conn:
+        conn.execute(text(SYNC_TABLE_SQL))
+        for table, pk in CATALOGS.items():
+            rows = catalogs[table]
+            if rows:
+                conn.execute(text(upsert_sql(table, list(rows[0]), pk)), rows)
+        # Lo ya sincronizado está en los saldos nuevos: se quita junto con los saldos anteriores.
+        # Lo pendiente se queda y sigue sumando sobre el saldo nuevo.
+        synced = conn.execute(
+            text("DELETE FROM transactions WHERE source_key IN (SELECT source_key FROM offline_sync)")
+        ).rowcount
+        conn.execute(
+            text("DELETE FROM transactions WHERE txn_type = 'OPENING' AND reference = :ref"),
+            {"ref": CENTRAL_BALANCE_REF},
+        )
+        if balances:
+            now_utc = utc_now_str()
+            conn.execute(text(INSERT_BALANCE_SQL), [{**b, "dt": now_utc} for b in balances])
+        pending = conn.execute(
+            text(f"SELECT COUNT(*) FROM ({PENDING_SQL}) p")
+        ).scalar_one()
+
+    print(
+        f"✅ Frente preparado: {sum(len(r) for r in catalogs.values()):,} filas de catálogo | "
+        f"{len(balances):,} saldos | {synced:,} movimientos ya sincronizados retirados | "
+        f"{pending:,} pendientes de enviar"
+    )
+
+
+def push_batch(central, local, batch: pd.DataFrame) -> pd.DataFrame:
+    """Un lote: inserta en la central (idempotente), detecta saldos negativos y lo marca en el frente."""
+    rows = batch.to_dict("records")
+    keys = [r["source_key"] for r in rows]
+    with central.begin() as conn:
+        update_valuation(conn)
+        register_sizes(conn, [(r["item_id"], r["size"]) for r in rows])
+        conn.execute(text(PUSH_SQL), rows)
+        # Las salidas del frente toman el costo promedio de la central al llegar
+        update_valuation(conn)
+        pushed = pd.DataFrame(
+            conn.execute(PUSHED_IDS_SQL, {"keys": keys}).mappings().all(),
+            columns=["source_key", "transaction_id", "project_id", "item_id", "size_id"],
+        )
+        negative = pd.DataFrame(
+            conn.execute(
+                NEGATIVE_SQL,
+                {"pids": sorted(set(pushed["project_id"])), "iids": sorted(set(pushed["item_id"]))},
+            ).mappings().all(),
+            columns=["project_id", "item_id", "size_id", "stock"],
+        )
+
+    # Claves con talla nula comparables en el merge
+    for df in (pushed, negative):
+        df["size_id"] = df["size_id"].astype("Int64")
+    res = pushed.merge(batch[["source_key", "qty"]], on="source_key").merge(
+        negative, on=["project_id", "item_id", "size_id"], how="left"
+    )
+    # Sin saldos negativos la columna queda en object: entero con nulos, sin downcasting en fillna
+    res["stock"] = res["stock"].astype("Int64")
+    # Solo es conflicto de este movimiento si es una salida sobre un saldo que quedó negativo
+    conflict = res["stock"].notna() & (res["qty"] < 0)
+    res["status"] = conflict.map({True: "CONFLICTO", False: "OK"})
+    res["detail"] = [
+        f"stock central {int(s)}" if c else None for c, s in zip(conflict, res["stock"].fillna(0))
+    ]
+
+    synced_at = utc_now_str()
+    with local.begin() as conn:
+        conn.execute(
+            text(MARK_SYNCED_SQL),
+            [
+                {
+                    "source_key": r.source_key,
+                    "central_id": int(r.transaction_id),
+                    "status": r.status,
+                    "detail": r.detail,
+                    "synced_at": synced_at,
+                }
+                for r in res.itertuples(index=False)
+            ],
+        )
+    return res
+
+
+def push(central, local, batch_size: int) -> int:
+    """
+    Envía los movimientos pendientes del frente por lotes. Devuelve el código de salida:
+    0, EXIT_REJECTED si quedaron pendientes por catálogo o EXIT_CONFLICTS si hubo conflictos.
+    """
+    with local.begin() as conn:
+        conn.execute(text(SYNC_TABLE_SQL))
+        pending = pd.read_sql(text(PENDING_SQL), conn)
+    if pending.empty:
+        print("Nada pendiente de enviar.")
+        return 0
+    pending["size"] = pending["size"].map(normalize_size)
+    pending = pending.astype(object).where(pending.notna(), None)
+
+    # Catálogo central: lo que no existe allá no se envía (queda pendiente para el siguiente intento)
+    with central.connect() as conn:
+        known = {
+            col: {r[0] for r in conn.execute(text(f"SELECT {col} FROM {table}"))}
+            for col, table in (
+                ("project_id", "projects"),
+                ("location_id", "locations"),
+                ("item_id", "items"),
+                ("employee_id", "employees"),
+            )
+        }
+    ok = pd.Series(True, index=pending.index)
+    for col, ids in known.items():
+        ok &= pending[col].isna() | pending[col].isin(ids)
+    rejected, pending = pending[~ok], pending[ok]
+
+    results = [
+        push_batch(central, local, pending.iloc[i : i + batch_size])
+        for i in range(0, len(pending), batch_size)
+    ]
+    res = pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=["status"])
+    conflicts = res[res["status"] == "CONFLICTO"]
+
+    print(
+        f"✅ Enviados {len(res):,} movimientos en {len(results)} lotes | "
+        f"conflictos={len(conflicts):,} | rechazados={len(rejected):,}"
+    )
+    if not conflicts.empty:
+        print("⚠️ Salidas que dejaron el stock central en negativo (revisar y ajustar):")
+        for r in conflicts.head(20).itertuples(index=False):
+            print(f"   #{r.transaction_id} | proyecto {r.project_id} | EPP {r.item_id} | talla {r.size_id} | {r.detail}")
+    if not rejected.empty:
+        print("❌ Con catálogos que no existen en la central (actualiza catálogos y reintenta):")
+        for r in rejected.head(20).itertuples(index=False):
+            print(f"   {r.source_key} | {r.txn_type} | EPP {r.item_id} | trabajador {r.employee_id}")
+    if not rejected.empty:
+        return EXIT_REJECTED
+    return EXIT_CONFLICTS if not conflicts.empty else 0
+
+
+def main():
+    # uso:
+    # python -m scripts.offline_sync --pull data/offline/frente1.db   (antes de salir al frente)
+    # python -m scripts.offline_sync --push data/offline/frente1.db [--batch 500]
+    # En el frente: DATABASE_URL=sqlite:///data/offline/frente1.db OFFLINE_DEVICE=frente1 streamlit run app/Home.py
+    # La BD central es la de DATABASE_URL. --push se puede repetir sin duplicar.
+    # --push sale con 1 si quedaron movimientos sin enviar (catálogos) y con 2 si hubo conflictos.
+    opts = {"--pull": None, "--push": None, "--batch": str(BATCH_SIZE)}
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a not in opts:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+        opts[a] = args.pop(0)
+    if bool(opts["--pull"]) == bool(opts["--push"]):
+        raise SystemExit("Indica --pull ARCHIVO o --push ARCHIVO")
+
+    path = Path(opts["--pull"] or opts["--push"])
+    if opts["--push"] and not path.exists():
+        raise SystemExit(f"No existe: {path}")
+    central = get_engine()
+    migrate(central, log=lambda *_: None)
+    local = local_engine(path)
+
+    if opts["--pull"]:
+        pull(central, local)
+    else:
+        raise SystemExit(push(central, local, int(opts["--batch"])))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,170 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+
+from app.db.archive import transactions_source
+from app.db.connection import get_engine
+from app.db.dictionaries import TXN_TYPE_IDS
+from app.db.frames import read_frame
+from app.db.localtime import utc_bounds
+from scripts.excel_reader import norm_key, read_sheet
+
+SHEET = "BASE DE DATOS"
+
+# Consumo OUT por proyecto × EPP × mes (mes en hora local de Lima: prefijo de txn_local_date).
+CONSUMO_MES_SQL = f"""
+SELECT
+  p.code AS proyecto,
+  i.name AS epp,
+  substr(t.txn_local_date, 1, 7) AS mes,
+  SUM(-t.qty) AS und_bd
+FROM {{source}} t
+JOIN projects p ON p.project_id = t.project_id
+JOIN items i ON i.item_id = t.item_id
+WHERE t.type_id = {TXN_TYPE_IDS['OUT']}
+  AND t.txn_local_date >= :date_start
+  AND t.txn_local_date <= :date_end
+GROUP BY p.code, i.name, mes
+"""
+
+
+def read_informe(path: Path, project_code: str) -> pd.DataFrame:
+    """Hoja BASE DE DATOS del informe estadístico -> proyecto, epp, mes, und_excel (una fila por entrega)."""
+    data = read_sheet(
+        path,
+        SHEET,
+        columns={"fecha": "FECHA", "epp": "EPP", "cantidad": "CANTIDAD"},
+        header_tokens=("NOMBRE Y APELLIDOS",),
+    )
+    if set(data.columns) != {"fecha", "epp", "cantidad"}:
+        raise RuntimeError(
+            f"No encontré columnas FECHA/EPP/CANTIDAD en {path.name} ({SHEET}). Columnas: {list(data.columns)}"
+        )
+
+    out = pd.DataFrame()
+    out["fecha"] = pd.to_datetime(data["fecha"], errors="coerce")
+    out["epp"] = data["epp"].str.strip()
+    out["und_excel"] = pd.to_numeric(data["cantidad"], errors="coerce")
+    out = out.dropna(subset=["fecha", "epp", "und_excel"])
+    out["proyecto"] = project_code
+    out["mes"] = out["fecha"].dt.strftime("%Y-%m")
+    return out
+
+
+def query_consumo_mes(engine, date_start, date_end) -> pd.DataFrame:
+    with engine.connect() as conn:
+        sql = CONSUMO_MES_SQL.format(source=transactions_source(conn, *utc_bounds(date_start, date_end)))
+        return read_frame(
+            conn, sql, {"date_start": date_start.isoformat(), "date_end": date_end.isoformat()}
+        )
+
+
+def load_aliases(path: Path | None) -> dict[str, str]:
+    """CSV con columnas nombre_excel,nombre_bd para EPP que se escriben distinto en el informe."""
+    if path is None:
+        return {}
+    df = pd.read_csv(path, dtype=str)
+    return {norm_key(a): norm_key(b) for a, b in zip(df["nombre_excel"], df["nombre_bd"])}
+
+
+def reconcile(
+    db: pd.DataFrame,
+    excel: pd.DataFrame,
+    tol_abs: float = 0,
+    tol_pct: float = 0,
+    aliases: dict[str, str] | None = None,
+) -> pd.DataFrame:
+    """
+    Une BD vs Excel por proyecto × EPP (nombre normalizado) × mes y clasifica cada fila:
+    OK | DIFERENCIA | SOLO_BD | SOLO_EXCEL. Una diferencia es aceptable si
+    |dif| <= max(tol_abs, tol_pct% del valor del Excel).
+    """
+    keys = ["proyecto", "epp_key", "mes"]
+
+    db = db.assign(epp_key=db["epp"].map(norm_key))
+    xl_key = excel["epp"].map(norm_key)
+    excel = excel.assign(epp_key=xl_key.replace(aliases or {}))
+
+    db_g = db.groupby(keys, as_index=False, observed=True).agg(epp_bd=("epp", "first"), und_bd=("und_bd", "sum"))
+    xl_g = excel.groupby(keys, as_index=False).agg(
+        epp_excel=("epp", "first"), und_excel=("und_excel", "sum")
+    )
+
+    rep = db_g.merge(xl_g, on=keys, how="outer", indicator=True)
+    rep["und_bd"] = rep["und_bd"].fillna(0)
+    rep["und_excel"] = rep["und_excel"].fillna(0)
+    rep["diferencia"] = rep["und_bd"] - rep["und_excel"]
+
+    tol = (rep["und_excel"].abs() * tol_pct / 100).clip(lower=tol_abs)
+    rep["estado"] = "OK"
+    rep.loc[rep["diferencia"].abs() > tol, "estado"] = "DIFERENCIA"
+    rep.loc[rep["_merge"] == "left_only", "estado"] = "SOLO_BD"
+    rep.loc[rep["_merge"] == "right_only", "estado"] = "SOLO_EXCEL"
+
+    rep["epp"] = rep["epp_bd"].fillna(rep["epp_excel"])
+    rep = rep[
+        ["proyecto", "mes", "epp", "epp_bd", "epp_excel", "und_bd", "und_excel", "diferencia", "estado"]
+    ]
+    return rep.sort_values(["proyecto", "mes", "epp"]).reset_index(drop=True)
+
+
+def main():
+    # uso:
+    # python -m scripts.reconcile_consumo OBRAS="formatos_excel/INFORMES ... (OBRAS CIVILES DIVERSAS).xlsm" \
+    #     [RELAV=otro.xlsm] [--desde 2025-01-01] [--hasta 2025-12-31] \
+    #     [--tol-abs 0] [--tol-pct 0] [--alias alias_epp.csv] [--out reconciliacion_consumo.xlsx]
+    opts = {"--desde": None, "--hasta": None, "--tol-abs": "0", "--tol-pct": "0", "--alias": None}
+    opts["--out"] = "reconciliacion_consumo.csv"
+    sources = []
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a in opts:
+            opts[a] = args.pop(0)
+        elif "=" in a:
+            code, path = a.split("=", 1)
+            sources.append((code.strip().upper(), Path(path).expanduser()))
+        else:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+
+    if not sources:
+        raise SystemExit("Indica al menos un informe: PROYECTO=ruta.xlsm")
+    for _, path in sources:
+        if not path.exists():
+            raise FileNotFoundError(f"No existe: {path}")
+
+    excel = pd.concat([read_informe(path, code) for code, path in sources], ignore_index=True)
+
+    # Periodo: por defecto el que cubren los informes
+    date_start = pd.Timestamp(opts["--desde"] or excel["fecha"].min()).date()
+    date_end = pd.Timestamp(opts["--hasta"] or excel["fecha"].max()).date()
+    excel = excel[(excel["fecha"].dt.date >= date_start) & (excel["fecha"].dt.date <= date_end)]
+
+    db = query_consumo_mes(get_engine(), date_start, date_end)
+    # Solo los proyectos de los informes recibidos
+    db = db[db["proyecto"].isin([code for code, _ in sources])]
+
+    aliases = load_aliases(Path(opts["--alias"]) if opts["--alias"] else None)
+    rep = reconcile(db, excel, float(opts["--tol-abs"]), float(opts["--tol-pct"]), aliases)
+
+    out = Path(opts["--out"])
+    if out.suffix.lower() == ".xlsx":
+        rep.to_excel(out, index=False, sheet_name="reconciliacion")
+    else:
+        rep.to_csv(out, index=False, encoding="utf-8-sig")
+
+    print(f"📅 Periodo: {date_start} → {date_end}")
+    print(f"📄 Filas informe: {len(excel)} | grupos BD: {len(db)}")
+    print("\n🔎 Resultado por estado:")
+    print(rep["estado"].value_counts().to_string())
+    diffs = rep[rep["estado"] != "OK"]
+    if not diffs.empty:
+        print("\n⚠️ Mayores diferencias:")
+        top = diffs.reindex(diffs["diferencia"].abs().sort_values(ascending=False).index)
+        print(top.head(15).to_string(index=False))
+    print(f"\n✅ Reporte: {out}")
+
+
+if __name__ == "__main__":
+    main()
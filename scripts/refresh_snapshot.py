@@ -0,0 +1,32 @@
+import sys
+import time
+
+from app.db.connection import get_engine
+from app.db.snapshot import SNAPSHOT_DIR, MovementSnapshot
+
+
+def main():
+    # uso:
+    # python -m scripts.refresh_snapshot [--full]
+    # Agrega al snapshot Arrow de movimientos (SNAPSHOT_DIR) lo nuevo desde el último transaction_id.
+    # --full lo reconstruye desde cero: tras corregir nombres en catálogos o para la primera carga
+    # (así la app no la hace al abrir el primer tablero). Se puede correr con la app en marcha.
+    args = sys.argv[1:]
+    full = "--full" in args
+    unknown = [a for a in args if a != "--full"]
+    if unknown:
+        raise SystemExit(f"Argumento no reconocido: {unknown[0]}")
+
+    snap = MovementSnapshot(get_engine())
+    t0 = time.perf_counter()
+    rows = snap.refresh(full=full)
+    tbl = snap.table()
+    size_mb = sum(p.stat().st_size for p in snap.segments) / 1024**2
+    print(
+        f"✅ {SNAPSHOT_DIR}: +{rows:,} movimientos | total {tbl.num_rows:,} | "
+        f"{len(snap.segments)} segmento(s) | {size_mb:.1f} MB | {time.perf_counter() - t0:.1f}s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import sys
+from pathlib import Path
+
+import pandas as pd
+from sqlalchemy import text
+
+from app.db.connection import get_engine
+from app.db.dictionaries import normalize_size
+from app.db.localtime import LOCAL_TZ
+from app.db.migrations import migrate
+from app.db.valuation import backfill, consumption_cost, is_initialized, stock_value
+from scripts.excel_reader import norm_key
+
+
+def load_prices(conn, path: Path) -> pd.DataFrame:
+    """
+    Lista de precios CSV: EPP (nombre) o ITEM_ID, TALLA opcional (vacía = todas), COSTO.
+    Devuelve item_id, size_key, cost (lo que espera valuation.apply_prices).
+    """
+    raw = pd.read_csv(path, dtype=str).rename(columns=lambda c: norm_key(c))
+    if "COSTO" not in raw.columns or not {"EPP", "ITEM_ID"} & set(raw.columns):
+        raise SystemExit("La lista de precios necesita las columnas EPP (o ITEM_ID) y COSTO")
+    items = pd.read_sql(text("SELECT item_id, name FROM items"), conn)
+    sizes = pd.read_sql(text("SELECT size_id, code FROM sizes"), conn)
+
+    if "ITEM_ID" in raw.columns:
+        item_id = pd.to_numeric(raw["ITEM_ID"], errors="coerce")
+    else:
+        by_name = dict(zip(items["name"].map(norm_key), items["item_id"]))
+        item_id = raw["EPP"].map(norm_key).map(by_name)
+    talla = raw["TALLA"].map(normalize_size) if "TALLA" in raw.columns else pd.Series(None, index=raw.index)
+    size_key = talla.map(dict(zip(sizes["code"], sizes["size_id"])))
+    cost = pd.to_numeric(raw["COSTO"].str.replace(",", ".", regex=False), errors="coerce")
+
+    unknown = item_id.isna() | cost.isna() | (talla.notna() & size_key.isna())
+    if unknown.any():
+        print(f"⚠️ {int(unknown.sum())} filas de la lista sin EPP/talla conocidos o sin costo (se omiten):")
+        print(raw[unknown].head(20).to_string(index=False))
+    return pd.DataFrame(
+        {"item_id": item_id, "size_key": size_key.fillna(0), "cost": cost}
+    )[~unknown].astype({"item_id": int, "size_key": int})
+
+
+def main():
+    # uso:
+    # python -m scripts.valuation --backfill [--prices precios.csv]   (una vez; luego es incremental)
+    # python -m scripts.valuation --report [--month 2026-03] [--project OBRAS] [--out valorizacion.csv]
+    # --backfill se puede repetir (p. ej. con una lista de precios corregida): recalcula todo desde cero.
+    # Con años archivados, repetir también --prices: los archivos son de solo lectura y sus IN no la guardan.
+    opts = {"--prices": None, "--month": None, "--project": None, "--out": None}
+    flags = {"--backfill": False, "--report": False}
+    args = sys.argv[1:]
+    while args:
+        a = args.pop(0)
+        if a in flags:
+            flags[a] = True
+        elif a in opts:
+            opts[a] = args.pop(0)
+        else:
+            raise SystemExit(f"Argumento no reconocido: {a}")
+    if flags["--backfill"] == flags["--report"]:
+        raise SystemExit("Indica --backfill o --report")
+
+    engine = get_engine()
+    migrate(engine, log=lambda *_: None)
+
+    if flags["--backfill"]:
+        with engine.begin() as conn:
+            prices = load_prices(conn, Path(opts["--prices"])) if opts["--prices"] else None
+            res = backfill(conn, prices)
+        print(
+            f"✅ Valorización inicializada: {res['movimientos']:,} movimientos | "
+            f"{res['ingresos_con_costo']:,} ingresos con costo ({res['costos_de_lista']:,} de lista) | "
+            f"{res['salidas_sin_costo']:,} salidas sin costo | {res['filas_actualizadas']:,} filas actualizadas | "
+            f"{res['claves']:,} saldos | valor S/ {res['valor_total']:,.2f}"
+        )
+        return
+
+    month = opts["--month"] or pd.Timestamp.now(tz=LOCAL_TZ).strftime("%Y-%m")
+    start = pd.Period(month, freq="M")
+    with engine.connect() as conn:
+        if not is_initialized(conn):
+            raise SystemExit("Valorización sin inicializar: python -m scripts.valuation --backfill")
+        cost = consumption_cost(conn, start.start_time.date(), start.end_time.date(), opts["--project"])
+        value = stock_value(conn, opts["--project"])
+
+    print(f"Costo del consumo {month} (costo promedio ponderado):")
+    if cost.empty:
+        print("   sin salidas en el mes")
+    for r in cost.itertuples(index=False):
+        sin_costo = f" | {int(r.unidades_sin_costo):,} und sin costo" if r.unidades_sin_costo else ""
+        costo = 0 if pd.isna(r.costo) else r.costo
+        print(f"   {r.proyecto:<12} {r.tipo:<12} {int(r.unidades):>8,} und  S/ {costo:>14,.2f}{sin_costo}")
+    print("Valor del stock actual:")
+    by_project = value.groupby("proyecto", observed=True)["valor"].sum()
+    for proyecto, total in by_project.items():
+        print(f"   {proyecto:<12} S/ {total:>14,.2f}")
+    print(f"   {'TOTAL':<12} S/ {by_project.sum():>14,.2f}")
+
+    if opts["--out"]:
+        out = Path(opts["--out"])
+        value.to_csv(out, index=False, encoding="utf-8-sig")
+        print(f"📄 Detalle del valor por EPP y talla: {out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,7 @@
+-- 003_txn_source_key.sql
+PRAGMA foreign_keys = ON;
+
+-- Huella de la fila de origen (importaciones masivas): permite reimportar sin duplicar
+ALTER TABLE transactions ADD COLUMN source_key TEXT;
+
+CREATE UNIQUE INDEX IF NOT EXISTS ux_txn_source_key ON transactions(source_key);
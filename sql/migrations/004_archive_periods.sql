@@ -0,0 +1,12 @@
+-- 004_archive_periods.sql
+-- Años cerrados movidos de transactions a archivos SQLite de solo lectura (ver app/db/archive.py)
+CREATE TABLE IF NOT EXISTS archive_periods (
+  year         INTEGER PRIMARY KEY,
+  file_name    TEXT NOT NULL,    -- dentro de ARCHIVE_DIR
+  start_utc    TEXT NOT NULL,    -- [start_utc, end_utc): año local (Lima) en UTC
+  end_utc      TEXT NOT NULL,
+  rows_count   INTEGER NOT NULL,
+  qty_sum      INTEGER NOT NULL,
+  id_sum       INTEGER NOT NULL,
+  archived_at  TEXT NOT NULL
+);
@@ -0,0 +1,18 @@
+-- 005_txn_local_date.postgresql.sql
+-- Igual que la versión SQLite. PostgreSQL solo tiene columnas generadas STORED y exige funciones
+-- IMMUTABLE: el formato de txn_datetime es ISO fijo, así que la conversión no depende de la sesión.
+CREATE OR REPLACE FUNCTION txn_epoch_of(ts text) RETURNS bigint
+  LANGUAGE sql IMMUTABLE AS $$ SELECT CAST(extract(epoch FROM CAST(ts AS timestamp)) AS bigint) $$;
+
+CREATE OR REPLACE FUNCTION txn_local_date_of(ts text) RETURNS text
+  LANGUAGE sql IMMUTABLE AS $$ SELECT to_char(CAST(ts AS timestamp) - INTERVAL '5 hours', 'YYYY-MM-DD') $$;
+
+ALTER TABLE transactions ADD COLUMN txn_epoch BIGINT
+  GENERATED ALWAYS AS (txn_epoch_of(txn_datetime)) STORED;
+
+ALTER TABLE transactions ADD COLUMN txn_local_date TEXT
+  GENERATED ALWAYS AS (txn_local_date_of(txn_datetime)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_txn_epoch ON transactions(txn_epoch);
+CREATE INDEX IF NOT EXISTS idx_txn_type_local_date ON transactions(txn_type, txn_local_date);
+CREATE INDEX IF NOT EXISTS idx_txn_project_local_date ON transactions(project_id, txn_local_date);
@@ -0,0 +1,13 @@
+-- 005_txn_local_date.sqlite.sql
+-- Fecha local (Lima, UTC-5 fijo) y epoch de txn_datetime, calculadas por la BD e indexadas:
+-- los filtros por día/mes comparan texto contra el índice en vez de convertir zonas horarias.
+-- Columnas generadas VIRTUAL: no ocupan espacio en la tabla (sí en el índice) ni requieren backfill.
+ALTER TABLE transactions ADD COLUMN txn_epoch INTEGER
+  GENERATED ALWAYS AS (CAST(strftime('%s', txn_datetime) AS INTEGER)) VIRTUAL;
+
+ALTER TABLE transactions ADD COLUMN txn_local_date TEXT
+  GENERATED ALWAYS AS (date(txn_datetime, '-5 hours')) VIRTUAL;
+
+CREATE INDEX IF NOT EXISTS idx_txn_epoch ON transactions(txn_epoch);
+CREATE INDEX IF NOT EXISTS idx_txn_type_local_date ON transactions(txn_type, txn_local_date);
+CREATE INDEX IF NOT EXISTS idx_txn_project_local_date ON transactions(project_id, txn_local_date);
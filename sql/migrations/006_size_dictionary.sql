@@ -0,0 +1,40 @@
+-- 006_size_dictionary.sql
+-- Diccionarios de tallas y de tipos de movimiento (ver app/db/dictionaries.py)
+CREATE TABLE IF NOT EXISTS sizes (
+  size_id  INTEGER PRIMARY KEY,
+  code     TEXT UNIQUE NOT NULL   -- talla canónica: 'M', 'XL', '39'
+);
+
+-- Tallas de cada EPP (las que ya tienen movimientos o se registraron al escribir)
+CREATE TABLE IF NOT EXISTS item_sizes (
+  item_id  INTEGER NOT NULL,
+  size_id  INTEGER NOT NULL,
+  PRIMARY KEY (item_id, size_id),
+  FOREIGN KEY (item_id) REFERENCES items(item_id),
+  FOREIGN KEY (size_id) REFERENCES sizes(size_id)
+);
+
+CREATE TABLE IF NOT EXISTS txn_types (
+  type_id  INTEGER PRIMARY KEY,
+  code     TEXT UNIQUE NOT NULL,
+  label    TEXT NOT NULL
+);
+
+INSERT INTO txn_types (type_id, code, label) VALUES
+  (1, 'IN', 'Ingreso'),
+  (2, 'OUT', 'Entrega'),
+  (3, 'RETURN', 'Devolución'),
+  (4, 'ADJUST', 'Ajuste'),
+  (5, 'TRANSFER_IN', 'Transferencia (entrada)'),
+  (6, 'TRANSFER_OUT', 'Transferencia (salida)'),
+  (7, 'RETURN_STOCK', 'Devolución a stock'),
+  (8, 'RETURN_SEGR', 'Devolución a segregación'),
+  (9, 'BAJA', 'Baja'),
+  (10, 'OPENING', 'Saldo inicial')
+ON CONFLICT (type_id) DO NOTHING;
+
+-- Se completa por lotes en 008 (filas existentes) y al escribir (filas nuevas)
+ALTER TABLE transactions ADD COLUMN size_id INTEGER REFERENCES sizes(size_id);
+
+-- Stock por proyecto × EPP × talla sale solo del índice (incluye qty)
+CREATE INDEX IF NOT EXISTS idx_txn_stock ON transactions(project_id, item_id, size_id, qty);
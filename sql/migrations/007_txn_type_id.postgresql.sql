@@ -0,0 +1,21 @@
+-- 007_txn_type_id.postgresql.sql
+-- Código entero del tipo de movimiento (mismos valores que txn_types / TXN_TYPE_IDS).
+-- PostgreSQL solo tiene columnas generadas STORED (reescribe la tabla una vez).
+ALTER TABLE transactions ADD COLUMN type_id INTEGER
+  GENERATED ALWAYS AS (
+    CASE txn_type
+      WHEN 'IN' THEN 1
+      WHEN 'OUT' THEN 2
+      WHEN 'RETURN' THEN 3
+      WHEN 'ADJUST' THEN 4
+      WHEN 'TRANSFER_IN' THEN 5
+      WHEN 'TRANSFER_OUT' THEN 6
+      WHEN 'RETURN_STOCK' THEN 7
+      WHEN 'RETURN_SEGR' THEN 8
+      WHEN 'BAJA' THEN 9
+      WHEN 'OPENING' THEN 10
+    END
+  ) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_txn_typeid_local_date ON transactions(type_id, txn_local_date);
+DROP INDEX IF EXISTS idx_txn_type_local_date;
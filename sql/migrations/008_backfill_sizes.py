@@ -0,0 +1,17 @@
+# 008_backfill_sizes.py
+# Normaliza las tallas existentes (T/39, t/39 , 39 -> 39) y completa size_id, por lotes de ids.
+from sqlalchemy import text
+
+from app.db.dictionaries import FILL_ITEM_SIZES_SQL, backfill_sizes
+
+TABLE = "transactions"
+KEY = "transaction_id"
+BATCH_SIZE = 20_000
+
+
+def run_batch(conn, lo: int, hi: int) -> int:
+    return backfill_sizes(conn, lo, hi)
+
+
+def finalize(conn) -> None:
+    conn.execute(text(FILL_ITEM_SIZES_SQL))
@@ -0,0 +1,35 @@
+-- 009_stock_counts.sql
+-- Conteo físico por proyecto × ubicación (ver app/db/counts.py)
+CREATE TABLE IF NOT EXISTS stock_counts (
+  count_id       INTEGER PRIMARY KEY,
+  reference      TEXT UNIQUE NOT NULL,   -- va en transactions.reference de cada ADJUST
+  project_id     INTEGER NOT NULL,
+  location_id    INTEGER NOT NULL,
+  frozen_txn_id  INTEGER NOT NULL,       -- saldo en libros = movimientos hasta este id
+  frozen_at      TEXT NOT NULL,          -- UTC
+  status         TEXT NOT NULL DEFAULT 'ABIERTO',  -- ABIERTO / CONTABILIZADO / ANULADO
+  created_by     TEXT NOT NULL,
+  posted_at      TEXT,
+  adjust_count   INTEGER,
+  FOREIGN KEY (project_id) REFERENCES projects(project_id),
+  FOREIGN KEY (location_id) REFERENCES locations(location_id)
+);
+
+-- Un solo conteo abierto por ubicación
+CREATE UNIQUE INDEX IF NOT EXISTS ux_stock_counts_open
+  ON stock_counts(project_id, location_id) WHERE status = 'ABIERTO';
+
+-- Saldo congelado al abrir; counted_qty se llena al contabilizar (NULL = no contado)
+CREATE TABLE IF NOT EXISTS stock_count_lines (
+  line_id      INTEGER PRIMARY KEY,
+  count_id     INTEGER NOT NULL,
+  item_id      INTEGER NOT NULL,
+  size_id      INTEGER,
+  book_qty     INTEGER NOT NULL,
+  counted_qty  INTEGER,
+  FOREIGN KEY (count_id) REFERENCES stock_counts(count_id),
+  FOREIGN KEY (item_id) REFERENCES items(item_id),
+  FOREIGN KEY (size_id) REFERENCES sizes(size_id)
+);
+
+CREATE INDEX IF NOT EXISTS idx_stock_count_lines_count ON stock_count_lines(count_id);
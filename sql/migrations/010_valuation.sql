@@ -0,0 +1,27 @@
+-- 010_valuation.sql
+-- Valorización a costo promedio ponderado (ver app/db/valuation.py)
+
+-- IN: costo de compra capturado al ingresar. Resto: costo promedio aplicado al registrarse.
+ALTER TABLE transactions ADD COLUMN unit_cost DOUBLE PRECISION;
+
+-- Saldo valorizado por proyecto × EPP × talla (size_key = COALESCE(size_id, 0): sin talla = 0)
+CREATE TABLE IF NOT EXISTS item_costs (
+  project_id   INTEGER NOT NULL,
+  item_id      INTEGER NOT NULL,
+  size_key     INTEGER NOT NULL DEFAULT 0,
+  qty          INTEGER NOT NULL,
+  avg_cost     DOUBLE PRECISION,          -- NULL = aún sin ningún ingreso con costo
+  value        DOUBLE PRECISION NOT NULL DEFAULT 0,
+  last_txn_id  INTEGER NOT NULL,
+  PRIMARY KEY (project_id, item_id, size_key),
+  FOREIGN KEY (project_id) REFERENCES projects(project_id),
+  FOREIGN KEY (item_id) REFERENCES items(item_id)
+);
+
+-- Hasta qué transaction_id está valorizado. Sin fila = valorización aún no inicializada
+-- (python -m scripts.valuation --backfill)
+CREATE TABLE IF NOT EXISTS valuation_state (
+  engine       TEXT PRIMARY KEY,
+  last_txn_id  INTEGER NOT NULL,
+  updated_at   TEXT NOT NULL
+);
@@ -1,6 +1,5 @@
 -- 001_seed_min.sql
--- Seed mínimo: proyectos y ubicaciones base
-PRAGMA foreign_keys = ON;
+-- Seed mínimo: proyectos, almacén y ubicaciones base
 
 -- =========================
 -- Proyectos
@@ -13,12 +12,20 @@ INSERT INTO projects (code, name, is_active)
 SELECT 'RELAV', 'Relavera', 1
 WHERE NOT EXISTS (SELECT 1 FROM projects WHERE code = 'RELAV');
 
+-- =========================
+-- Almacén
+-- =========================
+INSERT INTO warehouses (name)
+SELECT 'Almacén central'
+WHERE NOT EXISTS (SELECT 1 FROM warehouses);
+
 -- =========================
 -- Ubicaciones / Zonas
 -- =========================
 -- Zona de Obras Civiles
-INSERT INTO locations (project_id, code, name, is_segregation, is_active)
+INSERT INTO locations (warehouse_id, project_id, code, name, is_segregation, is_active)
 SELECT
+  (SELECT MIN(warehouse_id) FROM warehouses),
   (SELECT project_id FROM projects WHERE code='OBRAS'),
   'Z-OBRAS',
   'Zona Obras civiles',
@@ -27,8 +34,9 @@ SELECT
 WHERE NOT EXISTS (SELECT 1 FROM locations WHERE code='Z-OBRAS');
 
 -- Zona de Relavera
-INSERT INTO locations (project_id, code, name, is_segregation, is_active)
+INSERT INTO locations (warehouse_id, project_id, code, name, is_segregation, is_active)
 SELECT
+  (SELECT MIN(warehouse_id) FROM warehouses),
   (SELECT project_id FROM projects WHERE code='RELAV'),
   'Z-RELAV',
   'Zona Relavera',
@@ -37,9 +45,10 @@ SELECT
 WHERE NOT EXISTS (SELECT 1 FROM locations WHERE code='Z-RELAV');
 
 -- Zona de Segregación (común, sin proyecto)
-INSERT INTO locations (project_id, code, name, is_segregation, is_active)
+INSERT INTO locations (warehouse_id, project_id, code, name, is_segregation, is_active)
 SELECT
-  NULL,
+  (SELECT MIN(warehouse_id) FROM warehouses),
+  CAST(NULL AS INTEGER),
   'SEGR',
   'Segregación',
   1,
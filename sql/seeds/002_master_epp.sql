@@ -1,5 +1,3 @@
-PRAGMA foreign_keys = ON;
-
 INSERT INTO items (sku, name, category, unit, has_size, useful_life_days, min_stock, is_active)
 VALUES
 (NULL, 'RESPIRADOR', 'EPP', 'UND', 0, NULL, 0, 1),
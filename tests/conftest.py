@@ -0,0 +1,34 @@
+import sys
+from pathlib import Path
+
+import pytest
+from sqlalchemy import text
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from app.db.connection import get_engine  # noqa: E402
+from app.db.migrations import migrate  # noqa: E402
+
+
+@pytest.fixture
+def engine(tmp_path):
+    """BD SQLite nueva con todas las migraciones: un proyecto, una ubicación, un EPP con talla y uno sin."""
+    engine = get_engine(f"sqlite:///{tmp_path / 'almacen.db'}", profile=False)
+    migrate(engine, log=lambda *_: None)
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO projects (project_id, code, name) VALUES (1, 'OBRAS', 'Obras')"))
+        conn.execute(text("INSERT INTO warehouses (warehouse_id, name) VALUES (1, 'Almacén central')"))
+        conn.execute(
+            text(
+                "INSERT INTO locations (location_id, warehouse_id, project_id, code, name) "
+                "VALUES (1, 1, 1, 'A-01', 'Rack A-01')"
+            )
+        )
+        conn.execute(
+            text(
+                "INSERT INTO items (item_id, name, has_size) VALUES "
+                "(1, 'ZAPATO DE SEGURIDAD', 1), (2, 'CASCO BLANCO', 0)"
+            )
+        )
+    yield engine
+    engine.dispose()
@@ -0,0 +1,25 @@
+from sqlalchemy import text
+
+from app.db.backup import ledger_summary, online_copy, sqlite_path
+
+
+def test_online_copy_is_a_single_pass_in_wal_while_a_write_is_open(engine, tmp_path):
+    with engine.begin() as conn:
+        conn.execute(
+            text(
+                "INSERT INTO transactions (txn_datetime, txn_type, project_id, location_id, item_id, qty, created_by) "
+                "VALUES ('2026-03-02T15:00:00Z', 'IN', 1, 1, 2, 5, 'kevin')"
+            )
+        )
+    src = sqlite_path(str(engine.url))
+    expected = ledger_summary(src)
+
+    # Un escritor con su transacción abierta: en WAL la copia no lo espera ni lo bloquea
+    with engine.begin() as conn:
+        conn.execute(text("UPDATE items SET name = 'CASCO AZUL' WHERE item_id = 2"))
+        stats = online_copy(src, tmp_path / "copia.db")
+
+    assert stats["modo"] == "wal" and stats["intentos"] == 1 and stats["reinicios"] == 0
+    copy = ledger_summary(tmp_path / "copia.db")
+    assert copy["quick_check"] == "ok"
+    assert copy["saldos"] == expected["saldos"] and copy["tablas"] == expected["tablas"]
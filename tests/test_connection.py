@@ -0,0 +1,42 @@
+import json
+import sqlite3
+
+import pytest
+from sqlalchemy import text
+
+import app.db.connection as connection
+from app.db.connection import _explain, get_engine
+
+
+def test_slow_log_explains_only_queries_and_dml(tmp_path, monkeypatch):
+    monkeypatch.setattr(connection, "SLOW_MS", 0.0)
+    monkeypatch.setattr(connection, "SLOW_LOG", tmp_path / "slow.log")
+    engine = get_engine(f"sqlite:///{tmp_path / 'p.db'}", profile=True)
+    with engine.begin() as conn:
+        conn.execute(text("CREATE TABLE t (x INTEGER)"))
+        conn.execute(text("INSERT INTO t (x) VALUES (:x)"), {"x": 1})
+        assert conn.execute(text("SELECT x FROM t WHERE x = :x"), {"x": 1}).scalar_one() == 1
+    engine.dispose()
+
+    plans = {}
+    for line in (tmp_path / "slow.log").read_text(encoding="utf-8").splitlines():
+        rec = json.loads(line)
+        plans[rec["sql"].split()[0]] = rec["plan"]
+    assert plans["CREATE"] is None
+    assert plans["INSERT"] is not None and plans["SELECT"] is not None
+
+
+def test_failed_explain_rolls_back_to_its_savepoint(tmp_path):
+    db = sqlite3.connect(tmp_path / "p.db", isolation_level=None)
+    db.execute("CREATE TABLE t (x INTEGER)")
+    db.execute("BEGIN")
+    db.execute("INSERT INTO t VALUES (1)")
+    entry = {"dbapi_conn": db, "savepoint": True, "explain": "EXPLAIN QUERY PLAN ", "sql": "SELECT nope FROM t",
+             "params": ()}
+    with pytest.raises(sqlite3.OperationalError):
+        _explain(entry)
+    # La transacción del llamador sigue viva y conserva lo que ya escribió
+    db.execute("INSERT INTO t VALUES (2)")
+    db.execute("COMMIT")
+    assert db.execute("SELECT COUNT(*) FROM t").fetchone()[0] == 2
+    db.close()
@@ -0,0 +1,76 @@
+import pandas as pd
+from sqlalchemy import text
+
+from app.db.counts import book_lines, count_diff, open_count, parse_count_sheet, post_count
+from app.db.movements import INSERT_IN_SQL, insert_movement, utc_now_str
+
+
+def _receive(conn, item_id: int, qty: int, size: str | None) -> None:
+    insert_movement(
+        conn,
+        INSERT_IN_SQL,
+        {"now_utc": utc_now_str(), "pid": 1, "lid": 1, "iid": item_id, "qty": qty, "size": size,
+         "ref": None, "notes": None},
+    )
+
+
+def test_parse_count_sheet_groups_by_item_and_size(engine):
+    items = pd.DataFrame({"item_id": [1, 2], "name": ["ZAPATO DE SEGURIDAD", "CASCO BLANCO"], "has_size": [1, 0]})
+    raw = pd.DataFrame(
+        {
+            "EPP": ["Zapato de seguridad", "ZAPATO DE SEGURIDAD", "Casco blanco", "Casco blanco"],
+            "TALLA": ["42", "42", None, None],
+            "CANTIDAD": [3, 2, 4, 1],
+        }
+    )
+    counted, errors = parse_count_sheet(raw, items)
+    assert errors == []
+    counted = counted.assign(talla=counted["talla"].astype(object).where(counted["talla"].notna(), None))
+    assert counted.sort_values("item_id").to_dict("records") == [
+        {"item_id": 1, "talla": "42", "counted_qty": 5},
+        {"item_id": 2, "talla": None, "counted_qty": 5},
+    ]
+
+
+def test_count_posts_adjustments_to_the_counted_quantity(engine):
+    with engine.begin() as conn:
+        _receive(conn, 1, 10, "42")
+        _receive(conn, 1, 4, "40")
+        _receive(conn, 2, 8, None)
+        count = open_count(conn, 1, 1, "A-01", "test")
+        items = pd.read_sql(text("SELECT item_id, name, has_size FROM items"), conn)
+
+    raw = pd.DataFrame({"EPP": ["ZAPATO DE SEGURIDAD", "CASCO BLANCO"], "TALLA": ["42", ""], "CANTIDAD": [7, 8]})
+    counted, errors = parse_count_sheet(raw, items)
+    assert errors == []
+    with engine.begin() as conn:
+        diff = count_diff(book_lines(conn, count["count_id"]), counted)
+        assert post_count(conn, count["count_id"], diff, "test") == 2  # talla 42: -3, talla 40: -4
+
+    with engine.connect() as conn:
+        stock = dict(
+            conn.execute(
+                text(
+                    "SELECT item_id || '/' || COALESCE(size, '-'), SUM(qty) FROM transactions "
+                    "GROUP BY item_id, size_id"
+                )
+            ).all()
+        )
+        status = conn.execute(text("SELECT status FROM stock_counts")).scalar_one()
+    assert stock == {"1/42": 7, "1/40": 0, "2/-": 8}
+    assert status == "CONTABILIZADO"
+
+
+def test_empty_count_of_an_empty_location_posts_without_adjustments(engine):
+    with engine.begin() as conn:
+        count = open_count(conn, 1, 1, "A-01", "test")
+        empty = pd.DataFrame({"item_id": pd.Series(dtype=int), "talla": pd.Series(dtype=object),
+                              "counted_qty": pd.Series(dtype=int)})
+        diff = count_diff(book_lines(conn, count["count_id"]), empty)
+        assert diff.empty
+        assert post_count(conn, count["count_id"], diff, "test") == 0
+
+    with engine.connect() as conn:
+        status, adjusts = conn.execute(text("SELECT status, adjust_count FROM stock_counts")).one()
+        lines = conn.execute(text("SELECT COUNT(*) FROM stock_count_lines")).scalar_one()
+    assert (status, adjusts, lines) == ("CONTABILIZADO", 0, 0)
@@ -0,0 +1,77 @@
+from sqlalchemy import text
+
+from app.db.dictionaries import SIZE_ID_SQL, register_sizes
+from scripts.import_kardex_history import history_reference, rebase_seed
+
+SEED = "INIT_STOCK_OBRAS_2025-06-30"
+
+INSERT_SQL = f"""
+INSERT INTO transactions (txn_datetime, txn_type, project_id, location_id, item_id, qty, size, size_id, reference,
+                          created_by)
+VALUES (:dt, :tt, 1, 1, :iid, :qty, :size, {SIZE_ID_SQL}, :ref, 'system')
+"""
+
+
+def _post(conn, tt, ref, rows):
+    register_sizes(conn, [(iid, size) for _, iid, size, _ in rows])
+    conn.execute(
+        text(INSERT_SQL),
+        [{"dt": dt, "tt": tt, "iid": iid, "size": size, "qty": qty, "ref": ref} for dt, iid, size, qty in rows],
+    )
+
+
+def _stock(conn, until="9999-12-31"):
+    rows = conn.execute(
+        text(
+            "SELECT item_id, SUM(qty) FROM transactions WHERE txn_datetime <= :until "
+            "GROUP BY item_id ORDER BY item_id"
+        ),
+        {"until": until},
+    ).all()
+    return dict(rows)
+
+
+def _seed_rows(conn):
+    return conn.execute(
+        text("SELECT transaction_id, txn_datetime, qty FROM transactions WHERE reference = :r ORDER BY 1"), {"r": SEED}
+    ).all()
+
+
+def test_rebase_seed_only_appends_movements(engine):
+    with engine.begin() as conn:
+        _post(conn, "ADJUST", SEED, [("2025-06-30 00:00:00", 1, "42", 5), ("2025-06-30 00:00:00", 2, None, 10)])
+        _post(
+            conn,
+            "OUT",
+            history_reference("OBRAS"),
+            [
+                ("2025-03-01 13:00:00", 1, "42", -3),
+                ("2025-05-01 13:00:00", 2, None, -4),
+                ("2025-08-01 13:00:00", 2, None, -1),  # después del STOCK del libro
+            ],
+        )
+        seed_before = _seed_rows(conn)
+        last_id = conn.execute(text("SELECT MAX(transaction_id) FROM transactions")).scalar_one()
+
+        res = rebase_seed(conn, "OBRAS", 1, 1)
+        assert res["fecha"] == "2025-03-01 12:59:59" and res["movimientos"] == 4
+
+        # El seed no se toca: solo filas nuevas, con ids mayores
+        assert _seed_rows(conn) == seed_before
+        old = conn.execute(text("SELECT COUNT(*) FROM transactions WHERE transaction_id <= :id"), {"id": last_id})
+        assert old.scalar_one() == 5
+        assert _stock(conn, "2025-03-01 12:59:59") == {1: 8, 2: 14}
+        assert _stock(conn, "2025-07-01") == {1: 5, 2: 10}
+        assert _stock(conn) == {1: 5, 2: 9}
+
+        assert rebase_seed(conn, "OBRAS", 1, 1)["movimientos"] == 0
+
+        # Un libro con entregas más antiguas: la apertura pasa a antes de ellas
+        _post(conn, "OUT", history_reference("OBRAS"), [("2025-01-10 13:00:00", 1, "42", -2)])
+        res = rebase_seed(conn, "OBRAS", 1, 1)
+        assert res["fecha"] == "2025-01-10 12:59:59"
+        assert _stock(conn, "2025-01-10 12:59:59") == {1: 10, 2: 14}
+        assert _stock(conn, "2025-03-01 12:59:59") == {1: 8, 2: 14}
+        assert _stock(conn) == {1: 5, 2: 9}
+        assert _seed_rows(conn) == seed_before
+        assert rebase_seed(conn, "OBRAS", 1, 1)["movimientos"] == 0
@@ -0,0 +1,56 @@
+from sqlalchemy import text
+
+from app.db.connection import get_engine
+from app.db.movements import INSERT_IN_SQL, INSERT_OUT_SQL, insert_movement, utc_now_str
+from scripts.offline_sync import EXIT_CONFLICTS, pull, push
+
+
+def _deliver(conn, qty: int, key: str) -> None:
+    insert_movement(
+        conn,
+        INSERT_OUT_SQL,
+        {"now_utc": utc_now_str(), "pid": 1, "lid": 1, "iid": 2, "qty": -qty, "size": None, "eid": 1,
+         "notes": "Entrega", "source_key": key},
+    )
+
+
+def _central_outs(engine) -> dict:
+    with engine.connect() as conn:
+        return dict(conn.execute(text("SELECT source_key, qty FROM transactions WHERE txn_type = 'OUT'")).all())
+
+
+def test_pull_push_and_push_again_do_not_duplicate(engine, tmp_path):
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO employees (employee_id, dni, full_name) VALUES (1, '40000001', 'PEREZ JUAN')"))
+        insert_movement(
+            conn,
+            INSERT_IN_SQL,
+            {"now_utc": utc_now_str(), "pid": 1, "lid": 1, "iid": 2, "qty": 5, "size": None, "ref": None,
+             "notes": None},
+        )
+    local = get_engine(f"sqlite:///{tmp_path / 'frente.db'}", profile=False)
+    pull(engine, local)
+    with local.begin() as conn:
+        _deliver(conn, 2, "OFF-frente-1")
+
+    assert push(engine, local, batch_size=500) == 0
+    assert _central_outs(engine) == {"OFF-frente-1": -2}
+
+    # Nada nuevo: no reenvía
+    assert push(engine, local, batch_size=500) == 0
+    # El frente perdió su registro de envío (se cortó antes de marcar): el reenvío no duplica
+    with local.begin() as conn:
+        conn.execute(text("DELETE FROM offline_sync"))
+    assert push(engine, local, batch_size=500) == 0
+    assert _central_outs(engine) == {"OFF-frente-1": -2}
+
+    # Otra salida que la central ya no puede cubrir: se registra, pero el envío avisa
+    with local.begin() as conn:
+        _deliver(conn, 3, "OFF-frente-2")
+    with engine.begin() as conn:
+        _deliver(conn, 2, None)
+    assert push(engine, local, batch_size=500) == EXIT_CONFLICTS
+    with local.connect() as conn:
+        status = dict(conn.execute(text("SELECT source_key, status FROM offline_sync")).all())
+    assert status == {"OFF-frente-1": "OK", "OFF-frente-2": "CONFLICTO"}
+    local.dispose()
@@ -0,0 +1,77 @@
+import json
+
+import pytest
+from sqlalchemy import text
+from tornado.testing import AsyncHTTPTestCase
+
+from app.db.dictionaries import register_sizes
+from app.db.movements import INSERT_IN_SQL, insert_movement, utc_now_str
+from app.scanner_api import is_loopback, make_app
+
+TOKEN = "secreto-de-prueba"
+
+
+class ScannerApiTest(AsyncHTTPTestCase):
+    @pytest.fixture(autouse=True)
+    def _db(self, engine):
+        with engine.begin() as conn:
+            conn.execute(
+                text(
+                    "INSERT INTO employees (employee_id, dni, fotocheck_code, full_name) "
+                    "VALUES (1, '40000001', 'F-001', 'PEREZ JUAN')"
+                )
+            )
+            register_sizes(conn, [(1, "42")])
+            insert_movement(
+                conn,
+                INSERT_IN_SQL,
+                {"now_utc": utc_now_str(), "pid": 1, "lid": 1, "iid": 1, "qty": 3, "size": "42", "ref": None,
+                 "notes": None, "unit_cost": None},
+            )
+        self.engine = engine
+
+    def get_app(self):
+        return make_app(self.engine, api_token=TOKEN)
+
+    def call(self, path, body=None, key=TOKEN):
+        headers = {"X-Api-Key": key} if key else {}
+        if body is None:
+            res = self.fetch(path, headers=headers)
+        else:
+            res = self.fetch(path, method="POST", body=json.dumps(body), headers=headers)
+        return res.code, json.loads(res.body)
+
+    def deliver(self, qty, **extra):
+        body = {"project": "OBRAS", "location": "A-01", "fotocheck": "F-001", "item_id": 1, "size": "t/42 ",
+                "qty": qty, **extra}
+        return self.call("/api/deliveries", body)
+
+    def test_requires_the_api_key(self):
+        assert self.call("/api/stock?project=OBRAS&item_id=1&size=42", key=None)[0] == 401
+        assert self.call("/api/stock?project=OBRAS&item_id=1&size=42", key="otro")[0] == 401
+
+    def test_stock_lookup_normalizes_the_size(self):
+        code, body = self.call("/api/stock?project=OBRAS&item_id=1&size=T/42")
+        assert code == 200
+        assert (body["size"], body["stock"]) == ("42", 3)
+        assert self.call("/api/stock?project=OBRAS&item_id=1")[0] == 422
+
+    def test_delivery_then_duplicate_then_insufficient_stock(self):
+        code, body = self.deliver(2)
+        assert code == 201 and body["stock"] == 1
+
+        code, body = self.deliver(2)
+        assert code == 409 and body["transaction_id"]
+
+        code, body = self.deliver(2, force=True)
+        assert code == 409
+        assert (body["error"], body["stock"], body["requested"]) == ("Stock insuficiente", 1, 2)
+
+        with self.engine.connect() as conn:
+            outs = conn.execute(text("SELECT COUNT(*) FROM transactions WHERE txn_type = 'OUT'")).scalar_one()
+        assert outs == 1
+
+
+def test_only_loopback_hosts_run_without_a_token():
+    assert is_loopback("127.0.0.1") and is_loopback("localhost") and is_loopback("::1")
+    assert not is_loopback("0.0.0.0") and not is_loopback("192.168.1.20")
@@ -0,0 +1,32 @@
+from sqlalchemy import text
+
+from app.db.stock_live import apply_delta, change_token, load_board, recheck_after, touched_balances
+
+INSERT_SQL = """
+INSERT INTO transactions (transaction_id, txn_datetime, txn_type, project_id, location_id, item_id, qty, created_by)
+VALUES (:id, '2026-03-02T15:00:00Z', 'IN', 1, 1, 2, :qty, 'kevin')
+"""
+
+
+def _stock(board, item_id):
+    return int(board.loc[board["item_id"] == item_id, "stock"].sum())
+
+
+def test_late_commit_below_the_token_reaches_the_board(engine):
+    with engine.begin() as conn:
+        conn.execute(text(INSERT_SQL), [{"id": 10, "qty": 5}, {"id": 12, "qty": 3}])
+    with engine.connect() as conn:
+        token = change_token(conn)
+        board = load_board(conn, "OBRAS")
+    assert token[0] == 12 and _stock(board, 2) == 8
+
+    # Otro escritor confirma el id 11 después de que el tablero ya leyó el 12
+    with engine.begin() as conn:
+        conn.execute(text(INSERT_SQL), {"id": 11, "qty": 4})
+    with engine.connect() as conn:
+        new = change_token(conn)
+        assert new != token and new[0] == token[0]
+        delta = touched_balances(conn, "OBRAS", recheck_after(token), new[0])
+    board, changed = apply_delta(board, delta)
+    assert _stock(board, 2) == 12
+    assert changed == {(2, -1)}
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+from sqlalchemy import text
+
+from app.db.dictionaries import SIZE_ID_SQL, register_sizes
+from app.db.valuation import backfill, update_valuation
+
+INSERT_SQL = f"""
+INSERT INTO transactions (txn_datetime, txn_type, project_id, location_id, item_id, qty, size, size_id, unit_cost,
+                          created_by)
+VALUES ('2026-03-02 15:00:00', :tt, 1, 1, :iid, :qty, :size, {SIZE_ID_SQL}, :cost, 'test')
+"""
+
+
+def _write(conn, moves: list[tuple]) -> None:
+    """Como un escritor: valoriza al empezar y después de insertar, en la misma transacción."""
+    update_valuation(conn)
+    register_sizes(conn, [(iid, size) for _, iid, size, _, _ in moves])
+    for tt, iid, size, qty, cost in moves:
+        conn.execute(text(INSERT_SQL), {"tt": tt, "iid": iid, "size": size, "qty": qty, "cost": cost})
+    update_valuation(conn)
+
+
+def _state(conn) -> tuple[dict, dict]:
+    costs = {
+        (r.project_id, r.item_id, r.size_key): (r.qty, r.avg_cost, r.value)
+        for r in conn.execute(text("SELECT * FROM item_costs"))
+    }
+    applied = dict(conn.execute(text("SELECT transaction_id, unit_cost FROM transactions WHERE qty < 0")).all())
+    return costs, applied
+
+
+def _assert_same(a: dict, b: dict) -> None:
+    assert a.keys() == b.keys()
+    for k in a:
+        assert a[k] == pytest.approx(b[k]), k
+
+
+def test_incremental_valuation_matches_backfill(engine):
+    with engine.begin() as conn:
+        backfill(conn)  # BD vacía: inicializa el incremental
+
+    rng = random.Random(7)
+    keys = [(1, "40"), (1, "42"), (2, None)]
+    for _ in range(40):
+        batch = []
+        for _ in range(rng.randint(1, 8)):
+            iid, size = rng.choice(keys)
+            tt = rng.choice(["IN", "IN", "OUT", "OUT", "OUT", "RETURN", "ADJUST"])
+            if tt == "IN":
+                batch.append((tt, iid, size, rng.randint(1, 20), rng.choice([None, rng.uniform(5, 50)])))
+            elif tt == "OUT":
+                batch.append((tt, iid, size, -rng.randint(1, 6), None))
+            elif tt == "RETURN":
+                batch.append((tt, iid, size, rng.randint(1, 2), None))
+            else:
+                batch.append((tt, iid, size, rng.choice([-3, -1, 1, 2]), None))
+        with engine.begin() as conn:
+            _write(conn, batch)
+
+    with engine.begin() as conn:
+        inc_costs, inc_applied = _state(conn)
+        res = backfill(conn)
+        full_costs, full_applied = _state(conn)
+
+    assert res["movimientos"] > 100 and res["filas_actualizadas"] == 0
+    _assert_same(inc_costs, full_costs)
+    _assert_same(inc_applied, full_applied)
+
+
+def test_out_before_any_costed_in(engine):
+    with engine.begin() as conn:
+        backfill(conn)
+    with engine.begin() as conn:
+        _write(conn, [("OUT", 2, None, -2, None)])
+    with engine.begin() as conn:
+        _write(conn, [("IN", 2, None, 3, None), ("IN", 2, None, 10, 5.0), ("OUT", 2, None, -1, None)])
+
+    with engine.begin() as conn:
+        costs, applied = _state(conn)
+        # Sin costo todavía: la primera salida queda sin costo; la segunda sale al promedio del IN
+        assert list(applied.values()) == [None, 5.0]
+        assert costs == {(1, 2, 0): (10, 5.0, 50.0)}
+        assert backfill(conn)["filas_actualizadas"] == 0
+        assert _state(conn) == (costs, applied)
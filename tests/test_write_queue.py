@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+
+from app.db.movements import INSERT_IN_SQL, INSERT_OUT_SQL, insert_movement, utc_now_str
+from app.db.write_queue import InsufficientStockError, WriteQueue
+
+
+@pytest.fixture
+def stocked(engine):
+    """5 cascos en stock y un trabajador."""
+    with engine.begin() as conn:
+        conn.execute(text("INSERT INTO employees (employee_id, dni, full_name) VALUES (1, '40000001', 'PEREZ JUAN')"))
+        insert_movement(
+            conn,
+            INSERT_IN_SQL,
+            {"now_utc": utc_now_str(), "pid": 1, "lid": 1, "iid": 2, "qty": 5, "size": None, "ref": None,
+             "notes": None},
+        )
+    return engine
+
+
+def _out(qty: int = 1, eid: int = 1) -> tuple[str, dict]:
+    return INSERT_OUT_SQL, {"now_utc": utc_now_str(), "pid": 1, "lid": 1, "iid": 2, "qty": -qty, "size": None,
+                            "eid": eid, "notes": "Entrega", "source_key": None}
+
+
+def _queue(engine) -> WriteQueue:
+    # Espera larga: los envíos de la prueba caen en el mismo grupo
+    return WriteQueue(engine.url.render_as_string(hide_password=False), max_wait_ms=200)
+
+
+def _stock(engine) -> int:
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT SUM(qty) FROM transactions WHERE item_id = 2")).scalar_one()
+
+
+def test_concurrent_submissions_get_their_own_ids_or_errors(stocked):
+    wq = _queue(stocked)
+    with ThreadPoolExecutor(max_workers=7) as pool:
+        futures = list(pool.map(lambda _: wq.submit([_out()]), range(7)))
+
+    ids, errors = [], []
+    for f in futures:
+        try:
+            ids.extend(f.result(timeout=30))
+        except InsufficientStockError as e:
+            errors.append(e)
+    assert len(ids) == len(set(ids)) == 5
+    assert len(errors) == 2 and all(e.available == 0 and e.requested == 1 for e in errors)
+    assert wq.groups < wq.submissions == 7
+    assert _stock(stocked) == 0
+
+
+def test_a_failing_submission_does_not_roll_back_the_rest_of_its_group(stocked):
+    wq = _queue(stocked)
+    first = wq.submit([_out()])
+    bad = wq.submit([_out(), _out(eid=999)])  # trabajador inexistente (FK): el envío entero falla
+    last = wq.submit([_out(2)])
+
+    assert len(first.result(timeout=30)) == 1 and len(last.result(timeout=30)) == 1
+    with pytest.raises(IntegrityError):
+        bad.result(timeout=30)
+    assert _stock(stocked) == 2